@@ -1,5 +1,5 @@
 import json
-from app import app, db, Employee
+from app import app, db, Employee, pin_digest
 from werkzeug.security import generate_password_hash
 
 json_file = "employees.json"
@@ -22,18 +22,25 @@ with app.app_context():
     print("Tabela employee limpa.")
     
     inserted = 0
+    used_pin_indexes = set()  # Para verificar duplicatas de PIN
     for emp in employees_data:
         if 'nome' not in emp or 'pin' not in emp:
             print(f"Erro: Registro inválido, faltando 'nome' ou 'pin': {emp}")
             continue
         pin = str(emp['pin']).strip()  # Garante que o PIN é string e sem espaços
         employer_code = f"A{pin}"  # Gera employer_code como A{pin}
+        pin_index = pin_digest(pin)
+        if pin_index in used_pin_indexes:
+            print(f"Aviso: PIN duplicado para {emp['nome']}. Ignorando colaborador.")
+            continue
+        used_pin_indexes.add(pin_index)
         pin_hash = generate_password_hash(pin, method='pbkdf2:sha256', salt_length=8)
         print(f"Processando funcionário: {emp['nome']}, pin: {pin}, employer_code: {employer_code}, hash: {pin_hash}")
         employee = Employee(
             employer_code=employer_code,
             email=emp.get('email'),  # Inclui email, se presente
             pin=pin_hash,
+            pin_index=pin_index,
             name=emp['nome'],
             role=emp.get('role', 'colaborador'),  # Usa 'colaborador' como padrão
             department=emp.get('department'),  # Inclui department, se presente
@@ -1,132 +1,305 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file, Response, jsonify, make_response
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from flask import render_template, request, redirect, url_for, session, flash, send_file, Response, jsonify, make_response, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from datetime import datetime, date, timedelta
 import json
 import os
-import calendar
-import pandas as pd
-from io import BytesIO, StringIO
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.units import cm
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+from io import BytesIO
 import sqlalchemy
 from sqlalchemy import inspect
 import csv
+import zlib
 import traceback
-import base64
-from PyPDF2 import PdfReader, PdfWriter, Transformation
-from PIL import Image as PILImage
-import io
-from calendar import monthrange
-from flask_mail import Mail, Message
+from flask_mail import Message
 import logging
 from sqlalchemy.exc import OperationalError, IntegrityError
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from time import time
 from hashlib import sha256
-from scheduler import init_scheduler
-from models import db, Employee, Unit, Report, Activity
+import hmac
+import click
+from itertools import groupby
+from scheduler import init_scheduler, prerender_month_reports
+from report_jobs import report_job_handler, JOB_DONE, JOB_FAILED
+from models import db, Employee, Unit, Report, Activity, ReportJob, ReportCache, ReportSequence, Holiday
+from models import STAGE_GENERATED, STAGE_EMPLOYEE_SIGNED, STAGE_PREPOSTO_SIGNED, STAGE_FISCAL_SIGNED, SIGNED_STAGES
+from factory import create_app, mail
+from db_pool import pool_status, warm_up_app_pools
+from db_routing import read_replica
+from monthly_summary import registered_business_days, registered_business_dates, refresh_summary, reconcile as reconcile_monthly_summary
+from business_calendar import WEEKDAY_NAMES, WEEKDAYS_PT, month_layout, days_in_month, is_weekend, holiday_name
+from business_calendar import business_day_mask, count_weekdays, count_business_days, iter_business_days
+import business_calendar
 from zoneinfo import ZoneInfo
-from werkzeug.middleware.proxy_fix import ProxyFix
 
 # Configurar logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Mapeamento de dias da semana em português
-WEEKDAYS_PT = {  # noqa: E701
-    0: 'segunda-feira',
-    1: 'terça-feira',
-    2: 'quarta-feira',
-    3: 'quinta-feira',
-    4: 'sexta-feira',
-    5: 'sábado',
-    6: 'domingo'
-}
-
-app = Flask(__name__)
-app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', os.urandom(32).hex())
-app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql+pymysql://root:@localhost/rdat_db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
-app.config['REPORT_FOLDER'] = 'static/reports'
-app.config['MAIL_SERVER'] = 'smtp.gmail.com'  # Exemplo: SMTP do Gmail
-app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = True
-app.config['MAIL_USERNAME'] = os.environ.get('EMAIL_USER', 'seuemail@example.com')  # Use variável de ambiente
-app.config['MAIL_PASSWORD'] = os.environ.get('EMAIL_PASS', 'sua-senha')  # Use variável de ambiente
-mail = Mail(app)
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+app = create_app(import_name=__name__)
+report_jobs = app.extensions['report_jobs']
+if not app.config['PIN_PEPPER'] and not app.testing:
+    # Um pepper conhecido (ou diferente a cada início) invalidaria o índice de PINs
+    raise RuntimeError("Defina a variável de ambiente PIN_PEPPER antes de iniciar o app.")
 
 logger.debug("Iniciando app.py, IntegrityError importado: %s", IntegrityError)
 
-# Modelos do banco de dados
-class Employee(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    employer_code = db.Column(db.String(10), unique=True, nullable=True)
-    email = db.Column(db.String(100), unique=True, nullable=True)
-    pin = db.Column(db.String(128), nullable=False)
-    pin_index = db.Column(db.String(64), unique=True, nullable=False)
-    name = db.Column(db.String(100), nullable=False)
-    role = db.Column(db.String(20), nullable=False, default='colaborador')
-    department = db.Column(db.String(50), nullable=True)
-    phone = db.Column(db.String(20), nullable=True)
-    admission_date = db.Column(db.Date, nullable=True)
-    unit = db.Column(db.String(50), nullable=True)
-    position = db.Column(db.String(50), nullable=True)
-    photo_url = db.Column(db.String(255), nullable=True)
-
-class Activity(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
-    type = db.Column(db.String(50), nullable=True)
-    start_datetime = db.Column(db.DateTime, nullable=True)
-    end_datetime = db.Column(db.DateTime, nullable=True)
-    description = db.Column(db.String(500), nullable=False)
-    date = db.Column(db.Date, nullable=False)
-    project = db.Column(db.String(100), nullable=True)
-    location = db.Column(db.String(50), nullable=True)
-    weekday = db.Column(db.String(20), nullable=True)
-    is_edited = db.Column(db.Boolean, nullable=False, default=False)
-
-class Report(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
-    report_number = db.Column(db.String(20), nullable=False)
-    period = db.Column(db.String(7), nullable=False)
-    format = db.Column(db.String(10), nullable=False)
-    file_path = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    signature_status = db.Column(db.String(50), nullable=True, default='Pendente')
-
-class Unit(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False, unique=True)
-    icj_contract = db.Column(db.String(50), nullable=False)
-    sap_contract = db.Column(db.String(50), nullable=False)
-    fiscal = db.Column(db.String(100), nullable=False)
-    field_fiscal = db.Column(db.String(100), nullable=False)
-    manager = db.Column(db.String(100), nullable=True)
-
-# Função auxiliar para obter dias do mês
-def get_days_in_month(year, month):
-    _, last_day = calendar.monthrange(year, month)
-    weekdays = ['Segunda-feira', 'Terça-feira', 'Quarta-feira', 'Quinta-feira', 'Sexta-feira', 'Sábado', 'Domingo']
-    days = []
-    for day in range(1, last_day + 1):
-        date_obj = date(year, month, day)
-        days.append({
-            'day': day,
-            'weekday': weekdays[date_obj.weekday()]
-        })
-    return days
+# Índice do PIN: HMAC-SHA256 com o pepper do servidor. Permite checar a unicidade
+# do PIN por igualdade no índice único, sem um PBKDF2 por funcionário cadastrado
+def pin_digest(pin):
+    return hmac.new(app.config['PIN_PEPPER'].encode('utf-8'), pin.encode('utf-8'), sha256).hexdigest()
+
+def pin_in_use(pin):
+    return db.session.query(Employee.id).filter_by(pin_index=pin_digest(pin)).first() is not None
+
+# Janela do mês como intervalo [primeiro dia, primeiro dia do mês seguinte),
+# para que os filtros por mês usem o índice (employee_id, date) de Activity
+def get_month_window(year, month):
+    first_day = date(year, month, 1)
+    if month == 12:
+        next_month_first_day = date(year + 1, 1, 1)
+    else:
+        next_month_first_day = date(year, month + 1, 1)
+    return first_day, next_month_first_day
+
+def activity_month_filter(year, month):
+    first_day, next_month_first_day = get_month_window(year, month)
+    return (Activity.date >= first_day, Activity.date < next_month_first_day)
+
+# Dias úteis de [start, end] sem atividade preenchida nem Folga/Atestado: as
+# datas registradas vêm de uma única consulta e são comparadas ao calendário
+# de dias úteis da unidade do funcionário (feriados não contam)
+def missing_business_days(employee_id, start, end):
+    if start > end:
+        return []
+    unit = db.session.query(Employee.unit).filter_by(id=employee_id).scalar()
+    registered = registered_business_dates(db, start, end, [employee_id])[employee_id]
+    return [day for day in iter_business_days(start, end, unit) if day not in registered]
+
+# Descrição de um dia sem atividade nos relatórios
+def empty_day_description(activity_date, unit=None):
+    if is_weekend(activity_date):
+        return 'Não preenchível'
+    holiday = holiday_name(activity_date, unit)
+    return f'Feriado: {holiday}' if holiday else 'Não preenchido'
+
+# Matriz mensal da unidade: uma linha por colaborador e uma coluna por dia,
+# com o status de cada dia codificado em um único bytearray
+STATUS_WEEKEND = 0  # Fim de semana ou feriado
+STATUS_CONCLUIDO = 1
+STATUS_PENDENTE = 2
+STATUS_EM_FALTA = 3
+STATUS_LABELS = (None, 'Concluído', 'Pendente', 'Em Falta')
+
+class UnitMonthMatrix:
+    def __init__(self, year, month, employees, activities, today=None, unit=None):
+        today = today or datetime.now().date()
+        self.year = year
+        self.month = month
+        self.employees = employees
+        self.activities = activities  # Lista paralela a employees: {dia: dados da atividade}
+        self.last_day = days_in_month(year, month)
+
+        # Dias até 'today' que já podem estar em falta neste mês
+        if (year, month) < (today.year, today.month):
+            elapsed_days = self.last_day
+        elif (year, month) == (today.year, today.month):
+            elapsed_days = today.day
+        else:
+            elapsed_days = 0
+
+        # Linha base (dia sem atividade), igual para todos os colaboradores
+        business_days = business_day_mask(year, month, unit)
+        base_row = bytearray(self.last_day)
+        for index in range(self.last_day):
+            if not business_days >> index & 1:
+                base_row[index] = STATUS_WEEKEND
+            elif index < elapsed_days:
+                base_row[index] = STATUS_EM_FALTA
+            else:
+                base_row[index] = STATUS_PENDENTE
+        self.total_days = self.last_day - base_row.count(STATUS_WEEKEND)
+
+        self.grid = base_row * len(employees)
+        for row_index, activities_dict in enumerate(activities):
+            offset = row_index * self.last_day
+            for day in activities_dict:
+                if base_row[day - 1] != STATUS_WEEKEND:
+                    self.grid[offset + day - 1] = STATUS_CONCLUIDO
+
+    def row(self, index):
+        offset = index * self.last_day
+        return self.grid[offset:offset + self.last_day]
+
+    def status_dict(self, index):
+        return {day: STATUS_LABELS[code] for day, code in enumerate(self.row(index), start=1)}
+
+    def employee_data(self):
+        employee_data = {}
+        for index, employee in enumerate(self.employees):
+            row = self.row(index)
+            employee_data[employee.id] = {
+                'name': employee.name,
+                'employer_code': employee.employer_code or 'N/A',
+                'position': employee.position or 'N/A',
+                'activities_dict': self.activities[index],
+                'status_dict': self.status_dict(index),
+                'total_days': self.total_days,
+                'completed_days': row.count(STATUS_CONCLUIDO),
+                'pending_days': row.count(STATUS_PENDENTE),
+                'missing_days': row.count(STATUS_EM_FALTA)
+            }
+        return employee_data
+
+def build_unit_month_matrix(unit, year, month, employee_id=None, name_filter=None):
+    # Uma única consulta: colaboradores da unidade com as atividades do mês (LEFT JOIN)
+    query = (
+        db.session.query(Employee, Activity)
+        .outerjoin(Activity, db.and_(Activity.employee_id == Employee.id, *activity_month_filter(year, month)))
+        .filter(Employee.unit == unit, Employee.role == 'colaborador')
+    )
+    if employee_id:
+        query = query.filter(Employee.id == employee_id)
+    if name_filter:
+        query = query.filter(Employee.name.ilike(f'%{name_filter}%'))
+
+    employees = []
+    activities = []
+    row_by_employee = {}
+    for employee, activity in query.order_by(Employee.id, Activity.date):
+        if employee.id not in row_by_employee:
+            row_by_employee[employee.id] = len(employees)
+            employees.append(employee)
+            activities.append({})
+        if activity is not None:
+            activities[row_by_employee[employee.id]][activity.date.day] = {
+                'description': activity.description,
+                'type': activity.type or 'N/A',
+                'project': activity.project or 'N/A',
+                'location': activity.location or 'N/A',
+                'hours': ((activity.end_datetime - activity.start_datetime).total_seconds() / 3600) if activity.start_datetime and activity.end_datetime else 'N/A'
+            }
+    return UnitMonthMatrix(year, month, employees, activities, unit=unit)
+
+# Exportação CSV das atividades da unidade, gerada em blocos a partir de um
+# único cursor no servidor (colaboradores LEFT JOIN atividades do intervalo)
+ACTIVITY_CSV_HEADER = ['Nome', 'Matrícula', 'Função', 'Dia', 'Dia da Semana', 'Status', 'Descrição', 'Tipo', 'Projeto', 'Local', 'Horas']
+ACTIVITY_CSV_BATCH_ROWS = 500  # Linhas do CSV por bloco enviado
+ACTIVITY_CSV_YIELD_PER = 1000  # Linhas buscadas do cursor por vez
+
+class _CsvChunk:
+    def __init__(self):
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+
+    def take(self):
+        text = ''.join(self.parts)
+        self.parts = []
+        return text
+
+def iter_activity_csv_rows(unit, start_date, end_date, name_filter=None, today=None):
+    """Linhas do CSV (uma por colaborador e dia do intervalo) na ordem do cursor."""
+    today = today or datetime.now().date()
+    # Intervalos que cruzam meses identificam o dia pela data completa
+    single_month = (start_date.year, start_date.month) == (end_date.year, end_date.month)
+    query = (
+        db.session.query(
+            Employee.id, Employee.name, Employee.employer_code, Employee.position,
+            Activity.date, Activity.description, Activity.type, Activity.project,
+            Activity.location, Activity.start_datetime, Activity.end_datetime
+        )
+        .outerjoin(Activity, db.and_(
+            Activity.employee_id == Employee.id,
+            Activity.date >= start_date,
+            Activity.date <= end_date
+        ))
+        .filter(Employee.unit == unit, Employee.role == 'colaborador')
+    )
+    if name_filter:
+        query = query.filter(Employee.name.ilike(f'%{name_filter}%'))
+    rows = query.order_by(Employee.id, Activity.date).yield_per(ACTIVITY_CSV_YIELD_PER)
+    business_days = set(iter_business_days(start_date, end_date, unit))
+
+    def employee_days(employee, activities):
+        current = start_date
+        while current <= end_date:
+            activity = activities.get(current)
+            non_business_day = current not in business_days
+            if non_business_day:
+                status = '-'
+            elif activity is not None:
+                status = 'Concluído'
+            else:
+                status = 'Em Falta' if current <= today else 'Pendente'
+            if activity is not None:
+                description = activity.description
+                activity_type = activity.type or 'N/A'
+                project = activity.project or 'N/A'
+                location = activity.location or 'N/A'
+                if activity.start_datetime and activity.end_datetime:
+                    hours = (activity.end_datetime - activity.start_datetime).total_seconds() / 3600
+                else:
+                    hours = 'N/A'
+            else:
+                description = 'Nenhuma atividade registrada' if not non_business_day else 'Não preenchível'
+                activity_type = project = location = hours = 'N/A'
+            yield [
+                employee.name,
+                employee.employer_code or 'N/A',
+                employee.position or 'N/A',
+                f'{current.day:02d}' if single_month else current.strftime('%d/%m/%Y'),
+                WEEKDAY_NAMES[current.weekday()],
+                status,
+                description,
+                activity_type,
+                project,
+                location,
+                hours
+            ]
+            current += timedelta(days=1)
+
+    # Apenas as atividades do colaborador atual ficam em memória
+    employee = None
+    activities = {}
+    for row in rows:
+        if employee is None or row.id != employee.id:
+            if employee is not None:
+                yield from employee_days(employee, activities)
+            employee = row
+            activities = {}
+        if row.date is not None:
+            activities[row.date] = row
+    if employee is not None:
+        yield from employee_days(employee, activities)
+
+def stream_activity_csv(rows, compress=False):
+    """Gera o CSV em blocos de texto UTF-8 (ou gzip, com compress=True)."""
+    chunk = _CsvChunk()
+    writer = csv.writer(chunk)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits=31: formato gzip
+
+    def encode(text):
+        data = text.encode('utf-8')
+        return compressor.compress(data) if compressor else data
+
+    writer.writerow(ACTIVITY_CSV_HEADER)
+    pending = 1
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= ACTIVITY_CSV_BATCH_ROWS:
+            data = encode(chunk.take())
+            pending = 0
+            if data:
+                yield data
+    data = encode(chunk.take())
+    if compressor:
+        data += compressor.flush()
+    if data:
+        yield data
 
 def create_employer_accounts():
     with app.app_context():
@@ -178,12 +351,20 @@ def import_employees_from_json(json_file_path):
                     db.session.add(unit)
                     print(f"Unidade adicionada à tabela Unit: {unit_name}")
             db.session.commit()
+            used_pin_indexes = set()  # PINs já usados nesta importação
             for emp_data in employees_data:
                 print(f"Dados do JSON: {emp_data}")
                 if not Employee.query.filter(
                     (Employee.employer_code == emp_data.get('Matrícula')) |
                     (Employee.email == emp_data.get('email'))
                 ).first():
+                    pin = str(emp_data['pin']).strip() if emp_data.get('pin') else None
+                    pin_index = pin_digest(pin) if pin else None
+                    if pin_index and (pin_index in used_pin_indexes or pin_in_use(pin)):
+                        print(f"Aviso: PIN duplicado para {emp_data.get('nome')}. Ignorando colaborador.")
+                        continue
+                    if pin_index:
+                        used_pin_indexes.add(pin_index)
                     admission_date = None
                     if emp_data.get('Data Admissão'):
                         try:
@@ -195,6 +376,7 @@ def import_employees_from_json(json_file_path):
                         employer_code=emp_data.get('Matrícula'),
                         email=emp_data.get('email'),
                         pin=generate_password_hash(emp_data.get('pin', 'default_pin_2025')),
+                        pin_index=pin_index,
                         name=emp_data.get('nome'),
                         role='colaborador',
                         department=emp_data.get('department'),
@@ -217,6 +399,24 @@ def log_script_name():
     print("SCRIPT_NAME recebido:", request.environ.get('SCRIPT_NAME'))
     print("PATH_INFO recebido:", request.environ.get('PATH_INFO'))
 
+@app.before_request
+def start_report_workers():
+    # Inicia os workers de relatórios no processo que atende requisições e
+    # retoma jobs pendentes após um reinício (idempotente)
+    report_jobs.start()
+
+@app.route('/health/db_pool', methods=['GET'])
+def db_pool_health():
+    # Métricas do pool de conexões deste worker (cada processo responde pelas suas)
+    status = pool_status(db.engine)
+    router = app.extensions['db_routing']
+    if router.keys:
+        status['replicas'] = {
+            key: dict(pool_status(db.engines[key]), **replica)
+            for key, replica in router.status().items()
+        }
+    return jsonify(status)
+
 @app.route('/')
 def index():
     print(f"Verificando sessão em /index: {dict(session)}")
@@ -553,14 +753,12 @@ def add_employee():
                 flash('Esta matrícula já está cadastrada.', 'error')
                 return render_template('add_employee.html', employee_name=session['employee_name'], units=units)
 
-            # Verificar duplicatas no PIN
+            # Verificar duplicatas no PIN (consulta pelo índice único pin_index)
             logger.debug("Verificando PIN existente...")
-            existing_employees = Employee.query.all()
-            for emp in existing_employees:
-                if check_password_hash(emp.pin, pin):
-                    logger.warning(f"PIN já cadastrado para employer_code: {emp.employer_code}")
-                    flash('Este PIN já está cadastrado.', 'error')
-                    return render_template('add_employee.html', employee_name=session['employee_name'], units=units)
+            if pin_in_use(pin):
+                logger.warning("PIN já cadastrado")
+                flash('Este PIN já está cadastrado.', 'error')
+                return render_template('add_employee.html', employee_name=session['employee_name'], units=units)
 
             # Validar data de admissão
             try:
@@ -580,6 +778,7 @@ def add_employee():
                 position=position,
                 unit=unit,
                 pin=pin_hash,
+                pin_index=pin_digest(pin),
                 role='funcionario'
             )
             logger.debug("Adicionando funcionário ao banco...")
@@ -619,7 +818,7 @@ def check_pin():
         logger.warning("PIN não fornecido na requisição /check_pin.")
         return jsonify({'success': False, 'message': 'PIN não fornecido.'}), 400
     try:
-        pin_index = sha256(pin.encode('utf-8')).hexdigest()
+        pin_index = pin_digest(pin)
         logger.debug(f"Verificando PIN com pin_index: {pin_index}")
         existing_employee = Employee.query.filter_by(pin_index=pin_index).first()
         if existing_employee:
@@ -903,9 +1102,7 @@ def send_reports_to_fiscal():
         # Gerar relatório consolidado em PDF
         filename = secure_filename(f"consolidated_report_{unit_name}_{start_date_str}.pdf")
         file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
-        c = canvas.Canvas(file_path, pagesize=A4)
-        width, height = A4
-
+        report_data = []
         for employee in employees:
             activities = Activity.query.filter_by(employee_id=employee.id).filter(
                 Activity.date >= start_date,
@@ -930,41 +1127,10 @@ def send_reports_to_fiscal():
                     } for activity in activities
                 ]
             }
-            c.setFont('Helvetica-Bold', 16)
-            c.drawCentredString(width/2, height - 2*cm, f"Relatório Consolidado - {employee_data['name']}")
-            c.setFont('Helvetica', 12)
-            c.drawString(2*cm, height - 3.5*cm, f"Matrícula: {employee_data['employer_code']}")
-            c.drawString(2*cm, height - 4*cm, f"Data de Admissão: {employee_data['admission_date']}")
-            c.drawString(2*cm, height - 4.5*cm, f"Função: {employee_data['position']}")
-            c.drawString(2*cm, height - 5*cm, f"Unidade: {employee_data['unit']}")
-            c.drawString(2*cm, height - 5.5*cm, f"Departamento: {employee_data['department']}")
-            c.drawString(2*cm, height - 6*cm, f"Telefone: {employee_data['phone']}")
-            c.setFont('Helvetica-Bold', 12)
-            c.drawString(2*cm, height - 7.5*cm, "Atividades:")
-            c.setFont('Helvetica', 10)
-            y = height - 8*cm
-            c.drawString(2*cm, y, "Data")
-            c.drawString(5*cm, y, "Descrição")
-            c.drawString(10*cm, y, "Projeto")
-            c.drawString(13*cm, y, "Local")
-            c.drawString(15*cm, y, "Tipo")
-            c.drawString(17*cm, y, "Horas")
-            c.line(2*cm, y-0.2*cm, width-2*cm, y-0.2*cm)
-            y -= 0.5*cm
-            for activity in employee_data['activities']:
-                c.drawString(2*cm, y, activity['date'])
-                c.drawString(5*cm, y, activity['description'][:30] + ('...' if len(activity['description']) > 30 else ''))
-                c.drawString(10*cm, y, activity['project'])
-                c.drawString(13*cm, y, activity['location'])
-                c.drawString(15*cm, y, activity['type'])
-                c.drawString(17*cm, y, str(activity['hours']))
-                y -= 0.5*cm
-                if y < 3*cm:
-                    c.showPage()
-                    c.setFont('Helvetica', 10)
-                    y = height - 2*cm
-            c.showPage()
-        c.save()
+            report_data.append(employee_data)
+
+        from report_render import write_employees_pdf
+        write_employees_pdf(file_path, report_data, 'Relatório Consolidado', workers=app.config['REPORT_RENDER_WORKERS'])
 
         # Enviar e-mail
         fiscal_email = unit.fiscal
@@ -1022,16 +1188,7 @@ def set_employee_activity():
             return redirect(url_for('home'))
 
         activity = Activity.query.filter_by(employee_id=employee.id, date=activity_date).first()
-        weekday_map = {
-            0: 'Segunda-feira',
-            1: 'Terça-feira',
-            2: 'Quarta-feira',
-            3: 'Quinta-feira',
-            4: 'Sexta-feira',
-            5: 'Sábado',
-            6: 'Domingo'
-        }
-        weekday = weekday_map[activity_date.weekday()]
+        weekday = WEEKDAY_NAMES[activity_date.weekday()]
 
         if activity:
             activity.type = type_
@@ -1057,6 +1214,7 @@ def set_employee_activity():
             )
             db.session.add(activity)
 
+        invalidate_report_cache(employee.id, activity_date)
         db.session.commit()
         logger.info(f"Atividade alterada com sucesso: employer_code={employer_code}, date={activity_date}, type={type_}")
         flash(f"Atividade definida como {type_} para {employee.name} em {activity_date.strftime('%d/%m/%Y')}.", 'success')
@@ -1099,7 +1257,7 @@ def save_activity():
 
     try:
         activity_date = date(year, month, day)
-        if activity_date.weekday() >= 5:
+        if is_weekend(activity_date):
             logger.warning(f"Tentativa de salvar atividade em final de semana: {activity_date}")
             flash('Não é possível salvar atividades em finais de semana.', 'error')
             return redirect(url_for('activities', month=month, year=year))
@@ -1108,39 +1266,16 @@ def save_activity():
         today = date.today()
         start_date = date(year, month, 1)
         if activity_date > start_date:
-            previous_days = (
-                Activity.query
-                .filter_by(employee_id=session['employee_id'])
-                .filter(
-                    Activity.date >= start_date,
-                    Activity.date < activity_date,
-                    Activity.date <= today,
-                    db.func.dayofweek(Activity.date).in_([2, 3, 4, 5, 6])  # Dias úteis (seg-sex)
-                )
-                .all()
+            missing_days = missing_business_days(
+                session['employee_id'], start_date, min(activity_date - timedelta(days=1), today)
             )
-            missing_days = [
-                d for d in range(1, activity_date.day)
-                if date(year, month, d).weekday() < 5
-                and not any(a.date.day == d for a in previous_days)
-                and date(year, month, d) <= today
-            ]
             if missing_days:
                 logger.warning(f"Dias anteriores não preenchidos: {missing_days}")
                 flash('Você deve preencher todas as atividades de dias úteis anteriores antes de salvar esta atividade.', 'error')
                 return redirect(url_for('activities', month=month, year=year))
 
         activity = Activity.query.filter_by(employee_id=session['employee_id'], date=activity_date).first()
-        weekday_map = {
-            0: 'Segunda-feira',
-            1: 'Terça-feira',
-            2: 'Quarta-feira',
-            3: 'Quinta-feira',
-            4: 'Sexta-feira',
-            5: 'Sábado',
-            6: 'Domingo'
-        }
-        weekday = weekday_map[activity_date.weekday()]
+        weekday = WEEKDAY_NAMES[activity_date.weekday()]
 
         if activity:
             if activity.is_edited or activity.type in ['Folga', 'Atestado']:
@@ -1167,6 +1302,7 @@ def save_activity():
             )
             db.session.add(activity)
 
+        invalidate_report_cache(session['employee_id'], activity_date)
         db.session.commit()
         logger.info(f"Atividade salva com sucesso: employee_id={session['employee_id']}, date={activity_date}")
         flash('Atividade salva com sucesso.', 'success')
@@ -1213,15 +1349,13 @@ def activities():
 
     logger.info(f"Dados do funcionário: Nome={employee.name}, Unidade={employee.unit}, Função={employee.position}")
 
-    days_in_month = get_days_in_month(year, month)
+    layout = month_layout(year, month, employee.unit)
+    business_days = business_day_mask(year, month, employee.unit)
 
     activities = (
         Activity.query
         .filter_by(employee_id=session['employee_id'])
-        .filter(
-            db.extract('month', Activity.date) == month,
-            db.extract('year', Activity.date) == year
-        )
+        .filter(*activity_month_filter(year, month))
         .all()
     )
     activities_dict = {
@@ -1241,41 +1375,40 @@ def activities():
     }
 
     today = datetime.now().date()
-    _, last_day = calendar.monthrange(year, month)
+    last_day = len(layout)
 
+    def is_business(d):
+        return business_days >> (d - 1) & 1
+
+    # Fins de semana e feriados sem atividade não têm status
     for day in range(1, last_day + 1):
         if day not in status_dict:
             activity_date = date(year, month, day)
-            is_weekend = activity_date.weekday() >= 5
-            if is_weekend:
+            if not is_business(day):
                 status_dict[day] = None
             elif activity_date > today:
                 status_dict[day] = 'Pendente'
             else:
                 status_dict[day] = 'Em Falta'
 
-    report_count = Report.query.filter_by(employee_id=employee.id).count()
-    report_number = f"#{report_count + 1}"
+    report_number = peek_report_number(report_sequence_owner(employee.id))
 
-    total_days = sum(
-        1 for d in range(1, last_day + 1)
-        if date(year, month, d).weekday() < 5
-    )
+    total_days = bin(business_days).count('1')
     completed_days = sum(
         1 for d in range(1, last_day + 1)
-        if status_dict.get(d) == 'Concluído' and date(year, month, d).weekday() < 5
+        if status_dict.get(d) == 'Concluído' and is_business(d)
     )
     folga_atestado_days = sum(
         1 for d in range(1, last_day + 1)
-        if status_dict.get(d) in ['Folga', 'Atestado'] and date(year, month, d).weekday() < 5
+        if status_dict.get(d) in ['Folga', 'Atestado'] and is_business(d)
     )
     pending_days = sum(
         1 for d in range(today.day + 1, last_day + 1)
-        if date(year, month, d).weekday() < 5 and status_dict.get(d) == 'Pendente'
+        if is_business(d) and status_dict.get(d) == 'Pendente'
     )
     missing_days = sum(
         1 for d in range(1, min(today.day, last_day) + 1)
-        if date(year, month, d).weekday() < 5 and status_dict.get(d) == 'Em Falta'
+        if is_business(d) and status_dict.get(d) == 'Em Falta'
     )
 
     return render_template(
@@ -1284,7 +1417,7 @@ def activities():
         department=session.get('department'),
         current_month=month,
         current_year=year,
-        days_in_month=days_in_month,
+        days_in_month=layout,
         activities=activities_dict,
         activities_is_edited=activities_is_edited,
         status_dict=status_dict,
@@ -1295,6 +1428,159 @@ def activities():
         report_number=report_number,
     )
 
+# Gravação de um mês de atividades: validação pelo calendário de dias úteis e
+# um único INSERT ... ON DUPLICATE KEY UPDATE no índice único (employee_id, date)
+MONTH_SAVE_SAVED = 'saved'
+MONTH_SAVE_SKIPPED = 'skipped'
+MONTH_SAVE_REJECTED = 'rejected'
+ACTIVITY_UPSERT_COLUMNS = ('description', 'project', 'location', 'weekday', 'type')
+
+def _activity_text(value):
+    # Campos vindos do JSON podem ter qualquer tipo; só texto (ou vazio) é aceito
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise ValueError('Os campos das atividades devem ser texto.')
+    return value.strip()
+
+def parse_month_activities(data):
+    """{dia: {'description', 'project', 'location'}} a partir do JSON ou do formulário.
+
+    JSON: {"activities": {"5": "descrição", "6": {"description": ..., "project": ..., "location": ...}}}
+    Formulário: campos activity_<dia> (e, opcionalmente, project_<dia> e location_<dia>).
+    Levanta ValueError se um dia ou campo não for válido.
+    """
+    entries = {}
+    if 'activities' in data:
+        if not isinstance(data['activities'], dict):
+            raise ValueError('activities deve ser um objeto {dia: atividade}.')
+        for day, entry in data['activities'].items():
+            if not isinstance(entry, dict):
+                entry = {'description': entry}
+            entries[int(day)] = {
+                'description': _activity_text(entry.get('description')),
+                'project': _activity_text(entry.get('project')) or None,
+                'location': _activity_text(entry.get('location')) or None,
+            }
+        return entries
+    for key, description in data.items():
+        if key.startswith('activity_') and key[len('activity_'):].isdigit():
+            day = int(key[len('activity_'):])
+            entries[day] = {
+                'description': _activity_text(description),
+                'project': _activity_text(data.get(f'project_{day}')) or None,
+                'location': _activity_text(data.get(f'location_{day}')) or None,
+            }
+    return entries
+
+def activity_upsert_statement(rows, dialect_name):
+    """INSERT que inclui ou atualiza as atividades (mesmas chaves em todas as linhas)."""
+    table = Activity.__table__
+    if dialect_name == 'mysql':
+        statement = mysql_insert(table).values(rows)
+        statement = statement.on_duplicate_key_update({name: statement.inserted[name] for name in ACTIVITY_UPSERT_COLUMNS})
+    else:
+        # SQLite (testes): mesmo efeito com ON CONFLICT ... DO UPDATE
+        statement = sqlite_insert(table).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.employee_id, table.c.date],
+            set_={name: statement.excluded[name] for name in ACTIVITY_UPSERT_COLUMNS}
+        )
+    return statement
+
+def upsert_activities(rows):
+    """Inclui ou atualiza as atividades em um único comando."""
+    db.session.execute(activity_upsert_statement(rows, db.engine.dialect.name))
+
+def save_month_activities(employee_id, year, month, entries, today=None):
+    """Valida e grava as atividades do mês; retorna {dia: {'status', 'message'}}.
+
+    Não faz commit: o resumo mensal e o cache de relatórios são atualizados
+    na mesma transação.
+    """
+    today = today or date.today()
+    employee = db.session.get(Employee, employee_id)
+    business_days = business_day_mask(year, month, employee.unit)
+    last_day = days_in_month(year, month)
+    # Atividades já existentes que não podem ser sobrescritas (uma consulta)
+    locked = {
+        activity_date.day for activity_date, activity_type, is_edited in db.session.query(
+            Activity.date, Activity.type, Activity.is_edited
+        ).filter(Activity.employee_id == employee_id, *activity_month_filter(year, month))
+        if is_edited or activity_type in ['Folga', 'Atestado']
+    }
+
+    results = {}
+    rows = []
+    for day, entry in sorted(entries.items()):
+        if not 1 <= day <= last_day:
+            results[day] = {'status': MONTH_SAVE_REJECTED, 'message': 'Dia inválido para o mês.'}
+            continue
+        activity_date = date(year, month, day)
+        if not entry['description']:
+            results[day] = {'status': MONTH_SAVE_SKIPPED, 'message': 'Sem descrição.'}
+        elif len(entry['description']) > 500:
+            results[day] = {'status': MONTH_SAVE_REJECTED, 'message': 'A descrição deve ter no máximo 500 caracteres.'}
+        elif not business_days >> (day - 1) & 1:
+            results[day] = {'status': MONTH_SAVE_REJECTED, 'message': 'Não é possível salvar atividades em finais de semana ou feriados.'}
+        elif activity_date > today:
+            results[day] = {'status': MONTH_SAVE_REJECTED, 'message': 'Não é possível salvar atividades para datas futuras.'}
+        elif day in locked:
+            results[day] = {'status': MONTH_SAVE_REJECTED, 'message': 'Esta atividade não pode ser editada.'}
+        else:
+            rows.append({
+                'employee_id': employee_id,
+                'date': activity_date,
+                'description': entry['description'],
+                'project': entry['project'],
+                'location': entry['location'],
+                'weekday': WEEKDAY_NAMES[activity_date.weekday()],
+                'type': None,
+                'is_edited': False,
+            })
+            results[day] = {'status': MONTH_SAVE_SAVED, 'message': 'Atividade salva.'}
+
+    if rows:
+        upsert_activities(rows)
+        # O upsert não passa pelo flush do ORM: atualizar o resumo aqui
+        refresh_summary(db.session.connection(), employee_id, year, month)
+        invalidate_report_cache(employee_id, rows[0]['date'], rows[-1]['date'])
+    return results
+
+@app.route('/save_month_activities', methods=['POST'])
+def save_month_activities_route():
+    if 'employee_id' not in session:
+        return jsonify({'success': False, 'message': 'Por favor, faça login.'}), 401
+    if session['role'] not in ['funcionario', 'colaborador']:
+        return jsonify({'success': False, 'message': 'Acesso não autorizado.'}), 403
+
+    data = request.get_json(silent=True) if request.is_json else request.form
+    if not isinstance(data, dict):  # JSON malformado (None) ou que não é um objeto
+        return jsonify({'success': False, 'message': 'Envie um objeto JSON com mês, ano e atividades.'}), 400
+    try:
+        month = int(data.get('month'))
+        year = int(data.get('year'))
+        date(year, month, 1)
+        entries = parse_month_activities(data)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Informe mês, ano e atividades válidos.'}), 400
+
+    try:
+        results = save_month_activities(session['employee_id'], year, month, entries)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro ao salvar atividades do mês {month:02d}/{year}: {str(e)}")
+        return jsonify({'success': False, 'message': f'Erro ao salvar atividades: {str(e)}'}), 500
+
+    saved = sum(1 for result in results.values() if result['status'] == MONTH_SAVE_SAVED)
+    logger.info(f"Atividades do mês salvas: employee_id={session['employee_id']}, {month:02d}/{year}, {saved} dias")
+    return jsonify({
+        'success': True,
+        'message': f'{saved} atividade(s) salva(s).',
+        'results': {str(day): result for day, result in results.items()}
+    })
+
 @app.route('/add_activity', methods=['POST'])
 def add_activity():
     if 'employee_id' not in session:
@@ -1312,28 +1598,13 @@ def add_activity():
     year = int(request.form.get('year', datetime.now().year))
 
     try:
-        for day in range(1, calendar.monthrange(year, month)[1] + 1):
-            activity_key = f'activity_{day}'
-            description = request.form.get(activity_key)
-            if description and description.strip():
-                activity_date = date(year, month, day)
-                existing_activity = Activity.query.filter_by(
-                    employee_id=session['employee_id'],
-                    date=activity_date
-                ).first()
-                if existing_activity:
-                    existing_activity.description = description
-                    existing_activity.weekday = activity_date.strftime('%A')
-                else:
-                    new_activity = Activity(
-                        employee_id=session['employee_id'],
-                        description=description,
-                        date=activity_date,
-                        weekday=activity_date.strftime('%A')
-                    )
-                    db.session.add(new_activity)
+        results = save_month_activities(session['employee_id'], year, month, parse_month_activities(request.form))
         db.session.commit()
-        flash('Atividades registradas com sucesso!', 'success')
+        rejected = [f"{day:02d}/{month:02d}: {result['message']}" for day, result in results.items() if result['status'] == MONTH_SAVE_REJECTED]
+        if rejected:
+            flash(f"Atividades não registradas: {'; '.join(rejected)}", 'error')
+        if any(result['status'] == MONTH_SAVE_SAVED for result in results.values()):
+            flash('Atividades registradas com sucesso!', 'success')
     except Exception as e:
         db.session.rollback()
         print(f"Erro ao registrar atividades: {str(e)}")
@@ -1370,22 +1641,10 @@ def add_single_activity():
             return redirect(url_for('activities', month=month, year=year))
 
         # Verificar se todos os dias úteis anteriores no mesmo mês estão preenchidos
-        activities = Activity.query.filter_by(employee_id=session['employee_id']).filter(
-            db.extract('month', Activity.date) == month,
-            db.extract('year', Activity.date) == year
-        ).all()
-        activities_dict = {activity.date.day: activity.description for activity in activities}
-
-        missing_days = []
-        for d in range(1, min(day, today.day)):
-            check_date = date(year, month, d)
-            if check_date.weekday() >= 5:  # Ignorar sábado (5) e domingo (6)
-                continue
-            if d not in activities_dict or not activities_dict[d].strip():
-                missing_days.append(d)
+        missing_days = missing_business_days(session['employee_id'], date(year, month, 1), activity_date - timedelta(days=1))
 
         if missing_days:
-            flash(f'Você deve preencher as atividades dos dias {", ".join(f"{d:02d}/{month:02d}/{year}" for d in missing_days)} antes de salvar esta atividade.', 'error')
+            flash(f'Você deve preencher as atividades dos dias {", ".join(d.strftime("%d/%m/%Y") for d in missing_days)} antes de salvar esta atividade.', 'error')
             return redirect(url_for('activities', month=month, year=year))
 
         # Verificar se a descrição é válida
@@ -1426,6 +1685,7 @@ def add_single_activity():
             db.session.add(new_activity)
             flash(f'Atividade para {activity_date.strftime("%d/%m/%Y")} salva com sucesso!', 'success')
 
+        invalidate_report_cache(session['employee_id'], activity_date)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
@@ -1434,6 +1694,574 @@ def add_single_activity():
 
     return redirect(url_for('activities', month=month, year=year))
 
+# Geração de relatórios em segundo plano: as rotas validam o pedido e enfileiram
+# um job (ver report_jobs.py); as funções abaixo rodam nos workers e retornam o Report
+# Os arquivos são gerados por report_render.py (ReportLab) e report_excel.py
+# (xlsxwriter), importados apenas na primeira geração para não pesar na
+# inicialização de cada worker
+ACTIVITY_STREAM_BATCH = 1000
+
+def report_job_dates(params):
+    return date.fromisoformat(params['start_date']), date.fromisoformat(params['end_date'])
+
+def employee_report_header(employee):
+    """Dados do colaborador no cabeçalho dos relatórios consolidados."""
+    return {
+        'employer_code': employee.employer_code or 'N/A',
+        'name': employee.name,
+        'admission_date': employee.admission_date.strftime('%d/%m/%Y') if employee.admission_date else 'N/A',
+        'position': employee.position or 'N/A',
+        'unit': employee.unit or 'N/A',
+        'department': employee.department or 'N/A',
+        'phone': employee.phone or 'N/A',
+    }
+
+def iter_employee_activities(employees, start_date, end_date):
+    """(cabeçalho, atividades) de cada colaborador, em ordem de id, lidos de um único cursor.
+
+    As atividades de todos vêm de uma consulta ordenada por funcionário e data,
+    lida em lotes de ACTIVITY_STREAM_BATCH; cada colaborador recebe um gerador
+    que deve ser consumido antes de pedir o próximo. A consulta usa uma conexão
+    própria porque o progresso dos jobs faz commit na sessão, o que fecharia o cursor.
+    """
+    employees = sorted(employees, key=lambda employee: employee.id)
+    if not employees:
+        return
+    activity = Activity.__table__
+    statement = sqlalchemy.select(
+        activity.c.employee_id, activity.c.date, activity.c.description, activity.c.project,
+        activity.c.location, activity.c.type, activity.c.start_datetime, activity.c.end_datetime
+    ).where(
+        activity.c.employee_id.in_([employee.id for employee in employees]),
+        activity.c.date >= start_date,
+        activity.c.date <= end_date
+    ).order_by(activity.c.employee_id, activity.c.date)
+    engine = db.session.get_bind(mapper=Activity, clause=statement)
+    with engine.connect() as connection:
+        rows = connection.execution_options(stream_results=True).execute(statement).yield_per(ACTIVITY_STREAM_BATCH)
+        groups = groupby(rows, key=lambda row: row.employee_id)
+        current = next(groups, None)
+        for employee in employees:
+            if current is not None and current[0] == employee.id:
+                activities = current[1]
+            else:
+                activities = ()
+            yield employee_report_header(employee), (
+                {
+                    'date': row.date.strftime('%d/%m/%Y'),
+                    'description': row.description,
+                    'project': row.project or 'N/A',
+                    'location': row.location or 'N/A',
+                    'type': row.type or 'N/A',
+                    'hours': ((row.end_datetime - row.start_datetime).total_seconds() / 3600) if row.start_datetime and row.end_datetime else 'N/A'
+                } for row in activities
+            )
+            if activities:
+                current = next(groups, None)
+
+def employees_report_data(employees, start_date, end_date):
+    """Colaboradores com as listas de atividades, para os PDFs consolidados."""
+    return [
+        dict(header, activities=list(activities))
+        for header, activities in iter_employee_activities(employees, start_date, end_date)
+    ]
+
+def report_job_response(job):
+    return jsonify({
+        'success': True,
+        'status': 'success',
+        'job_id': job.id,
+        'job_status': job.status,
+        'status_url': url_for('report_job_status', job_id=job.id),
+        'message': 'Relatório pronto para download.' if job.status == JOB_DONE else 'Relatório enviado para geração. O download começará quando estiver pronto.'
+    }), 202
+
+# Numeração dos relatórios: um contador por dono em report_sequence, incrementado
+# com um UPDATE que trava apenas a linha do dono. O número é confirmado antes de
+# gerar o arquivo, então uma geração que falha deixa um número sem uso.
+CONSOLIDATED_SEQUENCE = 'consolidated'
+
+def report_sequence_owner(employee_id):
+    return f"employee:{employee_id}"
+
+def next_report_number(owner):
+    """Reserva o próximo número (ex.: '#12') da sequência de `owner`."""
+    sequence = ReportSequence.__table__
+    while True:
+        updated = db.session.execute(
+            sequence.update()
+            .where(sequence.c.owner == owner)
+            .values(last_number=sequence.c.last_number + 1)
+        ).rowcount
+        if updated:
+            number = db.session.execute(
+                db.select(sequence.c.last_number).where(sequence.c.owner == owner)
+            ).scalar_one()
+            db.session.commit()
+            return f"#{number}"
+        # Primeiro relatório do dono; se outro worker criou a linha antes, repetir o UPDATE
+        try:
+            db.session.execute(sequence.insert().values(owner=owner, last_number=1))
+            db.session.commit()
+            return "#1"
+        except IntegrityError:
+            db.session.rollback()
+
+def peek_report_number(owner):
+    """Próximo número da sequência, sem reservá-lo (apenas para exibição)."""
+    sequence = db.session.get(ReportSequence, owner)
+    return f"#{(sequence.last_number if sequence else 0) + 1}"
+
+# Cache de relatórios: o mesmo pedido sobre os mesmos dados reaproveita o Report já
+# gerado. Incrementar REPORT_TEMPLATE_VERSION ao alterar o layout dos relatórios.
+REPORT_TEMPLATE_VERSION = 3
+
+def report_cache_scope(kind, params):
+    """Funcionários cobertos pelo relatório: (employee_id, unit, role), None = qualquer."""
+    if kind == 'individual':
+        return params['employee_id'], None, None
+    if kind == 'consolidated':
+        return None, params['unit'], None
+    if kind == 'employer':
+        return None, None, 'colaborador'
+    return params.get('employee_id'), params['unit'], 'colaborador'  # fiscal e preposto
+
+def report_data_digest(kind, params):
+    """Digest dos funcionários, atividades do período e unidades que entram no relatório."""
+    employee_id, unit, role = report_cache_scope(kind, params)
+    start_date, end_date = report_job_dates(params)
+    # Apenas as colunas que entram no relatório, sem montar objetos ORM
+    query = db.session.query(
+        Employee.id, Employee.name, Employee.employer_code, Employee.admission_date, Employee.position,
+        Employee.unit, Employee.department, Employee.phone,
+        Activity.id, Activity.date, Activity.type, Activity.description, Activity.project,
+        Activity.location, Activity.start_datetime, Activity.end_datetime
+    ).outerjoin(Activity, db.and_(
+        Activity.employee_id == Employee.id,
+        Activity.date >= start_date,
+        Activity.date <= end_date
+    ))
+    if employee_id:
+        query = query.filter(Employee.id == employee_id)
+    if unit:
+        query = query.filter(Employee.unit == unit)
+    if role:
+        query = query.filter(Employee.role == role)
+
+    digest = sha256()
+    units = set()
+    for row in query.order_by(Employee.id, Activity.date):
+        units.add(row[5])
+        digest.update(repr(list(row)).encode('utf-8'))
+    units.discard(None)
+    for unit_row in Unit.query.filter(Unit.name.in_(units)).order_by(Unit.name):
+        digest.update(repr([unit_row.name, unit_row.icj_contract, unit_row.sap_contract, unit_row.fiscal,
+                            unit_row.field_fiscal, unit_row.manager]).encode('utf-8'))
+    return digest.hexdigest()
+
+def report_request_prefix(kind, params):
+    """Primeira metade da chave do cache: depende só do pedido, não dos dados."""
+    payload = json.dumps([REPORT_TEMPLATE_VERSION, kind, params], sort_keys=True)
+    return sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+def report_cache_key(kind, params):
+    """Chave do cache: prefixo do pedido + início do digest dos dados (ver report_data_digest)."""
+    return report_request_prefix(kind, params) + report_data_digest(kind, params)[:32]
+
+def find_cached_report(key):
+    entry = ReportCache.query.get(key)
+    if not entry:
+        return None
+    report = Report.query.get(entry.report_id)
+    if report and os.path.exists(report.file_path):
+        return report
+    # Relatório removido (ex.: pela limpeza do scheduler): descartar a entrada
+    db.session.delete(entry)
+    db.session.commit()
+    return None
+
+def find_cached_request(kind, params):
+    """Relatório em cache para o pedido, sem calcular o digest (usado na thread da requisição).
+
+    Vale porque as entradas são removidas quando os dados mudam: atividades e
+    feriados pelas rotas que os alteram, funcionários e unidades por
+    _invalidate_changed_report_scopes. O worker ainda confere o digest completo.
+    """
+    entry = ReportCache.query.filter(
+        ReportCache.key.like(report_request_prefix(kind, params) + '%')
+    ).order_by(ReportCache.created_at.desc()).first()
+    return find_cached_report(entry.key) if entry else None
+
+def store_report_cache(key, kind, params, report):
+    employee_id, unit, _ = report_cache_scope(kind, params)
+    start_date, end_date = report_job_dates(params)
+    db.session.merge(ReportCache(
+        key=key,
+        report_id=report.id,
+        employee_id=employee_id,
+        unit=unit,
+        start_date=start_date,
+        end_date=end_date,
+        created_at=datetime.utcnow()
+    ))
+    db.session.commit()
+
+def invalidate_report_cache(employee_id, activity_date, until=None):
+    """Remove do cache os relatórios que cobrem o funcionário nessa data (ou em [activity_date, until]).
+
+    Não faz commit: deve ser chamada na mesma transação que altera a atividade.
+    """
+    employee = db.session.get(Employee, employee_id)
+    unit = employee.unit if employee else None
+    ReportCache.query.filter(
+        ReportCache.start_date <= (until or activity_date),
+        ReportCache.end_date >= activity_date,
+        db.or_(
+            ReportCache.employee_id == employee_id,
+            db.and_(
+                ReportCache.employee_id.is_(None),
+                db.or_(ReportCache.unit.is_(None), ReportCache.unit == unit)
+            )
+        )
+    ).delete(synchronize_session=False)
+
+def invalidate_holiday_report_cache(holiday_date, unit=None):
+    """Remove do cache os relatórios que cobrem um feriado da unidade (ou geral, com unit=None).
+
+    Não faz commit: deve ser chamada na mesma transação que altera o feriado.
+    """
+    query = ReportCache.query.filter(
+        ReportCache.start_date <= holiday_date,
+        ReportCache.end_date >= holiday_date
+    )
+    if unit:
+        unit_employees = db.session.query(Employee.id).filter(Employee.unit == unit)
+        query = query.filter(db.or_(
+            ReportCache.unit == unit,
+            db.and_(
+                ReportCache.unit.is_(None),
+                db.or_(ReportCache.employee_id.is_(None), ReportCache.employee_id.in_(unit_employees))
+            )
+        ))
+    query.delete(synchronize_session=False)
+
+# Colunas que aparecem nos relatórios (ver report_data_digest)
+REPORT_EMPLOYEE_COLUMNS = ('name', 'employer_code', 'admission_date', 'position', 'unit', 'department', 'phone', 'role')
+REPORT_UNIT_COLUMNS = ('name', 'icj_contract', 'sap_contract', 'fiscal', 'field_fiscal', 'manager')
+
+def _report_scope_values(db_session, obj, columns, scope_column):
+    """None se a gravação de `obj` não muda os relatórios; senão os valores atuais e anteriores de `scope_column`."""
+    state = sqlalchemy.inspect(obj)
+    if obj not in db_session.new and obj not in db_session.deleted and not any(
+        state.attrs[column].history.has_changes() for column in columns
+    ):
+        return None
+    return {getattr(obj, scope_column), *state.attrs[scope_column].history.deleted}
+
+def _invalidate_changed_report_scopes(db_session, flush_context, instances):
+    """Remove do cache os relatórios de funcionários e unidades incluídos, alterados ou excluídos."""
+    changed = False
+    employee_ids = set()
+    units = set()  # Unidades com relatórios de vários funcionários afetados
+    unit_rows = set()  # Unidades cujos dados (contratos, fiscais) mudaram
+    for obj in list(db_session.new) + list(db_session.dirty) + list(db_session.deleted):
+        if isinstance(obj, Employee):
+            values = _report_scope_values(db_session, obj, REPORT_EMPLOYEE_COLUMNS, 'unit')
+            if values is not None:
+                changed = True
+                if obj.id is not None:
+                    employee_ids.add(obj.id)
+                units.update(values)
+        elif isinstance(obj, Unit):
+            values = _report_scope_values(db_session, obj, REPORT_UNIT_COLUMNS, 'name')
+            if values is not None:
+                changed = True
+                units.update(values)
+                unit_rows.update(values)
+    if not changed:
+        return
+    units.discard(None)
+    unit_rows.discard(None)
+    conditions = [
+        # Relatórios de todos os funcionários (empregador): qualquer mudança os afeta
+        db.and_(ReportCache.employee_id.is_(None), ReportCache.unit.is_(None))
+    ]
+    if employee_ids:
+        conditions.append(ReportCache.employee_id.in_(employee_ids))
+    if units:
+        conditions.append(ReportCache.unit.in_(units))
+    if unit_rows:
+        # Relatórios individuais também mostram os dados da unidade do funcionário
+        conditions.append(ReportCache.employee_id.in_(
+            sqlalchemy.select(Employee.id).where(Employee.unit.in_(unit_rows))
+        ))
+    with db_session.no_autoflush:
+        db_session.execute(sqlalchemy.delete(ReportCache).where(db.or_(*conditions)))
+
+sqlalchemy.event.listen(db.session, 'before_flush', _invalidate_changed_report_scopes)
+
+def cached_report_job(kind):
+    """Registra o handler do job, reaproveitando o relatório em cache quando os dados não mudaram."""
+    def decorator(func):
+        @report_job_handler(kind)
+        def run(params, progress):
+            key = report_cache_key(kind, params)
+            report = find_cached_report(key)
+            if report:
+                print(f"Relatório {report.id} reaproveitado do cache ({kind})")
+            else:
+                report = func(params, progress)
+                store_report_cache(key, kind, params, report)
+            return report
+        return func
+    return decorator
+
+def enqueue_report(kind, employee_id, params):
+    """Enfileira a geração do relatório ou, se ele já estiver em cache, devolve o job concluído.
+
+    A consulta na requisição é só pelo prefixo do pedido (ver find_cached_request):
+    um relatório pré-gerado não espera atrás dos jobs da fila.
+    """
+    report = find_cached_request(kind, params)
+    if report:
+        print(f"Relatório {report.id} reaproveitado do cache para employee_id: {employee_id}")
+        job = report_jobs.complete(kind, employee_id, params, report)
+    else:
+        job = report_jobs.enqueue(kind, employee_id, params)
+    return report_job_response(job)
+
+@cached_report_job('individual')
+def build_individual_report(params, progress):
+    """Relatório individual do colaborador/funcionário."""
+    employee = Employee.query.get(params['employee_id'])
+    start_date, end_date = report_job_dates(params)
+    format_type = params['format']
+
+    unit = Unit.query.filter_by(name=employee.unit).first()
+    fiscal_name = unit.fiscal if unit else 'N/A'
+    field_fiscal_name = unit.field_fiscal if unit else 'N/A'
+    icj_contract = unit.icj_contract if unit else 'N/A'
+    sap_contract = unit.sap_contract if unit else 'N/A'
+
+    current_date = start_date
+    all_days = []
+    while current_date <= end_date:
+        all_days.append(current_date)
+        current_date += timedelta(days=1)
+
+    activities = Activity.query.filter_by(employee_id=employee.id).filter(
+        Activity.date >= start_date,
+        Activity.date <= end_date
+    ).all()
+
+    activities_dict = {
+        activity.date: {
+            'date': activity.date.strftime('%d/%m/%Y'),
+            'weekday': WEEKDAYS_PT[activity.date.weekday()],
+            'description': activity.description,
+            'project': activity.project or 'N/A',
+            'location': activity.location or 'N/A',
+            'type': activity.type or 'N/A',
+            'hours': ((activity.end_datetime - activity.start_datetime).total_seconds() / 3600) if activity.start_datetime and activity.end_datetime else 'N/A'
+        } for activity in activities
+    }
+
+    report_data = {
+        'employer_code': employee.employer_code or 'N/A',
+        'name': employee.name,
+        'admission_date': employee.admission_date.strftime('%d/%m/%Y') if employee.admission_date else 'N/A',
+        'position': employee.position or 'N/A',
+        'unit': employee.unit or 'N/A',
+        'department': employee.department or 'N/A',
+        'phone': employee.phone or 'N/A',
+        'fiscal_name': fiscal_name,
+        'field_fiscal_name': field_fiscal_name,
+        'icj_contract': icj_contract,
+        'sap_contract': sap_contract,
+        'client': 'Accerth',
+        'manager': 'N/A',
+        'activities': []
+    }
+
+    for activity_date in all_days:
+        if activity_date in activities_dict:
+            report_data['activities'].append(activities_dict[activity_date])
+        else:
+            description = empty_day_description(activity_date, employee.unit)
+            report_data['activities'].append({
+                'date': activity_date.strftime('%d/%m/%Y'),
+                'weekday': WEEKDAYS_PT[activity_date.weekday()],
+                'description': description,
+                'project': 'N/A',
+                'location': 'N/A',
+                'type': 'N/A',
+                'hours': 'N/A'
+            })
+
+    progress(40)
+
+    report_number = next_report_number(report_sequence_owner(employee.id))
+    period = f"{start_date.month:02d}/{start_date.year}"
+
+    os.makedirs(app.config['REPORT_FOLDER'], exist_ok=True)
+    progress(50)
+
+    from report_excel import write_individual_excel
+    from report_render import write_individual_pdf
+
+    try:
+        if format_type == 'excel':
+            filename = secure_filename(f"report_{report_number}_{employee.id}.xlsx")
+            file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
+            print(f"Gerando Excel em: {file_path}")
+            write_individual_excel(file_path, report_data)
+            new_report = Report(
+                employee_id=employee.id,
+                report_number=report_number,
+                period=period,
+                format='Excel',
+                file_path=file_path
+            )
+            db.session.add(new_report)
+            db.session.commit()
+            return new_report
+
+        elif format_type == 'pdf':
+            filename = secure_filename(f"report_{report_number}_{employee.id}.pdf")
+            file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
+            print(f"Gerando PDF em: {file_path}")
+            write_individual_pdf(file_path, report_data, report_number, period)
+
+            new_report = Report(
+                employee_id=employee.id,
+                report_number=report_number,
+                period=period,
+                format='PDF',
+                file_path=file_path
+            )
+            db.session.add(new_report)
+            db.session.commit()
+            return new_report
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erro ao gerar relatório: {str(e)}")
+        traceback.print_exc()
+        raise
+
+@cached_report_job('consolidated')
+def build_consolidated_report(params, progress):
+    """Relatório consolidado da unidade, pedido pelo empregador em /generate_report."""
+    employee = Employee.query.get(params['employee_id'])
+    unit = Unit.query.filter_by(name=params['unit']).first()
+    employees = Employee.query.filter_by(unit=unit.name).all()
+    start_date, end_date = report_job_dates(params)
+    format_type = params['format']
+
+    current_date = start_date
+    all_days = []
+    while current_date <= end_date:
+        all_days.append(current_date)
+        current_date += timedelta(days=1)
+
+    consolidated_activities = []
+    for index, emp in enumerate(employees):
+        progress(5 + 45 * index // len(employees))
+        activities = Activity.query.filter_by(employee_id=emp.id).filter(
+            Activity.date >= start_date,
+            Activity.date <= end_date
+        ).all()
+        activities_dict = {
+            activity.date: {
+                'date': activity.date.strftime('%d/%m/%Y'),
+                'weekday': WEEKDAYS_PT[activity.date.weekday()],
+                'description': activity.description,
+                'project': activity.project or 'N/A',
+                'location': activity.location or 'N/A',
+                'type': activity.type or 'N/A',
+                'hours': ((activity.end_datetime - activity.start_datetime).total_seconds() / 3600) if activity.start_datetime and activity.end_datetime else 'N/A',
+                'employee_name': emp.name,
+                'employer_code': emp.employer_code
+            } for activity in activities
+        }
+
+        for activity_date in all_days:
+            if activity_date in activities_dict:
+                consolidated_activities.append(activities_dict[activity_date])
+            else:
+                description = empty_day_description(activity_date, unit.name)
+                consolidated_activities.append({
+                    'date': activity_date.strftime('%d/%m/%Y'),
+                    'weekday': WEEKDAYS_PT[activity_date.weekday()],
+                    'description': description,
+                    'project': 'N/A',
+                    'location': 'N/A',
+                    'type': 'N/A',
+                    'hours': 'N/A',
+                    'employee_name': emp.name,
+                    'employer_code': emp.employer_code
+                })
+
+    report_data = {
+        'unit': unit.name,
+        'fiscal_name': unit.fiscal if unit else 'N/A',
+        'field_fiscal_name': unit.field_fiscal if unit else 'N/A',
+        'icj_contract': unit.icj_contract if unit else 'N/A',
+        'sap_contract': unit.sap_contract if unit else 'N/A',
+        'client': 'Accerth',
+        'manager': 'N/A',
+        'activities': consolidated_activities
+    }
+
+    report_number = next_report_number(CONSOLIDATED_SEQUENCE)
+    period = f"{start_date.month:02d}/{start_date.year}"
+
+    os.makedirs(app.config['REPORT_FOLDER'], exist_ok=True)
+    progress(50)
+
+    from report_excel import write_unit_excel
+    from report_render import write_unit_pdf
+
+    try:
+        if format_type == 'excel':
+            filename = secure_filename(f"consolidated_report_{report_number}.xlsx")
+            file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
+            print(f"Gerando Excel em: {file_path}")
+            write_unit_excel(file_path, report_data)
+            new_report = Report(
+                employee_id=employee.id,
+                report_number=report_number,
+                period=period,
+                format='Excel',
+                file_path=file_path
+            )
+            db.session.add(new_report)
+            db.session.commit()
+            return new_report
+
+        elif format_type == 'pdf':
+            filename = secure_filename(f"consolidated_report_{report_number}.pdf")
+            file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
+            print(f"Gerando PDF em: {file_path}")
+            write_unit_pdf(file_path, report_data, period)
+
+            new_report = Report(
+                employee_id=employee.id,
+                report_number=report_number,
+                period=period,
+                format='PDF',
+                file_path=file_path
+            )
+            db.session.add(new_report)
+            db.session.commit()
+            return new_report
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erro ao gerar relatório consolidado: {str(e)}")
+        traceback.print_exc()
+        raise
+
 @app.route('/generate_report', methods=['GET', 'POST'])
 def generate_report():
     if 'employee_id' not in session:
@@ -1467,367 +2295,26 @@ def generate_report():
 
             print(f"Recebido: start_date={start_date_str}, end_date={end_date_str}, format={format_type}")
 
-            if not start_date_str or not end_date_str or not format_type:
+            if not start_date_str or not end_date_str or format_type not in ('excel', 'pdf'):
                 print("Erro: Campos do formulário ausentes")
-                flash('Todos os campos (data inicial, data final e formato) são obrigatórios.', 'error')
-                return redirect(url_for('generate_report'))
+                return jsonify({'success': False, 'message': 'Todos os campos (data inicial, data final e formato) são obrigatórios.'}), 400
 
             try:
                 start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
                 end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
                 if start_date > end_date:
                     print("Erro: Data de início posterior à data de fim")
-                    flash('Data de início não pode ser posterior à data de fim.', 'error')
-                    return redirect(url_for('generate_report'))
+                    return jsonify({'success': False, 'message': 'Data de início não pode ser posterior à data de fim.'}), 400
             except ValueError as e:
                 print(f"Erro de validação de data: {str(e)}")
-                flash('Formato de data inválido! Use AAAA-MM-DD.', 'error')
-                return redirect(url_for('generate_report'))
-
-            unit = Unit.query.filter_by(name=employee.unit).first()
-            fiscal_name = unit.fiscal if unit else 'N/A'
-            field_fiscal_name = unit.field_fiscal if unit else 'N/A'
-            icj_contract = unit.icj_contract if unit else 'N/A'
-            sap_contract = unit.sap_contract if unit else 'N/A'
-
-            current_date = start_date
-            all_days = []
-            while current_date <= end_date:
-                all_days.append(current_date)
-                current_date += timedelta(days=1)
-
-            activities = Activity.query.filter_by(employee_id=employee.id).filter(
-                Activity.date >= start_date,
-                Activity.date <= end_date
-            ).all()
-
-            activities_dict = {
-                activity.date: {
-                    'date': activity.date.strftime('%d/%m/%Y'),
-                    'weekday': WEEKDAYS_PT[activity.date.weekday()],
-                    'description': activity.description,
-                    'project': activity.project or 'N/A',
-                    'location': activity.location or 'N/A',
-                    'type': activity.type or 'N/A',
-                    'hours': ((activity.end_datetime - activity.start_datetime).total_seconds() / 3600) if activity.start_datetime and activity.end_datetime else 'N/A'
-                } for activity in activities
-            }
-
-            report_data = {
-                'employer_code': employee.employer_code or 'N/A',
-                'name': employee.name,
-                'admission_date': employee.admission_date.strftime('%d/%m/%Y') if employee.admission_date else 'N/A',
-                'position': employee.position or 'N/A',
-                'unit': employee.unit or 'N/A',
-                'department': employee.department or 'N/A',
-                'phone': employee.phone or 'N/A',
-                'fiscal_name': fiscal_name,
-                'field_fiscal_name': field_fiscal_name,
-                'icj_contract': icj_contract,
-                'sap_contract': sap_contract,
-                'client': 'Accerth',
-                'manager': 'N/A',
-                'activities': []
-            }
-
-            for activity_date in all_days:
-                if activity_date in activities_dict:
-                    report_data['activities'].append(activities_dict[activity_date])
-                else:
-                    description = 'Não preenchível' if activity_date.weekday() >= 5 else 'Não preenchido'
-                    report_data['activities'].append({
-                        'date': activity_date.strftime('%d/%m/%Y'),
-                        'weekday': WEEKDAYS_PT[activity_date.weekday()],
-                        'description': description,
-                        'project': 'N/A',
-                        'location': 'N/A',
-                        'type': 'N/A',
-                        'hours': 'N/A'
-                    })
-
-            report_count = Report.query.filter_by(employee_id=employee.id).count()
-            report_number = f"#{report_count + 1}"
-            period = f"{start_date.month:02d}/{start_date.year}"
-
-            os.makedirs(app.config['REPORT_FOLDER'], exist_ok=True)
-
-            try:
-                if format_type == 'excel':
-                    df = pd.DataFrame(report_data['activities'])
-                    filename = secure_filename(f"report_{report_number}_{employee.id}.xlsx")
-                    file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
-                    print(f"Gerando Excel em: {file_path}")
-                    with pd.ExcelWriter(file_path, engine='xlsxwriter') as writer:
-                        df.to_excel(writer, sheet_name='Relatório Individual', index=False)
-                        worksheet = writer.sheets['Relatório Individual']
-                        worksheet.write(0, 0, f"Relatório Individual - {report_data['name']}")
-                        worksheet.write(1, 0, f"Matrícula: {report_data['employer_code']}")
-                        worksheet.write(2, 0, f"Data de Admissão: {report_data['admission_date']}")
-                        worksheet.write(3, 0, f"Função: {report_data['position']}")
-                        worksheet.write(4, 0, f"Unidade: {report_data['unit']}")
-                        worksheet.write(5, 0, f"Departamento: {report_data['department']}")
-                        worksheet.write(6, 0, f"Telefone: {report_data['phone']}")
-                    new_report = Report(
-                        employee_id=employee.id,
-                        report_number=report_number,
-                        period=period,
-                        format='Excel',
-                        file_path=file_path
-                    )
-                    db.session.add(new_report)
-                    db.session.commit()
-                    flash('Relatório em Excel gerado com sucesso!', 'success')
-                    return send_file(
-                        file_path,
-                        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                        as_attachment=True,
-                        download_name=filename
-                    )
-
-                elif format_type == 'pdf':
-                    filename = secure_filename(f"report_{report_number}_{employee.id}.pdf")
-                    file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
-                    print(f"Gerando PDF em: {file_path}")
-                    doc = SimpleDocTemplate(file_path, pagesize=A4, leftMargin=0, rightMargin=0, topMargin=0, bottomMargin=0)
-                    width, height = A4
-                    elements = []
-
-                    styles = getSampleStyleSheet()
-                    title_style = ParagraphStyle(
-                        name='Title',
-                        fontName='Helvetica-Bold',
-                        fontSize=10,
-                        textColor=colors.white,
-                        alignment=1,
-                        spaceAfter=2
-                    )
-                    normal_style = ParagraphStyle(
-                        name='Normal',
-                        fontName='Helvetica',
-                        fontSize=6,
-                        textColor=colors.black,
-                        spaceAfter=1,
-                        leading=7
-                    )
-                    italic_style = ParagraphStyle(
-                        name='Italic',
-                        fontName='Helvetica-Oblique',
-                        fontSize=6,
-                        textColor=colors.black,
-                        spaceAfter=1,
-                        leading=7
-                    )
-                    label_style = ParagraphStyle(
-                        name='Label',
-                        fontName='Helvetica',
-                        fontSize=6,
-                        textColor=colors.white,
-                        spaceAfter=1,
-                        leading=7
-                    )
-                    bold_style = ParagraphStyle(
-                        name='Bold',
-                        fontName='Helvetica-Bold',
-                        fontSize=7,
-                        textColor=colors.white,
-                        spaceAfter=2,
-                        alignment=1
-                    )
-
-                    logo_path = os.path.join('static', 'imagens', 'accerth.logo.jpg')
-                    if os.path.exists(logo_path):
-                        logo = Image(logo_path, width=3*cm, height=1.5*cm)
-                    else:
-                        print(f"Erro: Logo não encontrado em {logo_path}")
-                        logo = Paragraph("", normal_style)
-                    header_data = [
-                        [logo, Paragraph("RELATÓRIO DE ATIVIDADE DIÁRIA", title_style), Paragraph(f"Mês de Referência: {period}", title_style)]
-                    ]
-                    header_table = Table(header_data, colWidths=[3*cm, 9*cm, 9*cm], rowHeights=[1.5*cm])
-                    header_table.setStyle(TableStyle([
-                        ('BACKGROUND', (1, 0), (-1, -1), colors.black),
-                        ('TEXTCOLOR', (1, 0), (-1, -1), colors.white),
-                        ('BOX', (0, 0), (-1, -1), 0.5, colors.grey),
-                        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                        ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
-                        ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-                        ('LEFTPADDING', (0, 0), (0, 0), 0),
-                        ('LEFTPADDING', (1, 0), (-1, -1), 2),
-                        ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-                        ('TOPPADDING', (0, 0), (-1, -1), 2),
-                        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-                    ]))
-                    elements.append(header_table)
-                    elements.append(Spacer(1, 0.2*cm))
-
-                    left_info = [
-                        [Paragraph("<b>NOME:</b>", label_style), Paragraph(report_data['name'][:50] + ('...' if len(report_data['name']) > 50 else ''), normal_style)],
-                        [Paragraph("<b>DATA DE ADMISSÃO:</b>", label_style), Paragraph(report_data['admission_date'], normal_style)],
-                        [Paragraph("<b>FUNÇÃO:</b>", label_style), Paragraph(report_data['position'][:50] + ('...' if len(report_data['position']) > 50 else ''), normal_style)],
-                        [Paragraph("<b>EMPRESA:</b>", label_style), Paragraph(report_data['client'], normal_style)],
-                        [Paragraph("<b>CONTRATO ICJ N°:</b>", label_style), Paragraph(report_data['icj_contract'], normal_style)],
-                        [Paragraph("<b>CONTRATO SAP N°:</b>", label_style), Paragraph(report_data['sap_contract'], normal_style)],
-                    ]
-                    right_info = [
-                        [Paragraph("<b>N° DO RELATÓRIO:</b>", label_style), Paragraph(report_number, normal_style)],
-                        [Paragraph("<b>CLIENTE:</b>", label_style), Paragraph(report_data['client'], normal_style)],
-                        [Paragraph("<b>UNIDADE:</b>", label_style), Paragraph(report_data['unit'][:50] + ('...' if len(report_data['unit']) > 50 else ''), normal_style)],
-                        [Paragraph("<b>GERENTE:</b>", label_style), Paragraph(report_data['manager'], normal_style)],
-                        [Paragraph("<b>FISCAL:</b>", label_style), Paragraph(report_data['fiscal_name'][:50] + ('...' if len(report_data['fiscal_name']) > 50 else ''), normal_style)],
-                        [Paragraph("<b>FISCAL DE CAMPO:</b>", label_style), Paragraph(report_data['field_fiscal_name'][:50] + ('...' if len(report_data['field_fiscal_name']) > 50 else ''), normal_style)],
-                    ]
-                    left_info_table = Table(left_info, colWidths=[5.25*cm, 5.25*cm], rowHeights=[0.6*cm]*6)
-                    left_info_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (0, -1), colors.black),
-                        ('BACKGROUND', (1, 0), (1, -1), colors.white),
-                        ('BOX', (0, 0), (-1, -1), 0.5, colors.grey),
-                        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                        ('LEFTPADDING', (0, 0), (-1, -1), 2),
-                        ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-                        ('TOPPADDING', (0, 0), (-1, -1), 1),
-                        ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
-                    ]))
-                    right_info_table = Table(right_info, colWidths=[5.25*cm, 5.25*cm], rowHeights=[0.6*cm]*6)
-                    right_info_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (0, -1), colors.black),
-                        ('BACKGROUND', (1, 0), (1, -1), colors.white),
-                        ('BOX', (0, 0), (-1, -1), 0.5, colors.grey),
-                        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                        ('LEFTPADDING', (0, 0), (-1, -1), 2),
-                        ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-                        ('TOPPADDING', (0, 0), (-1, -1), 1),
-                        ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
-                    ]))
-                    info_table = Table([[left_info_table, right_info_table]], colWidths=[10.5*cm, 10.5*cm])
-                    info_table.setStyle(TableStyle([
-                        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-                        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-                        ('TOPPADDING', (0, 0), (-1, -1), 0),
-                        ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
-                    ]))
-                    elements.append(info_table)
-                    elements.append(Spacer(1, 0.2*cm))
-
-                    header_activity = [
-                        [Paragraph("DATA", bold_style), Paragraph("RESUMO SOBRE AS ATIVIDADES", bold_style)]
-                    ]
-                    header_activity_table = Table(header_activity, colWidths=[3*cm, 18*cm], rowHeights=[0.5*cm])
-                    header_activity_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, -1), colors.black),
-                        ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
-                        ('BOX', (0, 0), (-1, -1), 0.5, colors.grey),
-                        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                        ('LEFTPADDING', (0, 0), (-1, -1), 2),
-                        ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-                        ('TOPPADDING', (0, 0), (-1, -1), 1),
-                        ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
-                    ]))
-                    elements.append(header_activity_table)
-
-                    for activity in report_data['activities']:
-                        date_subtable = [
-                            [Paragraph(activity['date'], label_style), Paragraph(activity['weekday'], normal_style)]
-                        ]
-                        activity_subtable = [
-                            [Paragraph(activity['description'][:100] + ('...' if len(activity['description']) > 100 else ''), italic_style if activity['description'] == 'Não preenchível' else normal_style)]
-                        ]
-                        date_table = Table(date_subtable, colWidths=[1.5*cm, 1.5*cm], rowHeights=[0.5*cm])
-                        date_table.setStyle(TableStyle([
-                            ('BACKGROUND', (0, 0), (0, 0), colors.black),
-                            ('BACKGROUND', (1, 0), (1, 0), colors.tan),
-                            ('TEXTCOLOR', (0, 0), (0, 0), colors.white),
-                            ('TEXTCOLOR', (1, 0), (1, 0), colors.black),
-                            ('BOX', (0, 0), (-1, -1), 0.5, colors.grey),
-                            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                            ('LEFTPADDING', (0, 0), (-1, -1), 2),
-                            ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-                            ('TOPPADDING', (0, 0), (-1, -1), 1),
-                            ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
-                        ]))
-                        activity_table = Table(activity_subtable, colWidths=[18*cm], rowHeights=[0.5*cm])
-                        activity_table.setStyle(TableStyle([
-                            ('BACKGROUND', (0, 0), (0, 0), colors.lightgrey if activity['description'] == 'Não preenchível' else colors.white),
-                            ('TEXTCOLOR', (0, 0), (0, 0), colors.black),
-                            ('BOX', (0, 0), (-1, -1), 0.5, colors.grey),
-                            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                            ('LEFTPADDING', (0, 0), (-1, -1), 2),
-                            ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-                            ('TOPPADDING', (0, 0), (-1, -1), 1),
-                            ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
-                        ]))
-                        combined_table = Table([[date_table, activity_table]], colWidths=[3*cm, 18*cm])
-                        combined_table.setStyle(TableStyle([
-                            ('BOX', (0, 0), (-1, -1), 0.5, colors.grey),
-                            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                            ('LEFTPADDING', (0, 0), (-1, -1), 0),
-                            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-                            ('TOPPADDING', (0, 0), (-1, -1), 0),
-                            ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
-                        ]))
-                        elements.append(combined_table)
-
-                    current_date = datetime.now().strftime('%d/%m/%Y')
-                    signature_data = [
-                        [Paragraph(f"Data: {current_date}", normal_style), Paragraph("Assinatura Funcionário:", normal_style)],
-                        [Paragraph("Data: __/__/____", normal_style), Paragraph("Assinatura Fiscal:", normal_style)],
-                        [Paragraph("Data: __/__/____", normal_style), Paragraph("Assinatura Preposto:", normal_style)]
-                    ]
-                    signature_table = Table(signature_data, colWidths=[4*cm, 14*cm], rowHeights=[1.0*cm]*3)
-                    signature_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, -1), colors.white),
-                        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                        ('BOX', (0, 0), (-1, -1), 0.5, colors.grey),
-                        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                        ('LEFTPADDING', (0, 0), (-1, -1), 2),
-                        ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-                        ('TOPPADDING', (0, 0), (-1, -1), 1),
-                        ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
-                    ]))
-                    signature_wrapper = Table([[Spacer(1, 0*cm), signature_table]], colWidths=[3*cm, 18*cm])
-                    signature_wrapper.setStyle(TableStyle([
-                        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-                        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-                        ('TOPPADDING', (0, 0), (-1, -1), 0),
-                        ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
-                    ]))
-                    elements.append(signature_wrapper)
-
-                    print("Construindo PDF...")
-                    doc.build(elements)
-                    print("PDF construído com sucesso")
-
-                    new_report = Report(
-                        employee_id=employee.id,
-                        report_number=report_number,
-                        period=period,
-                        format='PDF',
-                        file_path=file_path
-                    )
-                    db.session.add(new_report)
-                    db.session.commit()
-                    flash('Relatório em PDF gerado com sucesso!', 'success')
-                    return send_file(
-                        file_path,
-                        mimetype='application/pdf',
-                        as_attachment=True,
-                        download_name=filename
-                    )
+                return jsonify({'success': False, 'message': 'Formato de data inválido! Use AAAA-MM-DD.'}), 400
 
-            except Exception as e:
-                db.session.rollback()
-                print(f"Erro ao gerar relatório: {str(e)}")
-                traceback.print_exc()
-                flash(f'Erro ao gerar relatório: {str(e)}', 'error')
-                return redirect(url_for('generate_report'))
+            return enqueue_report('individual', employee.id, {
+                'employee_id': employee.id,
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat(),
+                'format': format_type
+            })
 
         return render_template('generate_report.html', employee_name=employee.name)
 
@@ -1839,321 +2326,47 @@ def generate_report():
 
             print(f"Recebido: start_date={start_date_str}, end_date={end_date_str}, format={format_type}")
 
-            if not start_date_str or not end_date_str or not format_type:
+            if not start_date_str or not end_date_str or format_type not in ('excel', 'pdf'):
                 print("Erro: Campos do formulário ausentes")
-                flash('Todos os campos (data inicial, data final e formato) são obrigatórios.', 'error')
-                return redirect(url_for('generate_report'))
+                return jsonify({'success': False, 'message': 'Todos os campos (data inicial, data final e formato) são obrigatórios.'}), 400
 
             try:
                 start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
                 end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
                 if start_date > end_date:
                     print("Erro: Data de início posterior à data de fim")
-                    flash('Data de início não pode ser posterior à data de fim.', 'error')
-                    return redirect(url_for('generate_report'))
+                    return jsonify({'success': False, 'message': 'Data de início não pode ser posterior à data de fim.'}), 400
             except ValueError as e:
                 print(f"Erro de validação de data: {str(e)}")
-                flash('Formato de data inválido! Use AAAA-MM-DD.', 'error')
-                return redirect(url_for('generate_report'))
+                return jsonify({'success': False, 'message': 'Formato de data inválido! Use AAAA-MM-DD.'}), 400
 
             unit = Unit.query.filter_by(employer_id=employee.id).first()
             if not unit:
                 print("Erro: unidade não encontrada para o empregador")
-                flash('Unidade não encontrada.', 'error')
-                return redirect(url_for('generate_report'))
+                return jsonify({'success': False, 'message': 'Unidade não encontrada.'}), 404
 
             employees = Employee.query.filter_by(unit=unit.name).all()
             if not employees:
                 print("Erro: nenhum funcionário encontrado na unidade")
-                flash('Nenhum funcionário encontrado na unidade.', 'error')
-                return redirect(url_for('generate_report'))
-
-            current_date = start_date
-            all_days = []
-            while current_date <= end_date:
-                all_days.append(current_date)
-                current_date += timedelta(days=1)
-
-            consolidated_activities = []
-            for emp in employees:
-                activities = Activity.query.filter_by(employee_id=emp.id).filter(
-                    Activity.date >= start_date,
-                    Activity.date <= end_date
-                ).all()
-                activities_dict = {
-                    activity.date: {
-                        'date': activity.date.strftime('%d/%m/%Y'),
-                        'weekday': WEEKDAYS_PT[activity.date.weekday()],
-                        'description': activity.description,
-                        'project': activity.project or 'N/A',
-                        'location': activity.location or 'N/A',
-                        'type': activity.type or 'N/A',
-                        'hours': ((activity.end_datetime - activity.start_datetime).total_seconds() / 3600) if activity.start_datetime and activity.end_datetime else 'N/A',
-                        'employee_name': emp.name,
-                        'employer_code': emp.employer_code
-                    } for activity in activities
-                }
-
-                for activity_date in all_days:
-                    if activity_date in activities_dict:
-                        consolidated_activities.append(activities_dict[activity_date])
-                    else:
-                        description = 'Não preenchível' if activity_date.weekday() >= 5 else 'Não preenchido'
-                        consolidated_activities.append({
-                            'date': activity_date.strftime('%d/%m/%Y'),
-                            'weekday': WEEKDAYS_PT[activity.date.weekday()],
-                            'description': description,
-                            'project': 'N/A',
-                            'location': 'N/A',
-                            'type': 'N/A',
-                            'hours': 'N/A',
-                            'employee_name': emp.name,
-                            'employer_code': emp.employer_code
-                        })
-
-            report_data = {
+                return jsonify({'success': False, 'message': 'Nenhum funcionário encontrado na unidade.'}), 400
+
+            return enqueue_report('consolidated', employee.id, {
+                'employee_id': employee.id,
                 'unit': unit.name,
-                'fiscal_name': unit.fiscal if unit else 'N/A',
-                'field_fiscal_name': unit.field_fiscal if unit else 'N/A',
-                'icj_contract': unit.icj_contract if unit else 'N/A',
-                'sap_contract': unit.sap_contract if unit else 'N/A',
-                'client': 'Accerth',
-                'manager': 'N/A',
-                'activities': consolidated_activities
-            }
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat(),
+                'format': format_type
+            })
 
-            report_count = Report.query.count()
-            report_number = f"#{report_count + 1}"
-            period = f"{start_date.month:02d}/{start_date.year}"
+        return render_template('generate_report.html', employee_name=employee.name)
 
-            os.makedirs(app.config['REPORT_FOLDER'], exist_ok=True)
+    return render_template('generate_report.html', employee_name=employee.name)
 
-            try:
-                if format_type == 'excel':
-                    df = pd.DataFrame(report_data['activities'])
-                    filename = secure_filename(f"consolidated_report_{report_number}.xlsx")
-                    file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
-                    print(f"Gerando Excel em: {file_path}")
-                    with pd.ExcelWriter(file_path, engine='xlsxwriter') as writer:
-                        df.to_excel(writer, sheet_name='Relatório Consolidado', index=False)
-                        worksheet = writer.sheets['Relatório Consolidado']
-                        worksheet.write(0, 0, f"Relatório Consolidado - Unidade: {report_data['unit']}")
-                        worksheet.write(1, 0, f"Contrato ICJ: {report_data['icj_contract']}")
-                        worksheet.write(2, 0, f"Contrato SAP: {report_data['sap_contract']}")
-                        worksheet.write(3, 0, f"Fiscal: {report_data['fiscal_name']}")
-                        worksheet.write(4, 0, f"Fiscal de Campo: {report_data['field_fiscal_name']}")
-                    new_report = Report(
-                        employee_id=employee.id,
-                        report_number=report_number,
-                        period=period,
-                        format='Excel',
-                        file_path=file_path
-                    )
-                    db.session.add(new_report)
-                    db.session.commit()
-                    flash('Relatório consolidado em Excel gerado com sucesso!', 'success')
-                    return send_file(
-                        file_path,
-                        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                        as_attachment=True,
-                        download_name=filename
-                    )
-
-                elif format_type == 'pdf':
-                    filename = secure_filename(f"consolidated_report_{report_number}.pdf")
-                    file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
-                    print(f"Gerando PDF em: {file_path}")
-                    doc = SimpleDocTemplate(file_path, pagesize=A4, leftMargin=1.5*cm, rightMargin=1.5*cm, topMargin=1.5*cm, bottomMargin=1*cm)
-                    width, height = A4
-                    elements = []
-
-                    styles = getSampleStyleSheet()
-                    title_style = ParagraphStyle(
-                        name='Title',
-                        fontName='Helvetica-Bold',
-                        fontSize=10,
-                        textColor=colors.white,
-                        alignment=1,
-                        spaceAfter=2
-                    )
-                    normal_style = ParagraphStyle(
-                        name='Normal',
-                        fontName='Helvetica',
-                        fontSize=6,
-                        textColor=colors.black,
-                        spaceAfter=1,
-                        leading=7
-                    )
-                    italic_style = ParagraphStyle(
-                        name='Italic',
-                        fontName='Helvetica-Oblique',
-                        fontSize=6,
-                        textColor=colors.black,
-                        spaceAfter=1,
-                        leading=7
-                    )
-                    label_style = ParagraphStyle(
-                        name='Label',
-                        fontName='Helvetica',
-                        fontSize=6,
-                        textColor=colors.white,
-                        spaceAfter=1,
-                        leading=7
-                    )
-                    bold_style = ParagraphStyle(
-                        name='Bold',
-                        fontName='Helvetica-Bold',
-                        fontSize=7,
-                        textColor=colors.white,
-                        spaceAfter=2,
-                        alignment=1
-                    )
-
-                    def draw_page_background(canvas, doc):
-                        canvas.saveState()
-                        canvas.setFillColor(colors.black)
-                        canvas.rect(0, 0, width, height, fill=1)
-                        canvas.restoreState()
-
-                    logo_path = os.path.join('static', 'imagens', 'accerth.logo.jpg')
-                    if os.path.exists(logo_path):
-                        logo = Image(logo_path, width=3*cm, height=1.5*cm)
-                    else:
-                        print(f"Erro: Logo não encontrado em {logo_path}")
-                        logo = Paragraph("", normal_style)
-                    header_data = [
-                        [logo, Paragraph("RELATÓRIO CONSOLIDADO DE ATIVIDADES", title_style), Paragraph(f"Mês de Referência: {period}", title_style)]
-                    ]
-                    header_table = Table(header_data, colWidths=[3*cm, 7*cm, 7*cm], rowHeights=[1.5*cm])
-                    header_table.setStyle(TableStyle([
-                        ('BACKGROUND', (1, 0), (-1, -1), colors.black),
-                        ('TEXTCOLOR', (1, 0), (-1, -1), colors.white),
-                        ('BOX', (0, 0), (-1, -1), 0.5, colors.grey),
-                        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                        ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
-                        ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-                        ('LEFTPADDING', (0, 0), (0, 0), 0),
-                        ('LEFTPADDING', (1, 0), (-1, -1), 2),
-                        ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-                        ('TOPPADDING', (0, 0), (-1, -1), 2),
-                        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-                    ]))
-                    elements.append(header_table)
-                    elements.append(Spacer(1, 0.2*cm))
-
-                    info_data = [
-                        [Paragraph("<b>UNIDADE:</b>", label_style), Paragraph(report_data['unit'][:50] + ('...' if len(report_data['unit']) > 50 else ''), normal_style)],
-                        [Paragraph("<b>CONTRATO ICJ N°:</b>", label_style), Paragraph(report_data['icj_contract'], normal_style)],
-                        [Paragraph("<b>CONTRATO SAP N°:</b>", label_style), Paragraph(report_data['sap_contract'], normal_style)],
-                        [Paragraph("<b>FISCAL:</b>", label_style), Paragraph(report_data['fiscal_name'][:50] + ('...' if len(report_data['fiscal_name']) > 50 else ''), normal_style)],
-                        [Paragraph("<b>FISCAL DE CAMPO:</b>", label_style), Paragraph(report_data['field_fiscal_name'][:50] + ('...' if len(report_data['field_fiscal_name']) > 50 else ''), normal_style)],
-                    ]
-                    info_table = Table(info_data, colWidths=[4.25*cm, 12.25*cm], rowHeights=[0.6*cm]*5)
-                    info_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (0, -1), colors.black),
-                        ('BACKGROUND', (1, 0), (1, -1), colors.lightyellow),
-                        ('BOX', (0, 0), (-1, -1), 0.5, colors.grey),
-                        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                        ('LEFTPADDING', (0, 0), (-1, -1), 2),
-                        ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-                        ('TOPPADDING', (0, 0), (-1, -1), 1),
-                        ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
-                    ]))
-                    elements.append(info_table)
-                    elements.append(Spacer(1, 0.2*cm))
-
-                    header_activity = [
-                        [Paragraph("DATA", bold_style), Paragraph("FUNCIONÁRIO", bold_style), Paragraph("RESUMO DAS ATIVIDADES", bold_style)]
-                    ]
-                    header_activity_table = Table(header_activity, colWidths=[3*cm, 5*cm, 9*cm], rowHeights=[0.5*cm])
-                    header_activity_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, -1), colors.black),
-                        ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
-                        ('BOX', (0, 0), (-1, -1), 0.5, colors.grey),
-                        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                        ('LEFTPADDING', (0, 0), (-1, -1), 2),
-                        ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-                        ('TOPPADDING', (0, 0), (-1, -1), 1),
-                        ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
-                    ]))
-                    elements.append(header_activity_table)
-
-                    for activity in report_data['activities']:
-                        date_subtable = [
-                            [Paragraph(activity['date'], label_style), Paragraph(activity['weekday'], normal_style)]
-                        ]
-                        activity_subtable = [
-                            [Paragraph(activity['employee_name'][:50] + ('...' if len(activity['employee_name']) > 50 else ''), normal_style)],
-                            [Paragraph(activity['description'][:100] + ('...' if len(activity['description']) > 100 else ''), italic_style if activity['description'] == 'Não preenchível' else normal_style)]
-                        ]
-                        date_table = Table(date_subtable, colWidths=[1.5*cm, 1.5*cm], rowHeights=[0.5*cm])
-                        date_table.setStyle(TableStyle([
-                            ('BACKGROUND', (0, 0), (0, 0), colors.black),
-                            ('BACKGROUND', (1, 0), (1, 0), colors.tan),
-                            ('TEXTCOLOR', (0, 0), (0, 0), colors.white),
-                            ('TEXTCOLOR', (1, 0), (1, 0), colors.black),
-                            ('BOX', (0, 0), (-1, -1), 0.5, colors.grey),
-                            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                            ('LEFTPADDING', (0, 0), (-1, -1), 2),
-                            ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-                            ('TOPPADDING', (0, 0), (-1, -1), 1),
-                            ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
-                        ]))
-                        activity_table = Table(activity_subtable, colWidths=[9*cm], rowHeights=[0.6*cm, 0.6*cm])
-                        activity_table.setStyle(TableStyle([
-                            ('BACKGROUND', (0, 0), (-1, -1), colors.white),
-                            ('BOX', (0, 0), (-1, -1), 0.5, colors.grey),
-                            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                            ('LEFTPADDING', (0, 0), (-1, -1), 2),
-                            ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-                            ('TOPPADDING', (0, 0), (-1, -1), 1),
-                            ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
-                        ]))
-                        combined_table = Table([[date_table, activity_table]], colWidths=[3*cm, 9*cm])
-                        elements.append(combined_table)
-
-                    print("Construindo PDF...")
-                    doc.build(elements, onFirstPage=draw_page_background, onLaterPages=draw_page_background)
-                    print("PDF construído com sucesso")
-
-                    new_report = Report(
-                        employee_id=employee.id,
-                        report_number=report_number,
-                        period=period,
-                        format='PDF',
-                        file_path=file_path
-                    )
-                    db.session.add(new_report)
-                    db.session.commit()
-                    flash('Relatório consolidado em PDF gerado com sucesso!', 'success')
-                    return send_file(
-                        file_path,
-                        mimetype='application/pdf',
-                        as_attachment=True,
-                        download_name=filename
-                    )
-
-            except Exception as e:
-                db.session.rollback()
-                print(f"Erro ao gerar relatório consolidado: {str(e)}")
-                traceback.print_exc()
-                flash(f'Erro ao gerar relatório consolidado: {str(e)}', 'error')
-                return redirect(url_for('generate_report'))
-
-        return render_template('generate_report.html', employee_name=employee.name)
-
-    return render_template('generate_report.html', employee_name=employee.name)
-
-@app.route('/check_pending_activities', methods=['POST'])
-def check_pending_activities():
-    try:
-        if 'employee_id' not in session or session['role'] != 'funcionario':
-            return jsonify({'success': False, 'message': 'Acesso não autorizado.'}), 403
+@app.route('/check_pending_activities', methods=['POST'])
+def check_pending_activities():
+    try:
+        if 'employee_id' not in session or session['role'] != 'funcionario':
+            return jsonify({'success': False, 'message': 'Acesso não autorizado.'}), 403
 
         data = request.get_json()
         start_date_str = data.get('start_date')
@@ -2166,15 +2379,8 @@ def check_pending_activities():
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
         end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
 
-        # Verificar todos os dias úteis no período
-        current_date = start_date
-        missing_days = []
-        while current_date <= end_date:
-            if current_date.weekday() < 5:  # Dias úteis (segunda a sexta)
-                activity = Activity.query.filter_by(employee_id=session['employee_id'], date=current_date).first()
-                if not activity:
-                    missing_days.append(current_date.strftime('%d/%m/%Y'))
-            current_date += timedelta(days=1)
+        # Verificar todos os dias úteis no período (uma consulta)
+        missing_days = [day.strftime('%d/%m/%Y') for day in missing_business_days(session['employee_id'], start_date, end_date)]
 
         if missing_days:
             return jsonify({
@@ -2224,7 +2430,46 @@ def track_reports():
 
     return render_template('track_reports.html', employee_name=session['employee_name'], reports=reports)
 
+# Listagens de relatórios paginadas por cursor (keyset) em (created_at, id): cada
+# página custa o mesmo, independentemente de quantos relatórios existam antes dela
+REPORTS_PAGE_SIZE = 50
+REPORTS_MAX_PAGE_SIZE = 200
+
+def encode_report_cursor(report):
+    return f"{report.created_at.strftime('%Y%m%d%H%M%S%f')}-{report.id}"
+
+def decode_report_cursor(cursor):
+    """(created_at, id) do último relatório da página anterior; None se ausente ou inválido."""
+    try:
+        created_at, report_id = cursor.split('-')
+        return datetime.strptime(created_at, '%Y%m%d%H%M%S%f'), int(report_id)
+    except (AttributeError, ValueError):
+        return None
+
+def paginate_reports(query, cursor=None, page_size=REPORTS_PAGE_SIZE):
+    """Página de (Report, Employee) do mais recente para o mais antigo.
+
+    Retorna (linhas, cursor da próxima página ou None).
+    """
+    position = decode_report_cursor(cursor)
+    if position:
+        created_at, report_id = position
+        query = query.filter(db.or_(
+            Report.created_at < created_at,
+            db.and_(Report.created_at == created_at, Report.id < report_id)
+        ))
+    rows = query.order_by(Report.created_at.desc(), Report.id.desc()).limit(page_size + 1).all()
+    next_cursor = encode_report_cursor(rows[page_size - 1][0]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+def report_unit_names():
+    # Unidades dos funcionários, direto do índice/tabela, sem carregar os funcionários
+    return [unit for (unit,) in db.session.query(Employee.unit).filter(
+        Employee.unit.isnot(None), Employee.unit != ''
+    ).distinct().order_by(Employee.unit)]
+
 @app.route('/employer_reports', methods=['GET'])
+@read_replica
 def employer_reports():
     if 'employee_id' not in session:
         print("Erro: employee_id não encontrado na sessão")
@@ -2237,14 +2482,21 @@ def employer_reports():
 
     print(f"Acessando employer_reports para employee_id: {session.get('employee_id')}")
 
-    reports = db.session.query(Report, Employee).join(Employee, Report.employee_id == Employee.id).order_by(Report.created_at.desc()).all()
-    units = sorted(set(employee.unit for employee in Employee.query.all() if employee.unit))
+    unit = request.args.get('unit', '')
+    cursor = request.args.get('cursor')
+    query = db.session.query(Report, Employee).join(Employee, Report.employee_id == Employee.id)
+    if unit:
+        query = query.filter(Employee.unit == unit)
+    reports, next_cursor = paginate_reports(query, cursor)
 
     return render_template('employer_reports.html',
                            employee_name=session['employee_name'],
                            role=session['role'],
                            reports=reports,
-                           units=units)
+                           units=report_unit_names(),
+                           selected_unit=unit,
+                           cursor=cursor,
+                           next_cursor=next_cursor)
 
 @app.route('/download_report/<int:report_id>')
 def download_report(report_id):
@@ -2278,6 +2530,52 @@ def download_report(report_id):
         flash(f'Erro ao baixar relatório: {str(e)}', 'error')
         return redirect(url_for('track_reports' if session['role'] == 'colaborador' else 'employer_reports'))
 
+@app.route('/report_jobs/<job_id>', methods=['GET'])
+def report_job_status(job_id):
+    if 'employee_id' not in session:
+        return jsonify({'success': False, 'message': 'Por favor, faça login.'}), 401
+
+    job = ReportJob.query.get(job_id)
+    if not job or job.employee_id != session['employee_id']:
+        return jsonify({'success': False, 'message': 'Relatório não encontrado.'}), 404
+
+    data = {
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'progress': job.progress
+    }
+    if job.status == JOB_DONE:
+        data['download_url'] = url_for('download_report_job', job_id=job.id)
+    elif job.status == JOB_FAILED:
+        data['message'] = f'Erro ao gerar relatório: {job.error}'
+    return jsonify(data)
+
+@app.route('/report_jobs/<job_id>/download', methods=['GET'])
+def download_report_job(job_id):
+    if 'employee_id' not in session:
+        print("Erro: employee_id não encontrado na sessão")
+        flash('Por favor, faça login.', 'error')
+        return redirect(url_for('index'))
+
+    job = ReportJob.query.get(job_id)
+    if not job or job.employee_id != session['employee_id']:
+        return jsonify({'success': False, 'message': 'Relatório não encontrado.'}), 404
+    if job.status != JOB_DONE:
+        return jsonify({'success': False, 'message': 'O relatório ainda não está pronto.', 'status': job.status}), 409
+
+    report = Report.query.get(job.report_id) if job.report_id else None
+    if not report or not os.path.exists(report.file_path):
+        return jsonify({'success': False, 'message': 'Arquivo do relatório não encontrado.'}), 404
+
+    print(f"Baixando relatório {report.id} do job {job.id} para employee_id: {session.get('employee_id')}")
+    return send_file(
+        report.file_path,
+        mimetype='application/pdf' if report.format == 'PDF' else 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name=os.path.basename(report.file_path)
+    )
+
 @app.route('/validate_period', methods=['POST'])
 def validate_period():
     if 'employee_id' not in session:
@@ -2299,171 +2597,266 @@ def validate_period():
     except ValueError:
         return jsonify({'status': 'error', 'message': 'Formato de data inválido! Use AAAA-MM-DD.'}), 400
 
-    employees = Employee.query.filter_by(role='colaborador').all()
+    employees = db.session.query(Employee.id, Employee.name, Employee.employer_code, Employee.unit).filter_by(
+        role='colaborador'
+    ).order_by(Employee.unit, Employee.name).all()
+    weekdays = count_weekdays(start_date, end_date)
+
+    # Dias registrados de todos os colaboradores em uma consulta agrupada por
+    # funcionário (meses inteiros vêm de monthly_summary). Quem registrou todas
+    # as segundas a sextas não tem falta; para os demais, as datas registradas
+    # são comparadas aos dias úteis da unidade (sem os feriados)
+    registered = registered_business_days(db, start_date, end_date, employee_ids=[employee.id for employee in employees])
+    incomplete = [employee.id for employee in employees if registered.get(employee.id, 0) < weekdays]
+    registered_dates = registered_business_dates(db, start_date, end_date, incomplete)
+
+    units = {}
+    business_days = {}
     summary = []
-
     for employee in employees:
-        current_date = start_date
-        weekdays = 0
-        while current_date <= end_date:
-            if current_date.strftime('%A') not in ['Saturday', 'Sunday']:
-                weekdays += 1
-            current_date += timedelta(days=1)
-
-        activities = Activity.query.filter_by(employee_id=employee.id).filter(
-            Activity.date >= start_date,
-            Activity.date <= end_date
-        ).count()
-
-        missing_days = weekdays - activities
+        if employee.unit not in business_days:
+            business_days[employee.unit] = list(iter_business_days(start_date, end_date, employee.unit))
+        unit_days = business_days[employee.unit]
+        activities = registered.get(employee.id, 0)
+        if employee.id in registered_dates:
+            dates = registered_dates[employee.id]
+            missing_dates = [day.isoformat() for day in unit_days if day not in dates]
+        else:
+            missing_dates = []
+        missing_days = len(missing_dates)
 
+        units.setdefault(employee.unit, []).append({
+            'id': employee.id,
+            'name': employee.name,
+            'employer_code': employee.employer_code,
+            'registered_days': activities,
+            'missing_days': missing_days,
+            'missing_dates': missing_dates,
+        })
         summary.append(f"Funcionário: {employee.name}, Matrícula: {employee.employer_code or 'N/A'}, "
-                       f"Dias Úteis: {weekdays}, Atividades Registradas: {activities}, Dias Faltantes: {missing_days}")
+                       f"Dias Úteis: {len(unit_days)}, Atividades Registradas: {activities}, Dias Faltantes: {missing_days}")
 
     return jsonify({
         'status': 'success',
         'message': 'Validação concluída com sucesso!',
-        'summary': '\n'.join(summary)
+        'business_days': count_business_days(start_date, end_date),  # Sem feriados de unidade
+        'units': [
+            {
+                'unit': unit or 'Sem unidade',
+                'business_days': len(business_days[unit]),
+                'employees': unit_employees,
+                'missing_days': sum(employee['missing_days'] for employee in unit_employees),
+            }
+            for unit, unit_employees in units.items()
+        ],
+        'summary': '\n'.join(summary)  # Texto usado no alerta da tela inicial
     })
 
-@app.route('/generate_employer_report', methods=['POST'])
-def generate_employer_report():
-    if 'employee_id' not in session:
-        return jsonify({'status': 'error', 'message': 'Por favor, faça login.'}), 401
-    if session['role'] != 'empregador':
-        return jsonify({'status': 'error', 'message': 'Acesso não autorizado.'}), 403
+@cached_report_job('employer')
+def build_employer_report(params, progress):
+    """Relatório consolidado de todos os colaboradores, pedido na tela inicial do empregador."""
+    start_date, end_date = report_job_dates(params)
+    format_type = params['format']
 
-    print(f"Gerando relatório consolidado para employee_id: {session.get('employee_id')}")
+    employees = Employee.query.filter_by(role='colaborador').all()
 
-    data = request.get_json()
-    start_date_str = data.get('start_date')
-    end_date_str = data.get('end_date')
-    format_type = data.get('format', 'pdf')
+    report_number = next_report_number(report_sequence_owner(params['employee_id']))
+    period = f"{start_date.month:02d}/{start_date.year}"
+
+    os.makedirs(app.config['REPORT_FOLDER'], exist_ok=True)
+    progress(50)
+
+    from report_excel import write_employees_excel
+    from report_render import write_employees_pdf
 
     try:
-        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-        if start_date > end_date:
-            return jsonify({'status': 'error', 'message': 'Data de início não pode ser posterior à data de fim.'}), 400
-    except ValueError:
-        return jsonify({'status': 'error', 'message': 'Formato de data inválido! Use AAAA-MM-DD.'}), 400
+        if format_type == 'excel':
+            filename = secure_filename(f"consolidated_report_{report_number}.xlsx")
+            file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
+            write_employees_excel(file_path, iter_employee_activities(employees, start_date, end_date), 'Relatório Consolidado')
+            new_report = Report(
+                employee_id=params['employee_id'],
+                report_number=report_number,
+                period=period,
+                format='Excel',
+                file_path=file_path
+            )
+            db.session.add(new_report)
+            db.session.commit()
+            return new_report
 
-    employees = Employee.query.filter_by(role='colaborador').all()
-    report_data = []
+        elif format_type == 'pdf':
+            filename = secure_filename(f"consolidated_report_{report_number}.pdf")
+            file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
+            report_data = employees_report_data(employees, start_date, end_date)
+            progress(70)
+            write_employees_pdf(file_path, report_data, 'Relatório Consolidado',
+                                signature=('Assinatura', 'Assinatura: _______________________________'),
+                                workers=app.config['REPORT_RENDER_WORKERS'])
+            new_report = Report(
+                employee_id=params['employee_id'],
+                report_number=report_number,
+                period=period,
+                format='PDF',
+                file_path=file_path
+            )
+            db.session.add(new_report)
+            db.session.commit()
+            return new_report
 
-    for employee in employees:
-        activities = Activity.query.filter_by(employee_id=employee.id).filter(
-            Activity.date >= start_date,
-            Activity.date <= end_date
-        ).all()
+    except Exception as e:
+        print(f"Erro ao gerar relatório consolidado: {str(e)}")
+        raise
+
+@cached_report_job('preposto')
+def build_preposto_report(params, progress):
+    """Relatório dos colaboradores da unidade do preposto (todos ou um selecionado)."""
+    start_date, end_date = report_job_dates(params)
+    format_type = params['format']
+    if params.get('employee_id'):
+        employees = Employee.query.filter_by(id=params['employee_id'], unit=params['unit'], role='colaborador').all()
+    else:
+        employees = Employee.query.filter_by(unit=params['unit'], role='colaborador').all()
 
-        employee_data = {
-            'employer_code': employee.employer_code or 'N/A',
-            'name': employee.name,
-            'admission_date': employee.admission_date.strftime('%d/%m/%Y') if employee.admission_date else 'N/A',
-            'position': employee.position or 'N/A',
-            'unit': employee.unit or 'N/A',
-            'department': employee.department or 'N/A',
-            'phone': employee.phone or 'N/A',
-            'activities': [
-                {
-                    'date': activity.date.strftime('%d/%m/%Y'),
-                    'description': activity.description,
-                    'project': activity.project or 'N/A',
-                    'location': activity.location or 'N/A',
-                    'type': activity.type or 'N/A',
-                    'hours': ((activity.end_datetime - activity.start_datetime).total_seconds() / 3600) if activity.start_datetime and activity.end_datetime else 'N/A'
-                } for activity in activities
-            ]
-        }
-        report_data.append(employee_data)
+    report_number = next_report_number(report_sequence_owner(params['preposto_id']))
+    period = f"{start_date.month:02d}/{start_date.year}"
+
+    os.makedirs(app.config['REPORT_FOLDER'], exist_ok=True)
+    progress(50)
+
+    from report_excel import write_employees_excel
+    from report_render import write_employees_pdf
+
+    try:
+        if format_type == 'excel':
+            filename = secure_filename(f"preposto_report_{report_number}.xlsx")
+            file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
+            write_employees_excel(file_path, iter_employee_activities(employees, start_date, end_date), 'Relatório Preposto')
+            new_report = Report(
+                employee_id=params['preposto_id'],
+                report_number=report_number,
+                period=period,
+                format='Excel',
+                file_path=file_path
+            )
+            db.session.add(new_report)
+            db.session.commit()
+            return new_report
+
+        elif format_type == 'pdf':
+            filename = secure_filename(f"preposto_report_{report_number}.pdf")
+            file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
+            report_data = employees_report_data(employees, start_date, end_date)
+            progress(70)
+            write_employees_pdf(file_path, report_data, 'Relatório Preposto',
+                                signature=('Assinatura Preposto', f"Preposto: {params['preposto_name']}"),
+                                workers=app.config['REPORT_RENDER_WORKERS'])
+            new_report = Report(
+                employee_id=params['preposto_id'],
+                report_number=report_number,
+                period=period,
+                format='PDF',
+                file_path=file_path
+            )
+            db.session.add(new_report)
+            db.session.commit()
+            return new_report
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erro ao gerar relatório preposto: {str(e)}")
+        raise
+
+@cached_report_job('fiscal')
+def build_fiscal_report(params, progress):
+    """Relatório dos colaboradores da unidade do fiscal (todos ou um selecionado)."""
+    start_date, end_date = report_job_dates(params)
+    format_type = params['format']
+    if params.get('employee_id'):
+        employees = Employee.query.filter_by(id=params['employee_id'], unit=params['unit'], role='colaborador').all()
+    else:
+        employees = Employee.query.filter_by(unit=params['unit'], role='colaborador').all()
 
-    report_count = Report.query.filter_by(employee_id=session['employee_id']).count()
-    report_number = f"#{report_count + 1}"
+    fiscal = Employee.query.get(params['fiscal_id'])
+    report_number = next_report_number(report_sequence_owner(fiscal.id))
     period = f"{start_date.month:02d}/{start_date.year}"
 
     os.makedirs(app.config['REPORT_FOLDER'], exist_ok=True)
+    progress(50)
+
+    from report_excel import write_employees_excel
+    from report_render import write_employees_pdf
 
     try:
         if format_type == 'excel':
-            filename = secure_filename(f"consolidated_report_{report_number}.xlsx")
+            filename = secure_filename(f"fiscal_report_{report_number}.xlsx")
             file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
-            with pd.ExcelWriter(file_path, engine='xlsxwriter') as writer:
-                for employee_data in report_data:
-                    df = pd.DataFrame(employee_data['activities'])
-                    sheet_name = f"{employee_data['name'][:30]}"
-                    df.to_excel(writer, sheet_name=sheet_name, index=False)
-                    worksheet = writer.sheets[sheet_name]
-                    worksheet.write(0, 0, f"Relatório Consolidado - {employee_data['name']}")
-                    worksheet.write(1, 0, f"Matrícula: {employee_data['employer_code']}")
-                    worksheet.write(2, 0, f"Data de Admissão: {employee_data['admission_date']}")
-                    worksheet.write(3, 0, f"Função: {employee_data['position']}")
-                    worksheet.write(4, 0, f"Unidade: {employee_data['unit']}")
-                    worksheet.write(5, 0, f"Departamento: {employee_data['department']}")
-                    worksheet.write(6, 0, f"Telefone: {employee_data['phone']}")
-            return send_file(
-                file_path,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                as_attachment=True,
-                download_name=filename
+            write_employees_excel(file_path, iter_employee_activities(employees, start_date, end_date), 'Relatório Fiscal')
+            new_report = Report(
+                employee_id=fiscal.id,
+                report_number=report_number,
+                period=period,
+                format='Excel',
+                file_path=file_path
             )
+            db.session.add(new_report)
+            db.session.commit()
+            return new_report
 
         elif format_type == 'pdf':
-            filename = secure_filename(f"consolidated_report_{report_number}.pdf")
+            filename = secure_filename(f"fiscal_report_{report_number}.pdf")
             file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
-            c = canvas.Canvas(file_path, pagesize=A4)
-            width, height = A4
-            for employee_data in report_data:
-                c.setFont('Helvetica-Bold', 16)
-                c.drawCentredString(width/2, height - 2*cm, f"Relatório Consolidado - {employee_data['name']}")
-                c.setFont('Helvetica', 12)
-                c.drawString(2*cm, height - 3.5*cm, f"Matrícula: {employee_data['employer_code']}")
-                c.drawString(2*cm, height - 4*cm, f"Data de Admissão: {employee_data['admission_date']}")
-                c.drawString(2*cm, height - 4.5*cm, f"Função: {employee_data['position']}")
-                c.drawString(2*cm, height - 5*cm, f"Unidade: {employee_data['unit']}")
-                c.drawString(2*cm, height - 5.5*cm, f"Departamento: {employee_data['department']}")
-                c.drawString(2*cm, height - 6*cm, f"Telefone: {employee_data['phone']}")
-                c.setFont('Helvetica-Bold', 12)
-                c.drawString(2*cm, height - 7.5*cm, "Atividades:")
-                c.setFont('Helvetica', 10)
-                y = height - 8*cm
-                c.drawString(2*cm, y, "Data")
-                c.drawString(5*cm, y, "Descrição")
-                c.drawString(10*cm, y, "Projeto")
-                c.drawString(13*cm, y, "Local")
-                c.drawString(15*cm, y, "Tipo")
-                c.drawString(17*cm, y, "Horas")
-                c.line(2*cm, y-0.2*cm, width-2*cm, y-0.2*cm)
-                y -= 0.5*cm
-                for activity in employee_data['activities']:
-                    c.drawString(2*cm, y, activity['date'])
-                    c.drawString(5*cm, y, activity['description'][:30] + ('...' if len(activity['description']) > 30 else ''))
-                    c.drawString(10*cm, y, activity['project'])
-                    c.drawString(13*cm, y, activity['location'])
-                    c.drawString(15*cm, y, activity['type'])
-                    c.drawString(17*cm, y, str(activity['hours']))
-                    y -= 0.5*cm
-                    if y < 3*cm:
-                        c.showPage()
-                        c.setFont('Helvetica', 10)
-                        y = height - 2*cm
-                c.setFont('Helvetica-Bold', 12)
-                c.drawString(2*cm, y - 1*cm, "Assinatura")
-                c.setFont('Helvetica', 10)
-                c.drawString(2*cm, y - 1.5*cm, f"Data: {datetime.now().strftime('%d/%m/%Y')}")
-                c.drawString(2*cm, y - 2*cm, "Assinatura: _______________________________")
-                c.showPage()
-            c.save()
-            return send_file(
-                file_path,
-                mimetype='application/pdf',
-                as_attachment=True,
-                download_name=filename
+            report_data = employees_report_data(employees, start_date, end_date)
+            progress(70)
+            write_employees_pdf(file_path, report_data, 'Relatório Fiscal',
+                                signature=('Assinatura Fiscal', f"Fiscal: {fiscal.name}"),
+                                workers=app.config['REPORT_RENDER_WORKERS'])
+            new_report = Report(
+                employee_id=fiscal.id,
+                report_number=report_number,
+                period=period,
+                format='PDF',
+                file_path=file_path
             )
+            db.session.add(new_report)
+            db.session.commit()
+            return new_report
 
     except Exception as e:
-        print(f"Erro ao gerar relatório consolidado: {str(e)}")
-        return jsonify({'status': 'error', 'message': f'Erro ao gerar relatório: {str(e)}'}), 500
+        db.session.rollback()
+        print(f"Erro ao gerar relatório fiscal: {str(e)}")
+        raise
+
+@app.route('/generate_employer_report', methods=['POST'])
+def generate_employer_report():
+    if 'employee_id' not in session:
+        return jsonify({'status': 'error', 'message': 'Por favor, faça login.'}), 401
+    if session['role'] != 'empregador':
+        return jsonify({'status': 'error', 'message': 'Acesso não autorizado.'}), 403
+
+    print(f"Gerando relatório consolidado para employee_id: {session.get('employee_id')}")
+
+    data = request.get_json()
+    start_date_str = data.get('start_date')
+    end_date_str = data.get('end_date')
+    format_type = data.get('format', 'pdf')
+    if format_type not in ('excel', 'pdf'):
+        return jsonify({'status': 'error', 'message': 'Formato de relatório inválido.'}), 400
+
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        if start_date > end_date:
+            return jsonify({'status': 'error', 'message': 'Data de início não pode ser posterior à data de fim.'}), 400
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Formato de data inválido! Use AAAA-MM-DD.'}), 400
+
+    return enqueue_report('employer', session['employee_id'], {
+        'employee_id': session['employee_id'],
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'format': format_type
+    })
 
 @app.route('/digital_signature', methods=['GET'])
 def digital_signature():
@@ -2523,7 +2916,7 @@ def fiscal_signature():
     reports = (
         db.session.query(Report, Employee)
         .join(Employee, Report.employee_id == Employee.id)
-        .filter(Employee.unit == unit, Report.format == 'PDF', ~Report.file_path.like('%_signed%'))
+        .filter(Employee.unit == unit, Report.format == 'PDF', Report.signature_stage == STAGE_GENERATED)
         .order_by(Report.created_at.desc())
         .all()
     )
@@ -2583,7 +2976,7 @@ def fiscal_signed_reports():
     print(f"Acessando fiscal_signed_reports para employee_id: {session.get('employee_id')}")
 
     # Buscar relatórios assinados pelo fiscal
-    signed_reports = Report.query.filter_by(employee_id=session['employee_id']).filter(Report.file_path.like('%fiscal_signed%')).order_by(Report.created_at.desc()).all()
+    signed_reports = Report.query.filter_by(employee_id=session['employee_id'], signature_stage=STAGE_FISCAL_SIGNED).order_by(Report.created_at.desc()).all()
     return render_template(
         'fiscal_signed_reports.html',
         fiscal_name=session['employee_name'],
@@ -2591,6 +2984,7 @@ def fiscal_signed_reports():
     )
 
 @app.route('/signed_reports_empregador', methods=['GET', 'POST'])
+@read_replica
 def signed_reports_empregador():
     if 'employee_id' not in session:
         print("Erro: employee_id não encontrado na sessão")
@@ -2603,23 +2997,22 @@ def signed_reports_empregador():
 
     print(f"Acessando signed_reports_empregador para employee_id: {session.get('employee_id')}")
 
-    units = sorted(set(unit.name for unit in Unit.query.all() if unit.name))
-    reports = []
+    # Buscar relatórios assinados com base nos filtros
+    query = db.session.query(Report, Employee).join(Employee, Report.employee_id == Employee.id).filter(
+        Report.signature_stage.in_(SIGNED_STAGES),
+        Report.signature_status != None
+    )
 
     if request.method == 'POST':
         unit = request.json.get('unit')
         period = request.json.get('period')
         try:
-            # Buscar relatórios assinados com base nos filtros
-            query = db.session.query(Report, Employee).join(Employee, Report.employee_id == Employee.id).filter(
-                Report.file_path.like('%_signed%'),
-                Report.signature_status != None
-            )
+            page_size = min(max(int(request.json.get('limit') or REPORTS_PAGE_SIZE), 1), REPORTS_MAX_PAGE_SIZE)
             if unit:
                 query = query.filter(Employee.unit == unit)
             if period:
                 query = query.filter(Report.period == period)
-            reports = query.order_by(Report.created_at.desc()).all()
+            reports, next_cursor = paginate_reports(query, request.json.get('cursor'), page_size)
             return jsonify({
                 'status': 'success',
                 'message': 'Relatórios filtrados com sucesso',
@@ -2632,24 +3025,29 @@ def signed_reports_empregador():
                         'date': report.created_at.strftime('%d/%m/%Y'),
                         'signature_status': report.signature_status or 'Pendente'
                     } for report, employee in reports
-                ]
+                ],
+                'next_cursor': next_cursor
             })
         except Exception as e:
             print(f"Erro ao filtrar relatórios: {str(e)}")
             return jsonify({'status': 'error', 'message': f'Erro ao filtrar relatórios: {str(e)}'}), 500
 
-    # Para GET, buscar todos os relatórios assinados
-    reports = db.session.query(Report, Employee).join(Employee, Report.employee_id == Employee.id).filter(
-        Report.file_path.like('%_signed%'),
-        Report.signature_status != None
-    ).order_by(Report.created_at.desc()).all()
+    # Para GET, uma página dos relatórios assinados
+    unit = request.args.get('unit', '')
+    cursor = request.args.get('cursor')
+    if unit:
+        query = query.filter(Employee.unit == unit)
+    reports, next_cursor = paginate_reports(query, cursor)
 
     return render_template(
         'signed_reports_empregador.html',
         employee_name=session['employee_name'],
         role=session['role'],
-        units=units,
-        reports=reports
+        units=[name for (name,) in db.session.query(Unit.name).order_by(Unit.name)],
+        reports=reports,
+        selected_unit=unit,
+        cursor=cursor,
+        next_cursor=next_cursor
     )
 
 @app.route('/download_individual_report', methods=['POST'])
@@ -2687,12 +3085,15 @@ def download_batch_report():
     data = request.get_json()
     unit = data.get('unit')
     period = data.get('period')
+    mode = data.get('mode', 'pdf')
+    if mode not in ('pdf', 'zip'):
+        return jsonify({'status': 'error', 'message': 'Formato de download inválido.'}), 400
     print(f"Baixando relatório em lote para employee_id: {session.get('employee_id')}, unit: {unit}, period: {period}")
 
     try:
         # Buscar relatórios assinados com base nos filtros
         query = db.session.query(Report, Employee).join(Employee, Report.employee_id == Employee.id).filter(
-            Report.file_path.like('%_signed%'),
+            Report.signature_stage.in_(SIGNED_STAGES),
             Report.signature_status != None
         )
         if unit:
@@ -2705,25 +3106,22 @@ def download_batch_report():
             print("Erro: nenhum relatório encontrado para os filtros fornecidos")
             return jsonify({'status': 'error', 'message': 'Nenhum relatório encontrado para os filtros fornecidos.'}), 404
 
-        # Criar um PDF combinado
-        output_path = os.path.join(app.config['REPORT_FOLDER'], f"batch_report_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf")
-        pdf_writer = PdfWriter()
-
-        for report, _ in reports:
-            if os.path.exists(report.file_path):
-                pdf_reader = PdfReader(report.file_path)
-                for page in pdf_reader.pages:
-                    pdf_writer.add_page(page)
-
-        # Salvar o PDF combinado
-        with open(output_path, 'wb') as output_file:
-            pdf_writer.write(output_file)
+        # Apenas os caminhos ficam em memória; os arquivos são lidos durante o envio
+        paths = [report.file_path for report, _ in reports if os.path.exists(report.file_path)]
+        if not paths:
+            print("Erro: arquivos dos relatórios não encontrados")
+            return jsonify({'status': 'error', 'message': 'Arquivos dos relatórios não encontrados.'}), 404
 
-        return send_file(
-            output_path,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f"batch_report_{unit or 'all'}_{period or 'all'}.pdf"
+        from batch_export import stream_zip, stream_merged_pdf
+        if mode == 'zip':
+            body, mimetype, extension = stream_zip(paths), 'application/zip', 'zip'
+        else:
+            body, mimetype, extension = stream_merged_pdf(paths), 'application/pdf', 'pdf'
+        download_name = f"batch_report_{unit or 'all'}_{period or 'all'}.{extension}"
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{secure_filename(download_name)}"'}
         )
     except Exception as e:
         print(f"Erro ao gerar relatório em lote: {str(e)}")
@@ -2752,56 +3150,11 @@ def save_signed_pdf():
         if not report:
             return jsonify({'success': False, 'message': 'Relatório não encontrado no banco de dados.'})
 
-        # Decodificar a imagem da assinatura (base64 para imagem)
-        signature_data = signature_data.split(',')[1]  # Remover o prefixo 'data:image/png;base64,'
-        signature_bytes = base64.b64decode(signature_data)
-        signature_image = Image.open(io.BytesIO(signature_bytes))
-
-        # Converter a imagem para RGB se necessário (para evitar erros com PNGs RGBA)
-        if signature_image.mode != 'RGB':
-            signature_image = signature_image.convert('RGB')
-
-        # Criar um PDF temporário com a imagem da assinatura
-        signature_pdf_path = 'temp_signature.pdf'
-        signature_image.save(signature_pdf_path, format='PDF')
-
-        # Abrir o PDF original
-        pdf_reader = PdfReader(report_path)
-        pdf_writer = PdfWriter()
-
-        # Copiar todas as páginas do PDF original
-        for page in pdf_reader.pages:
-            pdf_writer.add_page(page)
-
-        # Abrir o PDF da assinatura
-        signature_pdf = PdfReader(signature_pdf_path)
-        signature_page = signature_pdf.pages[0]
-
-        # Mesclar a assinatura na última página do PDF original
-        last_page = pdf_writer.pages[-1]
-        page_width = float(last_page.mediabox.width)
-        page_height = float(last_page.mediabox.height)
-
-        # Inverter a coordenada Y para o sistema de coordenadas do PDF (origem no canto inferior esquerdo)
-        pdf_y = page_height - signature_y - signature_height
-
-        # Aplicar a transformação para escalar e posicionar a assinatura na caixinha
-        transformation = Transformation().scale(
-            sx=signature_width / float(signature_page.mediabox.width),
-            sy=signature_height / float(signature_page.mediabox.height)
-        ).translate(tx=signature_x, ty=pdf_y)
-        signature_page.add_transformation(transformation)
-
-        # Mesclar a página da assinatura na última página
-        last_page.merge_page(signature_page)
-
-        # Salvar o PDF resultante
+        # Aplicar a assinatura na última página (em memória, sem arquivos temporários)
+        from pdf_signing import sign_pdf
         output_path = os.path.join(app.config['REPORT_FOLDER'], f"signed_{os.path.basename(report_path)}")
-        with open(output_path, 'wb') as output_file:
-            pdf_writer.write(output_file)
-
-        # Remover o PDF temporário
-        os.remove(signature_pdf_path)
+        sign_pdf(report_path, output_path, signature_data,
+                 signature_x, signature_y, signature_width, signature_height)
 
         # Registrar o relatório assinado no banco
         new_report = Report(
@@ -2810,7 +3163,9 @@ def save_signed_pdf():
             period=report.period,
             format='PDF',
             file_path=output_path,
-            created_at=datetime.utcnow()
+            created_at=datetime.utcnow(),
+            signature_stage=STAGE_EMPLOYEE_SIGNED,
+            parent_report_id=report.id
         )
         db.session.add(new_report)
         db.session.commit()
@@ -2856,56 +3211,11 @@ def save_fiscal_signed_pdf():
         if not report:
             return jsonify({'success': False, 'message': 'Relatório não encontrado ou não pertence à sua unidade.'})
 
-        # Decodificar a imagem da assinatura (base64 para imagem)
-        signature_data = signature_data.split(',')[1]  # Remover o prefixo 'data:image/png;base64,'
-        signature_bytes = base64.b64decode(signature_data)
-        signature_image = Image.open(io.BytesIO(signature_bytes))
-
-        # Converter a imagem para RGB se necessário
-        if signature_image.mode != 'RGB':
-            signature_image = signature_image.convert('RGB')
-
-        # Criar um PDF temporário com a imagem da assinatura
-        signature_pdf_path = 'temp_fiscal_signature.pdf'
-        signature_image.save(signature_pdf_path, format='PDF')
-
-        # Abrir o PDF original
-        pdf_reader = PdfReader(report_path)
-        pdf_writer = PdfWriter()
-
-        # Copiar todas as páginas do PDF original
-        for page in pdf_reader.pages:
-            pdf_writer.add_page(page)
-
-        # Abrir o PDF da assinatura
-        signature_pdf = PdfReader(signature_pdf_path)
-        signature_page = signature_pdf.pages[0]
-
-        # Mesclar a assinatura na última página do PDF original
-        last_page = pdf_writer.pages[-1]
-        page_width = float(last_page.mediabox.width)
-        page_height = float(last_page.mediabox.height)
-
-        # Inverter a coordenada Y para o sistema de coordenadas do PDF
-        pdf_y = page_height - signature_y - signature_height
-
-        # Aplicar a transformação para escalar e posicionar a assinatura
-        transformation = Transformation().scale(
-            sx=signature_width / float(signature_page.mediabox.width),
-            sy=signature_height / float(signature_page.mediabox.height)
-        ).translate(tx=signature_x, ty=pdf_y)
-        signature_page.add_transformation(transformation)
-
-        # Mesclar a página da assinatura na última página
-        last_page.merge_page(signature_page)
-
-        # Salvar o PDF resultante
+        # Aplicar a assinatura na última página (em memória, sem arquivos temporários)
+        from pdf_signing import sign_pdf
         output_path = os.path.join(app.config['REPORT_FOLDER'], f"fiscal_signed_{os.path.basename(report_path)}")
-        with open(output_path, 'wb') as output_file:
-            pdf_writer.write(output_file)
-
-        # Remover o PDF temporário
-        os.remove(signature_pdf_path)
+        sign_pdf(report_path, output_path, signature_data,
+                 signature_x, signature_y, signature_width, signature_height)
 
         # Registrar o relatório assinado no banco
         new_report = Report(
@@ -2914,7 +3224,9 @@ def save_fiscal_signed_pdf():
             period=report.period,
             format='PDF',
             file_path=output_path,
-            created_at=datetime.utcnow()
+            created_at=datetime.utcnow(),
+            signature_stage=STAGE_FISCAL_SIGNED,
+            parent_report_id=report.id
         )
         db.session.add(new_report)
         db.session.commit()
@@ -2944,7 +3256,7 @@ def digital_signature_preposto():
     reports = (
         db.session.query(Report, Employee)
         .join(Employee, Report.employee_id == Employee.id)
-        .filter(Employee.unit == unit, Report.format == 'PDF', ~Report.file_path.like('%_signed%'))
+        .filter(Employee.unit == unit, Report.format == 'PDF', Report.signature_stage == STAGE_GENERATED)
         .order_by(Report.created_at.desc())
         .all()
     )
@@ -2993,44 +3305,10 @@ def save_preposto_signed_pdf():
         if not report:
             return jsonify({'success': False, 'message': 'Relatório não encontrado ou não pertence à sua unidade.'})
 
-        signature_data = signature_data.split(',')[1]
-        signature_bytes = base64.b64decode(signature_data)
-        signature_image = PILImage.open(io.BytesIO(signature_bytes))
-
-        if signature_image.mode != 'RGB':
-            signature_image = signature_image.convert('RGB')
-
-        signature_pdf_path = 'temp_preposto_signature.pdf'
-        signature_image.save(signature_pdf_path, format='PDF')
-
-        pdf_reader = PdfReader(report_path)
-        pdf_writer = PdfWriter()
-
-        for page in pdf_reader.pages:
-            pdf_writer.add_page(page)
-
-        signature_pdf = PdfReader(signature_pdf_path)
-        signature_page = signature_pdf.pages[0]
-
-        last_page = pdf_writer.pages[-1]
-        page_width = float(last_page.mediabox.width)
-        page_height = float(last_page.mediabox.height)
-
-        pdf_y = page_height - signature_y - signature_height
-
-        transformation = Transformation().scale(
-            sx=signature_width / float(signature_page.mediabox.width),
-            sy=signature_height / float(signature_page.mediabox.height)
-        ).translate(tx=signature_x, ty=pdf_y)
-        signature_page.add_transformation(transformation)
-
-        last_page.merge_page(signature_page)
-
+        from pdf_signing import sign_pdf
         output_path = os.path.join(app.config['REPORT_FOLDER'], f"preposto_signed_{os.path.basename(report_path)}")
-        with open(output_path, 'wb') as output_file:
-            pdf_writer.write(output_file)
-
-        os.remove(signature_pdf_path)
+        sign_pdf(report_path, output_path, signature_data,
+                 signature_x, signature_y, signature_width, signature_height)
 
         new_report = Report(
             employee_id=session['employee_id'],
@@ -3039,7 +3317,9 @@ def save_preposto_signed_pdf():
             format='PDF',
             file_path=output_path,
             created_at=datetime.utcnow(),
-            signature_status='Assinado por Preposto'
+            signature_status='Assinado por Preposto',
+            signature_stage=STAGE_PREPOSTO_SIGNED,
+            parent_report_id=report.id
         )
         db.session.add(new_report)
         db.session.commit()
@@ -3243,6 +3523,7 @@ def delete_system_user():
         return jsonify({'status': 'error', 'message': f'Erro ao excluir usuário: {str(e)}'}), 500
 
 @app.route('/home_fiscal', methods=['GET'])
+@read_replica
 def home_fiscal():
     print("Entrando na rota /home_fiscal")
     if 'employee_id' not in session or session['role'] != 'fiscal':
@@ -3263,10 +3544,6 @@ def home_fiscal():
     employee_id = request.args.get('employee_id', '').strip()
     print(f"Mês: {month}, Ano: {year}, Filtro por employee_id: {employee_id}")
 
-    days_in_month = get_days_in_month(year, month)
-    _, last_day = calendar.monthrange(year, month)
-    today = datetime.now().date()
-
     # Buscar fiscal
     fiscal = Employee.query.get(session['employee_id'])
     if not fiscal:
@@ -3280,67 +3557,16 @@ def home_fiscal():
     employees = Employee.query.filter_by(unit=fiscal.unit, role='colaborador').all()
     print(f"Colaboradores encontrados: {len(employees)}")
 
-    # Filtrar colaboradores com base no employee_id, se fornecido
-    if employee_id:
-        employees_filtered = Employee.query.filter_by(id=employee_id, unit=fiscal.unit, role='colaborador').all()
-        if not employees_filtered:
-            print(f"Erro: Funcionário com ID {employee_id} não encontrado ou não pertence à unidade")
-            flash('Funcionário selecionado inválido ou não pertence à unidade.', 'error')
-            employee_id = ''  # Resetar filtro se inválido
-            employees_filtered = employees
-    else:
-        employees_filtered = employees
-
-    # Dicionário para armazenar dados por colaborador
-    employee_data = {}
-    for employee in employees_filtered:
-        print(f"Processando colaborador: {employee.name}")
-        # Buscar atividades do colaborador para o mês e ano
-        activities = Activity.query.filter_by(employee_id=employee.id).filter(
-            db.extract('month', Activity.date) == month,
-            db.extract('year', Activity.date) == year
-        ).all()
-        activities_dict = {
-            activity.date.day: {
-                'description': activity.description,
-                'type': activity.type or 'N/A',
-                'project': activity.project or 'N/A',
-                'location': activity.location or 'N/A',
-                'hours': ((activity.end_datetime - activity.start_datetime).total_seconds() / 3600) if activity.start_datetime and activity.end_datetime else 'N/A'
-            } for activity in activities
-        }
-
-        # Calcular status por dia
-        status_dict = {}
-        for day in range(1, last_day + 1):
-            activity_date = date(year, month, day)
-            is_weekend = activity_date.weekday() >= 5  # 5=Sábado, 6=Domingo
-            if is_weekend:
-                status_dict[day] = None
-            elif day in activities_dict:
-                status_dict[day] = 'Concluído'
-            elif activity_date > today:
-                status_dict[day] = 'Pendente'
-            else:
-                status_dict[day] = 'Em Falta'
+    # Validar o filtro por employee_id, se fornecido
+    if employee_id and employee_id not in {str(employee.id) for employee in employees}:
+        print(f"Erro: Funcionário com ID {employee_id} não encontrado ou não pertence à unidade")
+        flash('Funcionário selecionado inválido ou não pertence à unidade.', 'error')
+        employee_id = ''  # Resetar filtro se inválido
 
-        # Calcular estatísticas
-        total_days = sum(1 for d in range(1, last_day + 1) if date(year, month, d).weekday() < 5)
-        completed_days = len([d for d in range(1, last_day + 1) if date(year, month, d).weekday() < 5 and d in activities_dict])
-        pending_days = sum(1 for d in range(today.day + 1, last_day + 1) if date(year, month, d).weekday() < 5 and d not in activities_dict)
-        missing_days = sum(1 for d in range(1, min(today.day, last_day) + 1) if date(year, month, d).weekday() < 5 and d not in activities_dict)
-
-        employee_data[employee.id] = {
-            'name': employee.name,
-            'employer_code': employee.employer_code or 'N/A',
-            'position': employee.position or 'N/A',
-            'activities_dict': activities_dict,
-            'status_dict': status_dict,
-            'total_days': total_days,
-            'completed_days': completed_days,
-            'pending_days': pending_days,
-            'missing_days': missing_days
-        }
+    # Status e estatísticas de todos os colaboradores em uma única consulta
+    layout = month_layout(year, month, fiscal.unit)
+    matrix = build_unit_month_matrix(fiscal.unit, year, month, employee_id=employee_id or None)
+    employee_data = matrix.employee_data()
 
     print(f"Dados de employee_data: {employee_data}")
     return render_template(
@@ -3349,12 +3575,13 @@ def home_fiscal():
         unit=unit,
         current_month=month,
         current_year=year,
-        days_in_month=days_in_month,
+        days_in_month=layout,
         employee_data=employee_data,
         employees=employees
     )
 
 @app.route('/home_preposto', methods=['GET'])
+@read_replica
 def home_preposto():
     if 'employee_id' not in session or session['role'] != 'preposto':
         print(f"Sessão inválida: employee_id={session.get('employee_id')}, role={session.get('role')}")
@@ -3387,73 +3614,19 @@ def home_preposto():
         flash('Preposto não encontrado.', 'error')
         return redirect(url_for('index'))
 
-    # Buscar colaboradores da unidade
-    employees_query = Employee.query.filter_by(unit=unit, role='colaborador')
-    if employee_id:
-        employees_query = employees_query.filter_by(id=employee_id)
-    employees = employees_query.all()
+    # Buscar colaboradores da unidade com as atividades do mês em uma única consulta
+    matrix = build_unit_month_matrix(unit, year, month, employee_id=employee_id or None)
+    employees = matrix.employees
 
     if not employees:
         print(f"Nenhum colaborador encontrado para a unidade: {unit}")
         flash('Nenhum colaborador encontrado para a unidade.', 'error')
 
-    # Obter dias do mês
-    days_in_month = get_days_in_month(year, month)  # Usar a função auxiliar existente
-    _, last_day = monthrange(year, month)
-    today = datetime.now().date()
+    # Obter dias do mês (com os feriados da unidade)
+    layout = month_layout(year, month, unit)
 
     # Processar dados dos colaboradores
-    employee_data = {}
-    for employee in employees:
-        print(f"Processando colaborador: {employee.name}")
-        # Buscar atividades do colaborador para o mês e ano
-        activities = Activity.query.filter_by(employee_id=employee.id).filter(
-            db.extract('month', Activity.date) == month,
-            db.extract('year', Activity.date) == year
-        ).all()
-
-        # Criar dicionário de atividades
-        activities_dict = {
-            activity.date.day: {
-                'description': activity.description,
-                'type': activity.type or 'N/A',
-                'project': activity.project or 'N/A',
-                'location': activity.location or 'N/A',
-                'hours': ((activity.end_datetime - activity.start_datetime).total_seconds() / 3600) if activity.start_datetime and activity.end_datetime else 'N/A'
-            } for activity in activities
-        }
-
-        # Calcular status por dia
-        status_dict = {}
-        for day in range(1, last_day + 1):
-            activity_date = date(year, month, day)
-            is_weekend = activity_date.weekday() >= 5  # 5=Sábado, 6=Domingo
-            if is_weekend:
-                status_dict[day] = None
-            elif day in activities_dict:
-                status_dict[day] = 'Concluído'
-            elif activity_date > today:
-                status_dict[day] = 'Pendente'
-            else:
-                status_dict[day] = 'Em Falta'
-
-        # Calcular estatísticas
-        total_days = sum(1 for d in range(1, last_day + 1) if date(year, month, d).weekday() < 5)
-        completed_days = len([d for d in range(1, last_day + 1) if date(year, month, d).weekday() < 5 and d in activities_dict])
-        pending_days = sum(1 for d in range(today.day + 1, last_day + 1) if date(year, month, d).weekday() < 5 and d not in activities_dict)
-        missing_days = sum(1 for d in range(1, min(today.day, last_day) + 1) if date(year, month, d).weekday() < 5 and d not in activities_dict)
-
-        employee_data[employee.id] = {
-            'name': employee.name,
-            'employer_code': employee.employer_code or 'N/A',
-            'position': employee.position or 'N/A',
-            'activities_dict': activities_dict,
-            'status_dict': status_dict,
-            'total_days': total_days,
-            'completed_days': completed_days,
-            'pending_days': pending_days,
-            'missing_days': missing_days
-        }
+    employee_data = matrix.employee_data()
 
     print(f"Dados de employee_data: {employee_data}")
     return render_template(
@@ -3462,7 +3635,7 @@ def home_preposto():
         unit=unit,
         employees=employees,
         employee_data=employee_data,
-        days_in_month=days_in_month,
+        days_in_month=layout,
         current_month=month,
         current_year=year,
         employee_id=employee_id
@@ -3491,157 +3664,31 @@ def generate_report_preposto():
         format_type = request.form.get('format')
         employee_id = request.form.get('employee_id')
 
+        if format_type not in ('excel', 'pdf'):
+            return jsonify({'success': False, 'message': 'Formato de relatório inválido.'}), 400
+
         try:
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
             if start_date > end_date:
-                flash('Data de início não pode ser posterior à data de fim.', 'error')
-                return redirect(url_for('generate_report_preposto'))
+                return jsonify({'success': False, 'message': 'Data de início não pode ser posterior à data de fim.'}), 400
         except ValueError:
-            flash('Formato de data inválido! Use AAAA-MM-DD.', 'error')
-            return redirect(url_for('generate_report_preposto'))
+            return jsonify({'success': False, 'message': 'Formato de data inválido! Use AAAA-MM-DD.'}), 400
 
         if employee_id:
             employees = Employee.query.filter_by(id=employee_id, unit=unit, role='colaborador').all()
             if not employees:
-                flash('Funcionário selecionado inválido ou não pertence à unidade.', 'error')
-                return redirect(url_for('generate_report_preposto'))
-
-        report_data = []
-        for employee in employees:
-            activities = Activity.query.filter_by(employee_id=employee.id).filter(
-                Activity.date >= start_date,
-                Activity.date <= end_date
-            ).all()
-            employee_data = {
-                'employer_code': employee.employer_code or 'N/A',
-                'name': employee.name,
-                'admission_date': employee.admission_date.strftime('%d/%m/%Y') if employee.admission_date else 'N/A',
-                'position': employee.position or 'N/A',
-                'unit': employee.unit or 'N/A',
-                'department': employee.department or 'N/A',
-                'phone': employee.phone or 'N/A',
-                'activities': [
-                    {
-                        'date': activity.date.strftime('%d/%m/%Y'),
-                        'description': activity.description,
-                        'project': activity.project or 'N/A',
-                        'location': activity.location or 'N/A',
-                        'type': activity.type or 'N/A',
-                        'hours': ((activity.end_datetime - activity.start_datetime).total_seconds() / 3600) if activity.start_datetime and activity.end_datetime else 'N/A'
-                    } for activity in activities
-                ]
-            }
-            report_data.append(employee_data)
-
-        report_count = Report.query.filter_by(employee_id=session['employee_id']).count()
-        report_number = f"#{report_count + 1}"
-        period = f"{start_date.month:02d}/{start_date.year}"
-
-        os.makedirs(app.config['REPORT_FOLDER'], exist_ok=True)
-
-        try:
-            if format_type == 'excel':
-                filename = secure_filename(f"preposto_report_{report_number}.xlsx")
-                file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
-                with pd.ExcelWriter(file_path, engine='xlsxwriter') as writer:
-                    for employee_data in report_data:
-                        df = pd.DataFrame(employee_data['activities'])
-                        sheet_name = f"{employee_data['name'][:30]}"
-                        df.to_excel(writer, sheet_name=sheet_name, index=False)
-                        worksheet = writer.sheets[sheet_name]
-                        worksheet.write(0, 0, f"Relatório Preposto - {employee_data['name']}")
-                        worksheet.write(1, 0, f"Matrícula: {employee_data['employer_code']}")
-                        worksheet.write(2, 0, f"Data de Admissão: {employee_data['admission_date']}")
-                        worksheet.write(3, 0, f"Função: {employee_data['position']}")
-                        worksheet.write(4, 0, f"Unidade: {employee_data['unit']}")
-                        worksheet.write(5, 0, f"Departamento: {employee_data['department']}")
-                        worksheet.write(6, 0, f"Telefone: {employee_data['phone']}")
-                new_report = Report(
-                    employee_id=session['employee_id'],
-                    report_number=report_number,
-                    period=period,
-                    format='Excel',
-                    file_path=file_path
-                )
-                db.session.add(new_report)
-                db.session.commit()
-                flash('Relatório em Excel gerado com sucesso!', 'success')
-                return send_file(
-                    file_path,
-                    mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                    as_attachment=True,
-                    download_name=filename
-                )
-
-            elif format_type == 'pdf':
-                filename = secure_filename(f"preposto_report_{report_number}.pdf")
-                file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
-                c = canvas.Canvas(file_path, pagesize=A4)
-                width, height = A4
-                for employee_data in report_data:
-                    c.setFont('Helvetica-Bold', 16)
-                    c.drawCentredString(width/2, height - 2*cm, f"Relatório Preposto - {employee_data['name']}")
-                    c.setFont('Helvetica', 12)
-                    c.drawString(2*cm, height - 3.5*cm, f"Matrícula: {employee_data['employer_code']}")
-                    c.drawString(2*cm, height - 4*cm, f"Data de Admissão: {employee_data['admission_date']}")
-                    c.drawString(2*cm, height - 4.5*cm, f"Função: {employee_data['position']}")
-                    c.drawString(2*cm, height - 5*cm, f"Unidade: {employee_data['unit']}")
-                    c.drawString(2*cm, height - 5.5*cm, f"Departamento: {employee_data['department']}")
-                    c.drawString(2*cm, height - 6*cm, f"Telefone: {employee_data['phone']}")
-                    c.setFont('Helvetica-Bold', 12)
-                    c.drawString(2*cm, height - 7.5*cm, "Atividades:")
-                    c.setFont('Helvetica', 10)
-                    y = height - 8*cm
-                    c.drawString(2*cm, y, "Data")
-                    c.drawString(5*cm, y, "Descrição")
-                    c.drawString(10*cm, y, "Projeto")
-                    c.drawString(13*cm, y, "Local")
-                    c.drawString(15*cm, y, "Tipo")
-                    c.drawString(17*cm, y, "Horas")
-                    c.line(2*cm, y-0.2*cm, width-2*cm, y-0.2*cm)
-                    y -= 0.5*cm
-                    for activity in employee_data['activities']:
-                        c.drawString(2*cm, y, activity['date'])
-                        c.drawString(5*cm, y, activity['description'][:30] + ('...' if len(activity['description']) > 30 else ''))
-                        c.drawString(10*cm, y, activity['project'])
-                        c.drawString(13*cm, y, activity['location'])
-                        c.drawString(15*cm, y, activity['type'])
-                        c.drawString(17*cm, y, str(activity['hours']))
-                        y -= 0.5*cm
-                        if y < 3*cm:
-                            c.showPage()
-                            c.setFont('Helvetica', 10)
-                            y = height - 2*cm
-                    c.setFont('Helvetica-Bold', 12)
-                    c.drawString(2*cm, y - 1*cm, "Assinatura Preposto")
-                    c.setFont('Helvetica', 10)
-                    c.drawString(2*cm, y - 1.5*cm, f"Data: {datetime.now().strftime('%d/%m/%Y')}")
-                    c.drawString(2*cm, y - 2*cm, f"Preposto: {session['employee_name']}")
-                    c.showPage()
-                c.save()
-                new_report = Report(
-                    employee_id=session['employee_id'],
-                    report_number=report_number,
-                    period=period,
-                    format='PDF',
-                    file_path=file_path
-                )
-                db.session.add(new_report)
-                db.session.commit()
-                flash('Relatório em PDF gerado com sucesso!', 'success')
-                return send_file(
-                    file_path,
-                    mimetype='application/pdf',
-                    as_attachment=True,
-                    download_name=filename
-                )
-
-        except Exception as e:
-            db.session.rollback()
-            print(f"Erro ao gerar relatório preposto: {str(e)}")
-            flash(f'Erro ao gerar relatório: {str(e)}', 'error')
-            return redirect(url_for('generate_report_preposto'))
+                return jsonify({'success': False, 'message': 'Funcionário selecionado inválido ou não pertence à unidade.'}), 400
+
+        return enqueue_report('preposto', session['employee_id'], {
+            'preposto_id': session['employee_id'],
+            'preposto_name': session['employee_name'],
+            'unit': unit,
+            'employee_id': int(employee_id) if employee_id else None,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'format': format_type
+        })
 
     return render_template('generate_report_preposto.html', preposto_name=session['employee_name'], unit=unit, employees=employees)
 
@@ -3663,7 +3710,7 @@ def signed_reports_preposto():
     signed_reports = (
         db.session.query(Report, Employee)
         .join(Employee, Report.employee_id == Employee.id)
-        .filter(Employee.unit == unit, Report.file_path.like('%_signed%'))
+        .filter(Employee.unit == unit, Report.signature_stage.in_(SIGNED_STAGES))
         .order_by(Report.created_at.desc())
         .all()
     )
@@ -3698,163 +3745,31 @@ def generate_fiscal_report():
         format_type = request.form.get('format')
         employee_id = request.form.get('employee_id')  # ID do funcionário selecionado (ou vazio para todos)
 
+        if format_type not in ('excel', 'pdf'):
+            return jsonify({'success': False, 'message': 'Formato de relatório inválido.'}), 400
+
         try:
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
             if start_date > end_date:
-                flash('Data de início não pode ser posterior à data de fim.', 'error')
-                return redirect(url_for('generate_fiscal_report'))
+                return jsonify({'success': False, 'message': 'Data de início não pode ser posterior à data de fim.'}), 400
         except ValueError:
-            flash('Formato de data inválido! Use AAAA-MM-DD.', 'error')
-            return redirect(url_for('generate_fiscal_report'))
+            return jsonify({'success': False, 'message': 'Formato de data inválido! Use AAAA-MM-DD.'}), 400
 
         # Filtrar funcionários com base no employee_id, se fornecido
         if employee_id:
             employees = Employee.query.filter_by(id=employee_id, unit=unit, role='colaborador').all()
             if not employees:
-                flash('Funcionário selecionado inválido ou não pertence à unidade.', 'error')
-                return redirect(url_for('generate_fiscal_report'))
-        else:
-            employees = Employee.query.filter_by(unit=unit, role='colaborador').all()
-
-        report_data = []
-
-        for employee in employees:
-            activities = Activity.query.filter_by(employee_id=employee.id).filter(
-                Activity.date >= start_date,
-                Activity.date <= end_date
-            ).all()
-
-            employee_data = {
-                'employer_code': employee.employer_code or 'N/A',
-                'name': employee.name,
-                'admission_date': employee.admission_date.strftime('%d/%m/%Y') if employee.admission_date else 'N/A',
-                'position': employee.position or 'N/A',
-                'unit': employee.unit or 'N/A',
-                'department': employee.department or 'N/A',
-                'phone': employee.phone or 'N/A',
-                'activities': [
-                    {
-                        'date': activity.date.strftime('%d/%m/%Y'),
-                        'description': activity.description,
-                        'project': activity.project or 'N/A',
-                        'location': activity.location or 'N/A',
-                        'type': activity.type or 'N/A',
-                        'hours': ((activity.end_datetime - activity.start_datetime).total_seconds() / 3600) if activity.start_datetime and activity.end_datetime else 'N/A'
-                    } for activity in activities
-                ]
-            }
-            report_data.append(employee_data)
-
-        report_count = Report.query.filter_by(employee_id=fiscal.id).count()
-        report_number = f"#{report_count + 1}"
-        period = f"{start_date.month:02d}/{start_date.year}"
-        fiscal = Employee.query.get(session['employee_id'])
-
-        os.makedirs(app.config['REPORT_FOLDER'], exist_ok=True)
-
-        try:
-            if format_type == 'excel':
-                filename = secure_filename(f"fiscal_report_{report_number}.xlsx")
-                file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
-                with pd.ExcelWriter(file_path, engine='xlsxwriter') as writer:
-                    for employee_data in report_data:
-                        df = pd.DataFrame(employee_data['activities'])
-                        sheet_name = f"{employee_data['name'][:30]}"
-                        df.to_excel(writer, sheet_name=sheet_name, index=False)
-                        worksheet = writer.sheets[sheet_name]
-                        worksheet.write(0, 0, f"Relatório Fiscal - {employee_data['name']}")
-                        worksheet.write(1, 0, f"Matrícula: {employee_data['employer_code']}")
-                        worksheet.write(2, 0, f"Data de Admissão: {employee_data['admission_date']}")
-                        worksheet.write(3, 0, f"Função: {employee_data['position']}")
-                        worksheet.write(4, 0, f"Unidade: {employee_data['unit']}")
-                        worksheet.write(5, 0, f"Departamento: {employee_data['department']}")
-                        worksheet.write(6, 0, f"Telefone: {employee_data['phone']}")
-                new_report = Report(
-                    employee_id=fiscal.id,
-                    report_number=report_number,
-                    period=period,
-                    format='Excel',
-                    file_path=file_path
-                )
-                db.session.add(new_report)
-                db.session.commit()
-                flash('Relatório em Excel gerado com sucesso!', 'success')
-                return send_file(
-                    file_path,
-                    mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                    as_attachment=True,
-                    download_name=filename
-                )
-
-            elif format_type == 'pdf':
-                filename = secure_filename(f"fiscal_report_{report_number}.pdf")
-                file_path = os.path.join(app.config['REPORT_FOLDER'], filename)
-                c = canvas.Canvas(file_path, pagesize=A4)
-                width, height = A4
-                for employee_data in report_data:
-                    c.setFont('Helvetica-Bold', 16)
-                    c.drawCentredString(width/2, height - 2*cm, f"Relatório Fiscal - {employee_data['name']}")
-                    c.setFont('Helvetica', 12)
-                    c.drawString(2*cm, height - 3.5*cm, f"Matrícula: {employee_data['employer_code']}")
-                    c.drawString(2*cm, height - 4*cm, f"Data de Admissão: {employee_data['admission_date']}")
-                    c.drawString(2*cm, height - 4.5*cm, f"Função: {employee_data['position']}")
-                    c.drawString(2*cm, height - 5*cm, f"Unidade: {employee_data['unit']}")
-                    c.drawString(2*cm, height - 5.5*cm, f"Departamento: {employee_data['department']}")
-                    c.drawString(2*cm, height - 6*cm, f"Telefone: {employee_data['phone']}")
-                    c.setFont('Helvetica-Bold', 12)
-                    c.drawString(2*cm, height - 7.5*cm, "Atividades:")
-                    c.setFont('Helvetica', 10)
-                    y = height - 8*cm
-                    c.drawString(2*cm, y, "Data")
-                    c.drawString(5*cm, y, "Descrição")
-                    c.drawString(10*cm, y, "Projeto")
-                    c.drawString(13*cm, y, "Local")
-                    c.drawString(15*cm, y, "Tipo")
-                    c.drawString(17*cm, y, "Horas")
-                    c.line(2*cm, y-0.2*cm, width-2*cm, y-0.2*cm)
-                    y -= 0.5*cm
-                    for activity in employee_data['activities']:
-                        c.drawString(2*cm, y, activity['date'])
-                        c.drawString(5*cm, y, activity['description'][:30] + ('...' if len(activity['description']) > 30 else ''))
-                        c.drawString(10*cm, y, activity['project'])
-                        c.drawString(13*cm, y, activity['location'])
-                        c.drawString(15*cm, y, activity['type'])
-                        c.drawString(17*cm, y, str(activity['hours']))
-                        y -= 0.5*cm
-                        if y < 3*cm:
-                            c.showPage()
-                            c.setFont('Helvetica', 10)
-                            y = height - 2*cm
-                    c.setFont('Helvetica-Bold', 12)
-                    c.drawString(2*cm, y - 1*cm, "Assinatura Fiscal")
-                    c.setFont('Helvetica', 10)
-                    c.drawString(2*cm, y - 1.5*cm, f"Data: {datetime.now().strftime('%d/%m/%Y')}")
-                    c.drawString(2*cm, y - 2*cm, f"Fiscal: {fiscal.name}")
-                    c.showPage()
-                c.save()
-                new_report = Report(
-                    employee_id=fiscal.id,
-                    report_number=report_number,
-                    period=period,
-                    format='PDF',
-                    file_path=file_path
-                )
-                db.session.add(new_report)
-                db.session.commit()
-                flash('Relatório em PDF gerado com sucesso!', 'success')
-                return send_file(
-                    file_path,
-                    mimetype='application/pdf',
-                    as_attachment=True,
-                    download_name=filename
-                )
-
-        except Exception as e:
-            db.session.rollback()
-            print(f"Erro ao gerar relatório fiscal: {str(e)}")
-            flash(f'Erro ao gerar relatório: {str(e)}', 'error')
-            return redirect(url_for('generate_fiscal_report'))
+                return jsonify({'success': False, 'message': 'Funcionário selecionado inválido ou não pertence à unidade.'}), 400
+
+        return enqueue_report('fiscal', session['employee_id'], {
+            'fiscal_id': session['employee_id'],
+            'unit': unit,
+            'employee_id': int(employee_id) if employee_id else None,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'format': format_type
+        })
 
     return render_template('generate_fiscal_report.html', fiscal_name=session['employee_name'], unit=unit, employees=employees)
 
@@ -3873,9 +3788,25 @@ def download_activities():
 
     print(f"Baixando atividades para employee_id: {session.get('employee_id')}, unit: {unit}")
 
-    month = int(request.args.get('month', datetime.now().month))
-    year = int(request.args.get('year', datetime.now().year))
     name_filter = request.args.get('name', '').strip().lower()
+    compress = request.args.get('compress') == 'gzip'
+
+    # Intervalo: start_date/end_date (AAAA-MM-DD) ou, por padrão, month/year
+    try:
+        if request.args.get('start_date') or request.args.get('end_date'):
+            start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date()
+        else:
+            month = int(request.args.get('month', datetime.now().month))
+            year = int(request.args.get('year', datetime.now().year))
+            first_day, next_month_first_day = get_month_window(year, month)
+            start_date, end_date = first_day, next_month_first_day - timedelta(days=1)
+    except (KeyError, ValueError):
+        flash('Período inválido para download.', 'error')
+        return redirect(url_for('home_fiscal'))
+    if start_date > end_date:
+        flash('A data inicial deve ser anterior à data final.', 'error')
+        return redirect(url_for('home_fiscal'))
 
     # Buscar fiscal
     fiscal = Employee.query.get(session['employee_id'])
@@ -3884,71 +3815,134 @@ def download_activities():
         flash('Fiscal não encontrado.', 'error')
         return redirect(url_for('index'))
 
-    # Buscar colaboradores
-    employees_query = Employee.query.filter_by(unit=fiscal.unit, role='colaborador')
-    if name_filter:
-        employees_query = employees_query.filter(Employee.name.ilike(f'%{name_filter}%'))
-    employees = employees_query.all()
-
-    # Preparar dados para CSV
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Nome', 'Matrícula', 'Função', 'Dia', 'Dia da Semana', 'Status', 'Descrição', 'Tipo', 'Projeto', 'Local', 'Horas'])
-
-    _, last_day = calendar.monthrange(year, month)
-    weekdays = ['Segunda-feira', 'Terça-feira', 'Quarta-feira', 'Quinta-feira', 'Sexta-feira', 'Sábado', 'Domingo']
-    today = datetime.now().date()
-
-    for employee in employees:
-        activities = Activity.query.filter_by(employee_id=employee.id).filter(
-            db.extract('month', Activity.date) == month,
-            db.extract('year', Activity.date) == year
-        ).all()
-        activities_dict = {
-            activity.date.day: {
-                'description': activity.description,
-                'type': activity.type or 'N/A',
-                'project': activity.project or 'N/A',
-                'location': activity.location or 'N/A',
-                'hours': ((activity.end_datetime - activity.start_datetime).total_seconds() / 3600) if activity.start_datetime and activity.end_datetime else 'N/A'
-            } for activity in activities
-        }
-
-        for day in range(1, last_day + 1):
-            activity_date = date(year, month, day)
-            is_weekend = activity_date.weekday() >= 5
-            status = None if is_weekend else (
-                'Concluído' if day in activities_dict else (
-                    'Pendente' if activity_date > today else 'Em Falta'
-                )
-            )
-            description = activities_dict.get(day, {}).get('description', 'Nenhuma atividade registrada' if not is_weekend else 'Não preenchível')
-            activity_type = activities_dict.get(day, {}).get('type', 'N/A')
-            project = activities_dict.get(day, {}).get('project', 'N/A')
-            location = activities_dict.get(day, {}).get('location', 'N/A')
-            hours = activities_dict.get(day, {}).get('hours', 'N/A')
-
-            writer.writerow([
-                employee.name,
-                employee.employer_code or 'N/A',
-                employee.position or 'N/A',
-                f'{day:02d}',
-                weekdays[activity_date.weekday()],
-                status or '-',
-                description,
-                activity_type,
-                project,
-                location,
-                hours
-            ])
+    if (start_date.year, start_date.month) == (end_date.year, end_date.month) and start_date.day == 1 \
+            and end_date.day == days_in_month(end_date.year, end_date.month):
+        filename = f'atividades_{unit}_{start_date.year}{start_date.month:02d}.csv'
+    else:
+        filename = f'atividades_{unit}_{start_date:%Y%m%d}_{end_date:%Y%m%d}.csv'
+    if compress:
+        filename += '.gz'
 
-    output.seek(0)
+    rows = iter_activity_csv_rows(fiscal.unit, start_date, end_date, name_filter=name_filter)
     return Response(
-        output.getvalue(),
-        mimetype='text/csv',
-        headers={'Content-Disposition': f'attachment; filename=atividades_{unit}_{year}{month:02d}.csv'}
+        stream_with_context(stream_activity_csv(rows, compress=compress)),
+        mimetype='application/gzip' if compress else 'text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
     )
 
+@app.cli.command('backfill-pin-index')
+@click.option('--json-file', default='employees.json', show_default=True, help='Arquivo JSON com os PINs originais.')
+@click.option('--batch-size', default=200, show_default=True, help='Funcionários processados por commit.')
+def backfill_pin_index(json_file, batch_size):
+    """Preenche employee.pin_index (HMAC) em lotes a partir dos PINs do JSON."""
+    with open(json_file, 'r', encoding='utf-8') as f:
+        employees_data = json.load(f)
+
+    # PINs candidatos por matrícula (ou A{pin}) e por e-mail
+    candidate_pins = {}
+    for emp_data in employees_data:
+        pin = str(emp_data.get('pin', '')).strip()
+        if not pin:
+            continue
+        for key in (emp_data.get('Matrícula'), f"A{pin}", emp_data.get('email')):
+            if key:
+                candidate_pins.setdefault(str(key), pin)
+
+    updated = 0
+    unresolved = []
+    last_id = 0
+    while True:
+        batch = Employee.query.filter(Employee.id > last_id).order_by(Employee.id).limit(batch_size).all()
+        if not batch:
+            break
+        for employee in batch:
+            pin = candidate_pins.get(employee.employer_code or '') or candidate_pins.get(employee.email or '')
+            # Só grava o índice se o PIN do JSON confere com o hash armazenado
+            if not pin or not check_password_hash(employee.pin, pin):
+                if employee.role in ['funcionario', 'colaborador']:
+                    unresolved.append(employee.employer_code or str(employee.id))
+                continue
+            pin_index = pin_digest(pin)
+            if employee.pin_index == pin_index:
+                continue
+            if Employee.query.filter(Employee.pin_index == pin_index, Employee.id != employee.id).first():
+                click.echo(f"Aviso: PIN de {employee.employer_code or employee.id} já usado por outro funcionário.")
+                unresolved.append(employee.employer_code or str(employee.id))
+                continue
+            employee.pin_index = pin_index
+            updated += 1
+        db.session.commit()
+        last_id = batch[-1].id
+        click.echo(f"Lote até id={last_id} processado ({updated} índices atualizados).")
+
+    click.echo(f"Backfill concluído: {updated} índices atualizados.")
+    if unresolved:
+        click.echo(f"Sem PIN verificável ({len(unresolved)}): {', '.join(unresolved)}")
+
+@app.cli.command('add-holiday')
+@click.argument('holiday_date')
+@click.argument('name')
+@click.option('--unit', default=None, help='Unidade do feriado; sem a opção, vale para todas.')
+def add_holiday(holiday_date, name, unit):
+    """Cadastra um feriado (AAAA-MM-DD) além dos nacionais."""
+    holiday_date = datetime.strptime(holiday_date, '%Y-%m-%d').date()
+    holiday = Holiday.query.filter_by(date=holiday_date, unit=unit).first()
+    if holiday:
+        holiday.name = name
+    else:
+        db.session.add(Holiday(date=holiday_date, name=name, unit=unit))
+    invalidate_holiday_report_cache(holiday_date, unit)
+    db.session.commit()
+    business_calendar.clear_cache()
+    click.echo(f"Feriado {holiday_date:%d/%m/%Y} ({name}) cadastrado para {unit or 'todas as unidades'}.")
+
+@app.cli.command('remove-holiday')
+@click.argument('holiday_date')
+@click.option('--unit', default=None, help='Unidade do feriado; sem a opção, o feriado geral.')
+def remove_holiday(holiday_date, unit):
+    """Remove um feriado cadastrado (AAAA-MM-DD)."""
+    holiday_date = datetime.strptime(holiday_date, '%Y-%m-%d').date()
+    removed = Holiday.query.filter_by(date=holiday_date, unit=unit).delete()
+    if removed:
+        invalidate_holiday_report_cache(holiday_date, unit)
+    db.session.commit()
+    business_calendar.clear_cache()
+    click.echo(f"Feriados removidos: {removed}.")
+
+@app.cli.command('reconcile-monthly-summary')
+@click.option('--start', 'start_date', default=None, help='Primeiro mês (AAAA-MM); padrão: MONTHLY_SUMMARY_RECONCILE_MONTHS atrás.')
+@click.option('--end', 'end_date', default=None, help='Último mês (AAAA-MM); padrão: mês atual.')
+def reconcile_monthly_summary_command(start_date, end_date):
+    """Recalcula monthly_summary a partir das atividades e corrige as divergências."""
+    today = date.today()
+    end = datetime.strptime(end_date, '%Y-%m').date() if end_date else today
+    if start_date:
+        start = datetime.strptime(start_date, '%Y-%m').date()
+    else:
+        year, month = divmod(end.year * 12 + end.month - 1 - (app.config['MONTHLY_SUMMARY_RECONCILE_MONTHS'] - 1), 12)
+        start = date(year, month + 1, 1)
+    repaired = reconcile_monthly_summary(db, start, end)
+    click.echo(f"Resumos mensais de {start:%m/%Y} a {end:%m/%Y} conferidos: {repaired} corrigidos.")
+
+@app.cli.command('prerender-reports')
+@click.option('--month', 'month_str', default=None, help='Mês (AAAA-MM); padrão: mês anterior.')
+def prerender_reports_command(month_str):
+    """Gera os PDFs individuais do mês para o cache de relatórios (como o job do scheduler)."""
+    if month_str:
+        month_start = datetime.strptime(month_str, '%Y-%m').date()
+    else:
+        month_start = (date.today().replace(day=1) - timedelta(days=1)).replace(day=1)
+    ready, failed = prerender_month_reports(app, db, month_start.year, month_start.month)
+    click.echo(f"Relatórios de {month_start:%m/%Y}: {ready} prontos, {failed} com erro.")
+
+@app.cli.command('report-worker')
+@click.option('--workers', type=int, default=None, help='Threads de geração (padrão: REPORT_JOB_WORKERS ou 2).')
+def report_worker(workers):
+    """Executa os workers de relatórios neste processo (web com REPORT_JOB_WORKERS=0)."""
+    report_jobs.workers = workers or report_jobs.workers or 2
+    click.echo(f"Workers de relatórios: {report_jobs.workers}, broker: {app.config['REPORT_JOB_BROKER']}")
+    report_jobs.run_forever()
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
@@ -3966,4 +3960,5 @@ if __name__ == '__main__':
             print(f"Arquivo JSON não encontrado: {json_file_path}")
         create_employer_accounts()
         init_scheduler(app, db)  # Inicializar o scheduler
+    warm_up_app_pools(app, db)  # Com gunicorn, feito em cada worker por gunicorn.conf.py
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,208 @@
+import os
+import zipfile
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, NullObject, StreamObject
+
+# Tamanho dos blocos enviados ao cliente e lidos de cada arquivo
+CHUNK_SIZE = 64 * 1024
+
+class _ChunkSink:
+    """Destino de escrita não posicionável: acumula bytes até serem entregues pelo gerador."""
+
+    def __init__(self):
+        self._chunks = []
+        self._size = 0
+        self.position = 0
+
+    def write(self, data):
+        if data:
+            self._chunks.append(bytes(data))
+            self._size += len(data)
+            self.position += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pending(self):
+        return self._size
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self._size = 0
+        return data
+
+def unique_names(paths):
+    """Nome de cada arquivo dentro do ZIP, sem repetições."""
+    used = set()
+    for path in paths:
+        name = os.path.basename(path)
+        base, ext = os.path.splitext(name)
+        counter = 1
+        while name in used:
+            counter += 1
+            name = f"{base}_{counter}{ext}"
+        used.add(name)
+        yield path, name
+
+def stream_zip(paths):
+    """Gera um ZIP com os PDFs de `paths` em blocos, sem arquivo temporário.
+
+    Cada PDF é lido em blocos de CHUNK_SIZE; só o bloco atual fica em memória.
+    """
+    sink = _ChunkSink()
+    # Destino sem seek: o zipfile grava tamanhos e CRC em descritores após cada arquivo
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        for path, name in unique_names(paths):
+            with open(path, 'rb') as source, archive.open(name, 'w', force_zip64=True) as target:
+                while True:
+                    block = source.read(CHUNK_SIZE)
+                    if not block:
+                        break
+                    target.write(block)
+                    if sink.pending() >= CHUNK_SIZE:
+                        yield sink.take()
+            yield sink.take()
+    yield sink.take()
+
+class _MergedPdfWriter:
+    """Escreve um PDF combinado objeto a objeto.
+
+    Os objetos de cada documento são renumerados e gravados assim que
+    visitados; ao final ficam em memória apenas os offsets e a lista de páginas.
+    """
+
+    CATALOG = 1
+    PAGES = 2
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.offsets = {}
+        self.kids = []
+        self.next_number = 3
+        sink.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+
+    def _allocate(self):
+        number = self.next_number
+        self.next_number += 1
+        return number
+
+    def _begin(self, number):
+        self.offsets[number] = self.sink.position
+        self.sink.write(b'%d 0 obj\n' % number)
+
+    def _end(self):
+        self.sink.write(b'\nendobj\n')
+
+    def _write_dict(self, value, ref, skip=None, extra=b''):
+        sink = self.sink
+        sink.write(b'<<\n')
+        for key, item in dict.items(value):
+            if key == skip:
+                continue
+            key.write_to_stream(sink, None)
+            sink.write(b' ')
+            self._write_value(item, ref)
+            sink.write(b'\n')
+        sink.write(extra)
+        sink.write(b'>>')
+
+    def _write_value(self, value, ref):
+        sink = self.sink
+        if isinstance(value, IndirectObject):
+            number = ref(value)
+            if number is None:
+                sink.write(b'null')
+            else:
+                sink.write(b'%d 0 R' % number)
+        elif isinstance(value, StreamObject):
+            data = value._data
+            self._write_dict(value, ref, skip='/Length', extra=b'/Length %d\n' % len(data))
+            sink.write(b'\nstream\n')
+            sink.write(data)
+            sink.write(b'\nendstream')
+        elif isinstance(value, DictionaryObject):
+            self._write_dict(value, ref)
+        elif isinstance(value, ArrayObject):
+            sink.write(b'[')
+            for index, item in enumerate(value):
+                if index:
+                    sink.write(b' ')
+                self._write_value(item, ref)
+            sink.write(b']')
+        else:
+            value.write_to_stream(sink, None)
+
+    def add_document(self, path):
+        """Copia todas as páginas de `path`; gera (para o chamador poder esvaziar o buffer)."""
+        reader = PdfReader(path)
+        numbers = {}
+        queue = []
+
+        def ref(indirect):
+            key = (indirect.idnum, indirect.generation)
+            if key not in numbers:
+                target = indirect.get_object()
+                # A árvore de páginas e o catálogo de origem não são copiados
+                if isinstance(target, DictionaryObject) and target.get('/Type') in ('/Pages', '/Catalog'):
+                    numbers[key] = None
+                else:
+                    numbers[key] = self._allocate()
+                    queue.append((numbers[key], target))
+            return numbers[key]
+
+        pages = list(reader.pages)
+        page_numbers = []
+        for page in pages:
+            number = self._allocate()
+            if page.indirect_reference is not None:
+                numbers[(page.indirect_reference.idnum, page.indirect_reference.generation)] = number
+            page_numbers.append(number)
+
+        for page, number in zip(pages, page_numbers):
+            self._begin(number)
+            self._write_dict(page, ref, skip='/Parent', extra=b'/Parent %d 0 R\n' % self.PAGES)
+            self._end()
+            self.kids.append(number)
+            while queue:
+                object_number, target = queue.pop()
+                self._begin(object_number)
+                self._write_value(target if target is not None else NullObject(), ref)
+                self._end()
+            yield
+
+    def finish(self):
+        sink = self.sink
+        self._begin(self.PAGES)
+        sink.write(b'<< /Type /Pages /Count %d /Kids [' % len(self.kids))
+        for index in range(0, len(self.kids), 256):
+            sink.write(b' '.join(b'%d 0 R' % kid for kid in self.kids[index:index + 256]))
+            sink.write(b'\n')
+        sink.write(b'] >>')
+        self._end()
+        self._begin(self.CATALOG)
+        sink.write(b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGES)
+        self._end()
+
+        xref_offset = sink.position
+        size = self.next_number
+        sink.write(b'xref\n0 %d\n0000000000 65535 f\r\n' % size)
+        for number in range(1, size):
+            sink.write(b'%010d 00000 n\r\n' % self.offsets[number])
+        sink.write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            size, self.CATALOG, xref_offset))
+
+def stream_merged_pdf(paths):
+    """Gera um único PDF com as páginas de todos os `paths`, em blocos.
+
+    Apenas um documento de origem fica aberto por vez.
+    """
+    sink = _ChunkSink()
+    writer = _MergedPdfWriter(sink)
+    for path in paths:
+        for _ in writer.add_document(path):
+            if sink.pending() >= CHUNK_SIZE:
+                yield sink.take()
+    writer.finish()
+    yield sink.take()
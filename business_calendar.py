@@ -0,0 +1,154 @@
+import calendar
+import time
+from datetime import date, timedelta
+from functools import lru_cache
+from types import MappingProxyType
+from models import db, Holiday
+
+# Calendário de dias úteis: segunda a sexta, exceto feriados nacionais e os
+# cadastrados na tabela holiday (gerais ou de uma unidade). Os meses ficam em
+# cache como bitmaps (bit d-1 = dia d é útil), então contagens e listas de dias
+# úteis entre duas datas saem de operações de bits, sem percorrer o calendário.
+
+# Nomes dos dias da semana na ordem de date.weekday() (0 = segunda-feira)
+WEEKDAY_NAMES = ('Segunda-feira', 'Terça-feira', 'Quarta-feira', 'Quinta-feira', 'Sexta-feira', 'Sábado', 'Domingo')
+# Mesmos nomes em minúsculas, como aparecem nos relatórios
+WEEKDAYS_PT = MappingProxyType({index: name.lower() for index, name in enumerate(WEEKDAY_NAMES)})
+
+# Feriados nacionais de data fixa (Leis 662/1949, 6.802/1980 e 14.759/2023)
+NATIONAL_HOLIDAYS = (
+    (1, 1, 'Confraternização Universal'),
+    (4, 21, 'Tiradentes'),
+    (5, 1, 'Dia do Trabalho'),
+    (9, 7, 'Independência do Brasil'),
+    (10, 12, 'Nossa Senhora Aparecida'),
+    (11, 2, 'Finados'),
+    (11, 15, 'Proclamação da República'),
+    (11, 20, 'Dia Nacional de Zumbi e da Consciência Negra'),
+    (12, 25, 'Natal'),
+)
+CONSCIENCIA_NEGRA_SINCE = 2024
+# Feriados do banco são relidos depois deste intervalo (cada worker tem o seu cache)
+HOLIDAY_CACHE_SECONDS = 300
+
+def easter(year):
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    weekday_offset = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * weekday_offset) // 451
+    month, day = divmod(h + weekday_offset - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+@lru_cache(maxsize=32)
+def national_holidays(year):
+    """{data: nome} dos feriados nacionais do ano."""
+    holidays = {
+        date(year, month, day): name for month, day, name in NATIONAL_HOLIDAYS
+        if (month, day) != (11, 20) or year >= CONSCIENCIA_NEGRA_SINCE
+    }
+    holidays[easter(year) - timedelta(days=2)] = 'Sexta-feira Santa'
+    return MappingProxyType(holidays)
+
+def _generation():
+    return int(time.monotonic() // HOLIDAY_CACHE_SECONDS)
+
+@lru_cache(maxsize=256)
+def _holidays(year, unit, generation):
+    holidays = dict(national_holidays(year))
+    scope = Holiday.unit.is_(None)
+    if unit:
+        scope = db.or_(scope, Holiday.unit == unit)
+    rows = db.session.query(Holiday.date, Holiday.name).filter(
+        Holiday.date >= date(year, 1, 1), Holiday.date < date(year + 1, 1, 1), scope
+    )
+    for holiday_date, name in rows:
+        holidays[holiday_date] = name
+    return MappingProxyType(holidays)
+
+@lru_cache(maxsize=1024)
+def _month(year, month, unit, generation):
+    first_weekday, last_day = calendar.monthrange(year, month)
+    holidays = _holidays(year, unit, generation)
+    layout = []
+    mask = 0
+    for index in range(last_day):
+        weekday = (first_weekday + index) % 7
+        holiday = holidays.get(date(year, month, index + 1))
+        if weekday < 5 and holiday is None:
+            mask |= 1 << index
+        layout.append(MappingProxyType({'day': index + 1, 'weekday': WEEKDAY_NAMES[weekday], 'holiday': holiday}))
+    return tuple(layout), mask
+
+def clear_cache():
+    """Descarta os feriados e meses em cache (ex.: depois de cadastrar um feriado)."""
+    _holidays.cache_clear()
+    _month.cache_clear()
+
+def holidays(year, unit=None):
+    """{data: nome} dos feriados do ano: nacionais, gerais e os da unidade."""
+    return _holidays(year, unit, _generation())
+
+def month_layout(year, month, unit=None):
+    """Dias do mês como {'day', 'weekday', 'holiday'} (holiday = nome ou None)."""
+    return _month(year, month, unit, _generation())[0]
+
+def business_day_mask(year, month, unit=None):
+    """Bitmap dos dias úteis do mês: bit d-1 ligado quando o dia d é útil."""
+    return _month(year, month, unit, _generation())[1]
+
+def days_in_month(year, month):
+    return calendar.monthrange(year, month)[1]
+
+def is_weekend(day):
+    return day.weekday() >= 5
+
+def is_business_day(day, unit=None):
+    return bool(business_day_mask(day.year, day.month, unit) >> (day.day - 1) & 1)
+
+def holiday_name(day, unit=None):
+    return holidays(day.year, unit).get(day)
+
+def count_weekdays(start, end):
+    """Segundas a sextas em [start, end], sem considerar feriados.
+
+    Semanas inteiras valem 5 dias; só os até 6 dias restantes são conferidos.
+    """
+    if start > end:
+        return 0
+    weeks, remainder = divmod((end - start).days + 1, 7)
+    first_weekday = start.weekday()
+    return weeks * 5 + sum(1 for offset in range(remainder) if (first_weekday + offset) % 7 < 5)
+
+def _month_masks(start, end, unit):
+    """(primeiro dia do mês, bitmap dos dias úteis) de cada mês, recortado a [start, end]."""
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        mask = business_day_mask(year, month, unit)
+        if (year, month) == (end.year, end.month):
+            mask &= (1 << end.day) - 1
+        if (year, month) == (start.year, start.month):
+            mask = mask >> (start.day - 1) << (start.day - 1)
+        yield date(year, month, 1), mask
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+def count_business_days(start, end, unit=None):
+    """Dias úteis em [start, end] (contagem de bits dos meses em cache)."""
+    if start > end:
+        return 0
+    return sum(bin(mask).count('1') for _, mask in _month_masks(start, end, unit))
+
+def iter_business_days(start, end, unit=None):
+    """Datas dos dias úteis em [start, end], em ordem."""
+    if start > end:
+        return
+    for first_day, mask in _month_masks(start, end, unit):
+        while mask:
+            lowest = mask & -mask
+            yield first_day + timedelta(days=lowest.bit_length() - 1)
+            mask ^= lowest
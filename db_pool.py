@@ -0,0 +1,174 @@
+import os
+import time
+import logging
+import threading
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'sim', 'on')
+
+def pool_config():
+    """Configuração do pool a partir das variáveis de ambiente DB_POOL_*."""
+    return {
+        'DB_POOL_SIZE': int(os.environ.get('DB_POOL_SIZE', 5)),  # Conexões mantidas abertas por worker
+        'DB_MAX_OVERFLOW': int(os.environ.get('DB_MAX_OVERFLOW', 10)),  # Conexões extras em picos
+        'DB_POOL_RECYCLE': int(os.environ.get('DB_POOL_RECYCLE', 1800)),  # Segundos; manter abaixo do wait_timeout do MySQL
+        'DB_POOL_PRE_PING': _env_bool('DB_POOL_PRE_PING', True),  # Testa a conexão antes de entregá-la
+        'DB_POOL_TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 30)),  # Espera máxima por uma conexão livre
+        'DB_POOL_WARMUP': _env_bool('DB_POOL_WARMUP', True),  # Abrir o pool mínimo ao iniciar o worker
+    }
+
+class PoolMetrics:
+    """Contadores do pool deste processo (cada worker do gunicorn tem os seus)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            waits = self.checkouts + self.timeouts
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'connects': self.connects,
+                'invalidations': self.invalidations,
+                'wait_avg_ms': round(self.wait_total / waits * 1000, 3) if waits else 0.0,
+                'wait_max_ms': round(self.wait_max * 1000, 3),
+            }
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool que mede o tempo de espera de cada checkout."""
+
+    def __init__(self, *args, metrics=None, **kw):
+        super().__init__(*args, **kw)
+        self.metrics = metrics or PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            logger.warning(f"Pool de conexões esgotado (pid={os.getpid()}): {self.status()}")
+            raise
+        self.metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # dispose() recria o pool; os contadores do worker continuam
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+def engine_options(uri, config):
+    """SQLALCHEMY_ENGINE_OPTIONS para `uri` com a configuração DB_POOL_*."""
+    options = {
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+    }
+    # SQLite em memória usa um pool próprio (uma conexão por thread)
+    if uri.startswith('sqlite') and (uri.rstrip('/') == 'sqlite:' or ':memory:' in uri):
+        return options
+    options.update(
+        poolclass=MeteredQueuePool,
+        pool_size=config['DB_POOL_SIZE'],
+        max_overflow=config['DB_MAX_OVERFLOW'],
+        pool_timeout=config['DB_POOL_TIMEOUT'],
+    )
+    return options
+
+def pool_status(engine):
+    """Estado atual do pool e métricas acumuladas do worker."""
+    pool = engine.pool
+    status = {'pid': os.getpid(), 'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    if isinstance(pool, MeteredQueuePool):
+        status.update(pool.metrics.snapshot())
+    return status
+
+def warm_up_pool(engine):
+    """Abre as pool_size conexões do pool antes do worker receber requisições."""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return 0
+    connections = []
+    start = time.perf_counter()
+    try:
+        for _ in range(pool.size()):
+            connection = engine.connect()
+            connections.append(connection)
+            connection.exec_driver_sql('SELECT 1')
+    except Exception as e:
+        logger.warning(f"Aquecimento do pool interrompido após {len(connections)} conexões: {str(e)}")
+    finally:
+        for connection in connections:
+            connection.close()
+    logger.info(f"Pool aquecido com {len(connections)} conexões em {(time.perf_counter() - start) * 1000:.0f} ms (pid={os.getpid()})")
+    return len(connections)
+
+def warm_up_app_pools(app, db):
+    """Aquece os pools do primário e das réplicas, se DB_POOL_WARMUP estiver ativo.
+
+    Deve rodar em cada worker, depois do fork: com gunicorn, pelo hook
+    post_worker_init de gunicorn.conf.py. Feito na importação do app, com
+    --preload as conexões seriam abertas no processo mestre e descartadas em
+    cada worker (ver _instrument).
+    """
+    if not app.config.get('DB_POOL_WARMUP'):
+        return 0
+    with app.app_context():
+        engines = list(db.engines.values())
+    return sum(warm_up_pool(engine) for engine in engines)
+
+def _instrument(engine):
+    pool = engine.pool
+    if isinstance(pool, MeteredQueuePool):
+        # Os eventos ficam no engine e valem também para o pool recriado por dispose()
+        event.listen(engine, 'connect', lambda *args: engine.pool.metrics.increment('connects'))
+        event.listen(engine, 'invalidate', lambda *args: engine.pool.metrics.increment('invalidations'))
+
+    # Com gunicorn --preload o processo mestre importa o app: os workers não
+    # podem reaproveitar as conexões herdadas, apenas abrir as suas
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+def init_db_pool(app, db):
+    """Registra as métricas de conexão dos engines e protege os pools contra fork."""
+    with app.app_context():
+        engines = list(db.engines.values())  # Primário e réplicas (SQLALCHEMY_BINDS)
+
+    for engine in engines:
+        _instrument(engine)
+    return engines
@@ -0,0 +1,182 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, g, has_app_context, has_request_context, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+logger = logging.getLogger(__name__)
+
+# Prefixo dos bind keys das réplicas em SQLALCHEMY_BINDS (replica_0, replica_1, ...)
+REPLICA_BIND_PREFIX = 'replica_'
+# Chave da sessão Flask com o instante (epoch) da última escrita do usuário
+LAST_WRITE_KEY = 'db_last_write'
+
+def replica_config():
+    """Configuração das réplicas de leitura a partir das variáveis de ambiente."""
+    urls = os.environ.get('DATABASE_REPLICA_URLS', '')
+    return {
+        'DATABASE_REPLICA_URLS': [url.strip() for url in urls.split(',') if url.strip()],  # Vazio = só o primário
+        'DB_REPLICA_MAX_LAG': float(os.environ.get('DB_REPLICA_MAX_LAG', 5)),  # Atraso máximo aceito, em segundos
+        'DB_REPLICA_LAG_CHECK': float(os.environ.get('DB_REPLICA_LAG_CHECK', 10)),  # Intervalo entre medições do atraso
+    }
+
+def replica_binds(config, engine_options):
+    """SQLALCHEMY_BINDS das réplicas, com as mesmas opções de pool do primário."""
+    return {
+        f'{REPLICA_BIND_PREFIX}{index}': dict(engine_options(url, config), url=url)
+        for index, url in enumerate(config['DATABASE_REPLICA_URLS'])
+    }
+
+class RoutingSession(Session):
+    """Sessão que envia SELECTs para a réplica escolhida por replica_reads().
+
+    Escritas (flush, UPDATE/DELETE em massa, SELECT ... FOR UPDATE) vão para o
+    primário; depois da primeira escrita, toda a transação continua no
+    primário para enxergar o que acabou de ser gravado.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get('replica')
+        if bind is None and replica is not None and not self.info.get('pinned'):
+            if not self._flushing and _is_plain_select(clause):
+                return replica
+            self.info['pinned'] = True
+        if bind is None and (self._flushing or getattr(clause, 'is_dml', False)):
+            _mark_write()
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def _is_plain_select(clause):
+    return getattr(clause, 'is_select', False) and getattr(clause, '_for_update_arg', None) is None
+
+def _mark_write():
+    if has_request_context():
+        g.db_write_at = time.time()
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _unpin(session, transaction):
+    # Nova transação: as leituras podem voltar para a réplica
+    if transaction.parent is None:
+        session.info.pop('pinned', None)
+
+class ReplicaRouter:
+    """Escolhe, entre as réplicas configuradas, uma com atraso dentro da tolerância.
+
+    O atraso de cada réplica é medido no máximo a cada DB_REPLICA_LAG_CHECK
+    segundos; réplicas fora do ar ou com a replicação parada ficam de fora até
+    a próxima medição.
+    """
+
+    def __init__(self, app, db):
+        self.app = app
+        self.db = db
+        self.max_lag = app.config['DB_REPLICA_MAX_LAG']
+        self.lag_check = app.config['DB_REPLICA_LAG_CHECK']
+        self.keys = sorted(key for key in app.config.get('SQLALCHEMY_BINDS', {})
+                           if key and key.startswith(REPLICA_BIND_PREFIX))
+        self._lags = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def measure_lag(self, engine):
+        """Atraso da réplica em segundos; None se não for possível usá-la."""
+        with engine.connect() as connection:
+            if engine.dialect.name != 'mysql':
+                connection.execute(text('SELECT 1'))
+                return 0.0
+            try:
+                row = connection.execute(text('SHOW REPLICA STATUS')).mappings().first()
+            except Exception:
+                row = connection.execute(text('SHOW SLAVE STATUS')).mappings().first()  # MySQL < 8.0.22
+            if row is None:
+                return 0.0  # Não é réplica (ex.: primário usado como réplica em desenvolvimento)
+            lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+            return None if lag is None else float(lag)
+
+    def lag(self, key):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._lags.get(key)
+            if cached is not None and now - cached[0] < self.lag_check:
+                return cached[1]
+        try:
+            lag = self.measure_lag(self.db.engines[key])
+        except Exception as e:
+            logger.warning(f"Réplica {key} indisponível: {str(e)}")
+            lag = None
+        with self._lock:
+            self._lags[key] = (now, lag)
+        return lag
+
+    def choose(self, fresh_since=None):
+        """Bind key de uma réplica utilizável, em rodízio; None para usar o primário.
+
+        `fresh_since` (epoch) exige que a réplica já contenha as escritas
+        feitas até esse instante.
+        """
+        if not self.keys:
+            return None
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.keys)
+        now = time.time()
+        for offset in range(len(self.keys)):
+            key = self.keys[(start + offset) % len(self.keys)]
+            lag = self.lag(key)
+            if lag is None or lag > self.max_lag:
+                continue
+            if fresh_since is not None and now - lag < fresh_since:
+                continue
+            return key
+        return None
+
+    def status(self):
+        return {key: {'lag': self.lag(key)} for key in self.keys}
+
+def _epoch(value):
+    if isinstance(value, datetime):
+        # Datas do banco são gravadas em UTC (datetime.utcnow)
+        return value.replace(tzinfo=timezone.utc).timestamp() if value.tzinfo is None else value.timestamp()
+    return value
+
+@contextmanager
+def replica_reads(fresh_since=None):
+    """Envia as leituras da sessão atual para uma réplica, se houver uma utilizável."""
+    router = current_app.extensions.get('db_routing') if has_app_context() else None
+    key = router.choose(_epoch(fresh_since)) if router else None
+    if key is None:
+        yield None
+        return
+    session = router.db.session()
+    previous = session.info.get('replica')
+    session.info['replica'] = router.db.engines[key]
+    try:
+        yield key
+    finally:
+        session.info['replica'] = previous
+
+def read_replica(view):
+    """Rota somente leitura: consulta uma réplica, exceto logo após uma escrita do próprio usuário."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with replica_reads(fresh_since=flask_session.get(LAST_WRITE_KEY)):
+            return view(*args, **kwargs)
+    return wrapper
+
+def init_db_routing(app, db):
+    router = ReplicaRouter(app, db)
+    app.extensions['db_routing'] = router
+
+    @app.after_request
+    def remember_last_write(response):
+        # Guarda na sessão do usuário quando ele escreveu pela última vez, para
+        # as próximas leituras só usarem réplicas que já receberam a escrita
+        if 'db_write_at' in g:
+            flask_session[LAST_WRITE_KEY] = g.db_write_at
+        return response
+
+    return router
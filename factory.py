@@ -0,0 +1,75 @@
+import os
+import logging
+from flask import Flask
+from flask_mail import Mail
+from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
+from models import db  # Registro único de modelos (e de engine/pool) do processo
+from report_jobs import init_report_jobs
+from db_pool import pool_config, engine_options, init_db_pool
+from db_routing import replica_config, replica_binds, init_db_routing
+from monthly_summary import init_monthly_summary
+
+logger = logging.getLogger(__name__)
+
+mail = Mail()
+migrate = Migrate()
+
+def default_config():
+    """Configuração padrão, com os valores sensíveis vindos de variáveis de ambiente."""
+    config = {
+        'SECRET_KEY': os.environ.get('SECRET_KEY', os.urandom(32).hex()),
+        'SQLALCHEMY_DATABASE_URI': os.environ.get('DATABASE_URL', 'mysql+pymysql://root:@localhost/rdat_db'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'UPLOAD_FOLDER': 'static/uploads',
+        'REPORT_FOLDER': 'static/reports',
+        'MAIL_SERVER': 'smtp.gmail.com',  # Exemplo: SMTP do Gmail
+        'MAIL_PORT': 587,
+        'MAIL_USE_TLS': True,
+        'MAIL_USERNAME': os.environ.get('EMAIL_USER', 'seuemail@example.com'),  # Use variável de ambiente
+        'MAIL_PASSWORD': os.environ.get('EMAIL_PASS', 'sua-senha'),  # Use variável de ambiente
+        'PIN_PEPPER': os.environ.get('PIN_PEPPER'),  # Obrigatório no app web (ver app.py); sem valor padrão
+        'REPORT_JOB_WORKERS': int(os.environ.get('REPORT_JOB_WORKERS', 2)),  # 0 = apenas enfileirar (ver flask report-worker)
+        'REPORT_JOB_BROKER': os.environ.get('REPORT_JOB_BROKER', 'local'),  # 'local' ou 'modulo:Classe'
+        'REPORT_RENDER_WORKERS': int(os.environ.get('REPORT_RENDER_WORKERS', 2)),  # Processos por PDF consolidado; 0 ou 1 = em série
+        'REPORT_RETENTION_DAYS': int(os.environ.get('REPORT_RETENTION_DAYS', 60)),  # Relatórios mais antigos são excluídos pelo scheduler
+        'REPORT_RETENTION_BATCH_SIZE': int(os.environ.get('REPORT_RETENTION_BATCH_SIZE', 500)),  # Relatórios por transação da exclusão
+        'REPORT_PRERENDER_DAYS': os.environ.get('REPORT_PRERENDER_DAYS', '1-3'),  # Dias do mês (cron) da pré-geração do mês anterior
+        'REPORT_PRERENDER_MAX_WAIT_SECONDS': int(os.environ.get('REPORT_PRERENDER_MAX_WAIT_SECONDS', 600)),  # Espera máxima pela fila livre, por relatório
+        'SCHEDULER_LOG_FILE': os.environ.get('SCHEDULER_LOG_FILE', 'scheduler.log'),  # Log do scheduler (configurado em init_scheduler)
+    }
+    config.update(pool_config())  # DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, ... (ver db_pool.py)
+    config.update(replica_config())  # DATABASE_REPLICA_URLS, DB_REPLICA_MAX_LAG, ... (ver db_routing.py)
+    return config
+
+def create_app(config=None, import_name='app'):
+    """Cria uma aplicação com as extensões ligadas ao `db` de models.py.
+
+    `config` sobrescreve a configuração padrão. Sem as rotas do app.py, serve
+    para scripts e testes que só precisam dos modelos, por exemplo:
+
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+        with app.app_context():
+            db.create_all()
+
+    Nenhuma carga inicial (employees.json, contas de empregador, scheduler) é
+    executada aqui, nem o aquecimento do pool; isso fica no app.py.
+    """
+    app = Flask(import_name, root_path=os.path.dirname(os.path.abspath(__file__)))
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
+    app.config.update(default_config())
+    if config:
+        app.config.update(config)
+    if not app.config.get('PIN_PEPPER') and not app.testing:
+        # Scripts que só usam os modelos seguem funcionando; o app.py recusa iniciar
+        logger.error("PIN_PEPPER não definido: o índice de PINs (employee.pin_index) não pode ser calculado.")
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI'], app.config))
+    app.config.setdefault('SQLALCHEMY_BINDS', {}).update(replica_binds(app.config, engine_options))
+    db.init_app(app)
+    init_db_pool(app, db)
+    init_db_routing(app, db)
+    init_monthly_summary(app, db)
+    migrate.init_app(app, db)
+    mail.init_app(app)
+    init_report_jobs(app, db)
+    return app
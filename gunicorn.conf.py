@@ -0,0 +1,12 @@
+# Configuração lida automaticamente pelo gunicorn quando iniciado nesta pasta
+# (ex.: gunicorn app:app ou gunicorn --preload app:app).
+
+
+def post_worker_init(worker):
+    # Abrir o pool mínimo de conexões em cada worker, depois do fork e antes
+    # de aceitar requisições. Com --preload o app é importado no processo
+    # mestre, cujas conexões não podem ser compartilhadas com os workers.
+    from app import app
+    from models import db
+    from db_pool import warm_up_app_pools
+    warm_up_app_pools(app, db)
@@ -1,7 +1,7 @@
 import json
 from datetime import datetime
 from werkzeug.security import generate_password_hash
-from app import app, db, Employee  # Importa do app.py
+from app import app, db, Employee, pin_digest  # Importa do app.py
 
 json_file = "employees.json"
 
@@ -23,12 +23,18 @@ with app.app_context():
     print("Tabela employee limpa e recriada.")
 
     inserted = 0
+    used_pin_indexes = set()  # Para verificar duplicatas de PIN
     for emp in employees_data:
         if 'nome' not in emp or 'pin' not in emp:
             print(f"Erro: Registro inválido, faltando 'nome' ou 'pin': {emp}")
             continue
         pin = str(emp['pin']).strip()  # Garante que o PIN é string e sem espaços
         employer_code = emp.get('Matrícula', f"A{pin}")  # Usa Matrícula ou gera um employer_code
+        pin_index = pin_digest(pin)
+        if pin_index in used_pin_indexes:
+            print(f"Aviso: PIN duplicado para {emp['nome']}. Ignorando colaborador.")
+            continue
+        used_pin_indexes.add(pin_index)
         pin_hash = generate_password_hash(pin, method='pbkdf2:sha256', salt_length=8)
         admission_date = None
         if emp.get('Data Admissão'):
@@ -41,6 +47,7 @@ with app.app_context():
         employee = Employee(
             employer_code=employer_code,
             pin=pin_hash,
+            pin_index=pin_index,
             name=emp['nome'],
             role='colaborador',
             admission_date=admission_date,
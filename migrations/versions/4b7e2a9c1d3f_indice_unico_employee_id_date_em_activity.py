@@ -0,0 +1,33 @@
+"""indice unico (employee_id, date) em activity
+
+Revision ID: 4b7e2a9c1d3f
+Revises: 1cc230f40d6b
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e2a9c1d3f'
+down_revision = '1cc230f40d6b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Remover duplicatas (mesmo funcionário e data), mantendo o registro mais recente
+    op.execute(
+        "DELETE FROM activity WHERE id NOT IN ("
+        "SELECT keep_id FROM (SELECT MAX(id) AS keep_id FROM activity GROUP BY employee_id, date) AS keep"
+        ")"
+    )
+
+    with op.batch_alter_table('activity', schema=None) as batch_op:
+        batch_op.create_index('uq_activity_employee_date', ['employee_id', 'date'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('activity', schema=None) as batch_op:
+        batch_op.drop_index('uq_activity_employee_date')
@@ -0,0 +1,28 @@
+"""lease do worker em report_job
+
+Revision ID: 6b2e8d4f1a9c
+Revises: c5e1a9d7b3f2
+Create Date: 2026-10-18 21:14:08.302617
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b2e8d4f1a9c'
+down_revision = 'c5e1a9d7b3f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('report_job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('worker_id', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('lease_until', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('report_job', schema=None) as batch_op:
+        batch_op.drop_column('lease_until')
+        batch_op.drop_column('worker_id')
@@ -0,0 +1,87 @@
+"""pin_index (HMAC) unico em employee
+
+Revision ID: 7c1d5e8f2a6b
+Revises: 4b7e2a9c1d3f
+Create Date: 2026-10-18 10:03:27.559120
+
+"""
+import hmac
+from hashlib import sha256
+from flask import current_app
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1d5e8f2a6b'
+down_revision = '4b7e2a9c1d3f'
+branch_labels = None
+depends_on = None
+
+# PINs numéricos destes tamanhos são testados para converter os índices antigos
+PIN_LENGTHS = (4, 5, 6)
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('employee')}
+
+    # pin_index pode não existir em bancos criados antes do campo; usuários do
+    # sistema (empregador, fiscal, preposto) não têm índice de PIN
+    with op.batch_alter_table('employee', schema=None) as batch_op:
+        if 'pin_index' not in columns:
+            batch_op.add_column(sa.Column('pin_index', sa.String(length=64), nullable=True))
+        else:
+            batch_op.alter_column('pin_index',
+                   existing_type=sa.String(length=64),
+                   nullable=True)
+
+    unique_indexes = [index for index in inspector.get_indexes('employee') if index.get('unique')]
+    unique_indexes += inspector.get_unique_constraints('employee')
+    if not any(index['column_names'] == ['pin_index'] for index in unique_indexes):
+        with op.batch_alter_table('employee', schema=None) as batch_op:
+            batch_op.create_index('uq_employee_pin_index', ['pin_index'], unique=True)
+
+    # Os valores antigos são SHA-256 do PIN, sem pepper. Como os PINs são
+    # numéricos e curtos, o PIN de cada índice é recuperado testando todos os
+    # candidatos e o índice é regravado como HMAC com o pepper; índices que não
+    # correspondem a nenhum candidato são apagados (ver 'flask backfill-pin-index')
+    connection = op.get_bind()
+    employee = sa.table('employee', sa.column('id', sa.Integer), sa.column('pin_index', sa.String))
+    old_indexes = {}
+    for employee_id, pin_index in connection.execute(
+        sa.select(employee.c.id, employee.c.pin_index).where(employee.c.pin_index.isnot(None))
+    ):
+        old_indexes.setdefault(pin_index, []).append(employee_id)
+    if not old_indexes:
+        return
+
+    pepper = current_app.config['PIN_PEPPER']
+    if not pepper:
+        raise RuntimeError("Defina PIN_PEPPER para converter os índices de PIN existentes.")
+    pins = {}
+    for length in PIN_LENGTHS:
+        for number in range(10 ** length):
+            pin = str(number).zfill(length)
+            digest = sha256(pin.encode('utf-8')).hexdigest()
+            if digest in old_indexes:
+                pins[digest] = pin
+
+    converted = 0
+    for old_index, employee_ids in old_indexes.items():
+        pin = pins.get(old_index)
+        new_index = hmac.new(pepper.encode('utf-8'), pin.encode('utf-8'), sha256).hexdigest() if pin else None
+        connection.execute(
+            employee.update().where(employee.c.id.in_(employee_ids)).values(pin_index=new_index)
+        )
+        if pin:
+            converted += len(employee_ids)
+    unresolved = sum(len(employee_ids) for employee_ids in old_indexes.values()) - converted
+    print(f"pin_index convertido para HMAC: {converted}; sem PIN recuperável: {unresolved}")
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if any(index['name'] == 'uq_employee_pin_index' for index in inspector.get_indexes('employee')):
+        with op.batch_alter_table('employee', schema=None) as batch_op:
+            batch_op.drop_index('uq_employee_pin_index')
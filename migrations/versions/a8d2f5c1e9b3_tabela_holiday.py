@@ -0,0 +1,36 @@
+"""tabela holiday (feriados gerais e por unidade)
+
+Revision ID: a8d2f5c1e9b3
+Revises: f3c9a7b2e4d8
+Create Date: 2026-10-18 17:22:41.906318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d2f5c1e9b3'
+down_revision = 'f3c9a7b2e4d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('holiday',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('unit', sa.String(length=100), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('date', 'unit', name='uq_holiday_date_unit')
+    )
+    with op.batch_alter_table('holiday', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_holiday_date'), ['date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('holiday', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_holiday_date'))
+
+    op.drop_table('holiday')
@@ -0,0 +1,41 @@
+"""tabela report_cache (relatorios reaproveitados por hash dos dados)
+
+Revision ID: b5c8e1f4a9d2
+Revises: 9e4f3b2a7d51
+Create Date: 2026-10-18 12:04:52.917340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5c8e1f4a9d2'
+down_revision = '9e4f3b2a7d51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('report_cache',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('report_id', sa.Integer(), nullable=False),
+    sa.Column('employee_id', sa.Integer(), nullable=True),
+    sa.Column('unit', sa.String(length=100), nullable=True),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['report_id'], ['report.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('report_cache', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_report_cache_employee_id'), ['employee_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_report_cache_unit'), ['unit'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('report_cache', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_report_cache_unit'))
+        batch_op.drop_index(batch_op.f('ix_report_cache_employee_id'))
+
+    op.drop_table('report_cache')
@@ -0,0 +1,29 @@
+"""tabela job_checkpoint (retomada dos jobs em lotes do scheduler)
+
+Revision ID: c5e1a9d7b3f2
+Revises: a8d2f5c1e9b3
+Create Date: 2026-10-18 19:05:12.417530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e1a9d7b3f2'
+down_revision = 'a8d2f5c1e9b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job_checkpoint',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('job_checkpoint')
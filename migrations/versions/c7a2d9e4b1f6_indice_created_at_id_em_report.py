@@ -0,0 +1,26 @@
+"""indice (created_at, id) em report para paginacao por cursor
+
+Revision ID: c7a2d9e4b1f6
+Revises: b5c8e1f4a9d2
+Create Date: 2026-10-18 14:21:07.552810
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a2d9e4b1f6'
+down_revision = 'b5c8e1f4a9d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('report', schema=None) as batch_op:
+        batch_op.create_index('ix_report_created_at_id', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('report', schema=None) as batch_op:
+        batch_op.drop_index('ix_report_created_at_id')
@@ -0,0 +1,77 @@
+"""etapa de assinatura e relatorio de origem em report
+
+Revision ID: d4f8a1c3e7b2
+Revises: c7a2d9e4b1f6
+Create Date: 2026-10-18 15:02:36.140958
+
+"""
+import os
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f8a1c3e7b2'
+down_revision = 'c7a2d9e4b1f6'
+branch_labels = None
+depends_on = None
+
+STAGES = ('generated', 'employee_signed', 'preposto_signed', 'fiscal_signed')
+# Prefixo do arquivo de cada cópia assinada (ver save_*signed_pdf no app.py),
+# do mais específico para o mais genérico
+SIGNED_PREFIXES = (
+    ('fiscal_signed_', 'fiscal_signed'),
+    ('preposto_signed_', 'preposto_signed'),
+    ('signed_', 'employee_signed'),
+)
+BATCH_SIZE = 500
+
+
+def _stage_and_original(file_path):
+    name = os.path.basename(file_path or '')
+    for prefix, stage in SIGNED_PREFIXES:
+        if name.startswith(prefix):
+            return stage, name[len(prefix):]
+    # Regra antiga (LIKE '%_signed%'): 'signed' em qualquer posição após o primeiro caractere
+    if 'signed' in (file_path or '')[1:]:
+        return 'employee_signed', None
+    return 'generated', None
+
+
+def upgrade():
+    with op.batch_alter_table('report', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('signature_stage', sa.Enum(*STAGES, name='report_signature_stage'),
+                                      nullable=False, server_default='generated'))
+        batch_op.add_column(sa.Column('parent_report_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_report_parent_report_id', 'report', ['parent_report_id'], ['id'], ondelete='SET NULL')
+        batch_op.create_index(batch_op.f('ix_report_parent_report_id'), ['parent_report_id'], unique=False)
+        batch_op.create_index('ix_report_stage_created_at', ['signature_stage', 'created_at', 'id'], unique=False)
+
+    # Preencher a etapa e o original a partir dos caminhos existentes: o original
+    # de uma cópia é o último relatório gerado antes dela com o mesmo nome de
+    # arquivo, sem o prefixo
+    connection = op.get_bind()
+    rows = connection.execute(sa.text("SELECT id, file_path FROM report ORDER BY id")).all()
+    originals = {}
+    updates = []
+    for report_id, file_path in rows:
+        stage, original_name = _stage_and_original(file_path)
+        if stage == 'generated':
+            originals[os.path.basename(file_path or '')] = report_id
+        else:
+            updates.append({'id': report_id, 'stage': stage, 'parent': originals.get(original_name)})
+
+    statement = sa.text("UPDATE report SET signature_stage = :stage, parent_report_id = :parent WHERE id = :id")
+    for start in range(0, len(updates), BATCH_SIZE):
+        connection.execute(statement, updates[start:start + BATCH_SIZE])
+
+
+def downgrade():
+    with op.batch_alter_table('report', schema=None) as batch_op:
+        batch_op.drop_index('ix_report_stage_created_at')
+        batch_op.drop_index(batch_op.f('ix_report_parent_report_id'))
+        batch_op.drop_constraint('fk_report_parent_report_id', type_='foreignkey')
+        batch_op.drop_column('parent_report_id')
+        batch_op.drop_column('signature_stage')
+
+    sa.Enum(name='report_signature_stage').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,53 @@
+"""tabela report_sequence (numeracao de relatorios por dono)
+
+Revision ID: e1b6c3a8d5f0
+Revises: d4f8a1c3e7b2
+Create Date: 2026-10-18 15:48:19.604273
+
+"""
+import re
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b6c3a8d5f0'
+down_revision = 'd4f8a1c3e7b2'
+branch_labels = None
+depends_on = None
+
+REPORT_NUMBER = re.compile(r'^#(\d+)$')
+
+
+def upgrade():
+    sequence = op.create_table('report_sequence',
+    sa.Column('owner', sa.String(length=32), nullable=False),
+    sa.Column('last_number', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('owner')
+    )
+
+    # Continuar de onde a contagem antiga parou: o maior entre a quantidade de
+    # relatórios do funcionário e o maior número já emitido para ele
+    connection = op.get_bind()
+    counts = {}
+    highest = {}
+    total = 0
+    for employee_id, report_number, count in connection.execute(sa.text(
+        "SELECT employee_id, report_number, COUNT(*) FROM report GROUP BY employee_id, report_number"
+    )):
+        owner = f"employee:{employee_id}"
+        counts[owner] = counts.get(owner, 0) + count
+        match = REPORT_NUMBER.match(report_number or '')
+        if match:
+            highest[owner] = max(highest.get(owner, 0), int(match.group(1)))
+        total += count
+    last_numbers = {owner: max(count, highest.get(owner, 0)) for owner, count in counts.items()}
+    # Relatórios consolidados eram numerados pelo total da tabela
+    last_numbers['consolidated'] = total
+    op.bulk_insert(sequence, [
+        {'owner': owner, 'last_number': last_number} for owner, last_number in last_numbers.items()
+    ])
+
+
+def downgrade():
+    op.drop_table('report_sequence')
@@ -0,0 +1,83 @@
+"""tabela monthly_summary (dias uteis preenchidos por funcionario e mes)
+
+Revision ID: f3c9a7b2e4d8
+Revises: e1b6c3a8d5f0
+Create Date: 2026-10-18 16:37:55.281046
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c9a7b2e4d8'
+down_revision = 'e1b6c3a8d5f0'
+branch_labels = None
+depends_on = None
+
+LEAVE_TYPES = ('Folga', 'Atestado')
+BATCH_SIZE = 500
+# Funcionários lidos por consulta; limita a memória da leitura das atividades
+EMPLOYEE_BATCH_SIZE = 50
+
+
+def upgrade():
+    summary = op.create_table('monthly_summary',
+    sa.Column('employee_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.SmallInteger(), autoincrement=False, nullable=False),
+    sa.Column('month', sa.SmallInteger(), autoincrement=False, nullable=False),
+    sa.Column('filled_days', sa.Integer(), nullable=False),
+    sa.Column('leave_days', sa.Integer(), nullable=False),
+    sa.Column('last_activity_date', sa.Date(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['employee_id'], ['employee.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('employee_id', 'year', 'month')
+    )
+
+    # Preencher a partir de todas as atividades (mesma regra de
+    # monthly_summary.summarize), por lotes de funcionários. Cada leitura é
+    # consumida inteira antes do bulk_insert: no PyMySQL, executar outro comando
+    # na conexão descarta o restante de um cursor ainda em leitura
+    connection = op.get_bind()
+    employee_ids = connection.execute(sa.text(
+        "SELECT DISTINCT employee_id FROM activity ORDER BY employee_id"
+    )).scalars().all()
+    now = datetime.utcnow()
+    batch = []
+    for start in range(0, len(employee_ids), EMPLOYEE_BATCH_SIZE):
+        chunk = employee_ids[start:start + EMPLOYEE_BATCH_SIZE]
+        rows = connection.execute(sa.text(
+            "SELECT employee_id, date, type, description FROM activity "
+            "WHERE employee_id >= :first AND employee_id <= :last ORDER BY employee_id, date"
+        ), {'first': chunk[0], 'last': chunk[-1]}).all()
+        current = None
+        for employee_id, activity_date, activity_type, description in rows:
+            if isinstance(activity_date, str):  # SQLite devolve texto em consultas textuais
+                activity_date = datetime.strptime(activity_date[:10], '%Y-%m-%d').date()
+            key = (employee_id, activity_date.year, activity_date.month)
+            if current is None or current['key'] != key:
+                if current is not None:
+                    batch.append(current['row'])
+                current = {'key': key, 'row': {
+                    'employee_id': employee_id, 'year': key[1], 'month': key[2],
+                    'filled_days': 0, 'leave_days': 0, 'last_activity_date': activity_date, 'updated_at': now
+                }}
+            row = current['row']
+            row['last_activity_date'] = max(row['last_activity_date'], activity_date)
+            if activity_date.weekday() < 5:
+                if activity_type in LEAVE_TYPES:
+                    row['leave_days'] += 1
+                elif description and description.strip():
+                    row['filled_days'] += 1
+        if current is not None:
+            batch.append(current['row'])
+        if len(batch) >= BATCH_SIZE:
+            op.bulk_insert(summary, batch)
+            batch = []
+    if batch:
+        op.bulk_insert(summary, batch)
+
+
+def downgrade():
+    op.drop_table('monthly_summary')
@@ -1,15 +1,16 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from zoneinfo import ZoneInfo
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
+# RoutingSession envia as leituras marcadas com replica_reads() para réplicas (ver db_routing.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class Employee(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     employer_code = db.Column(db.String(10), unique=True, nullable=True)
     email = db.Column(db.String(100), unique=True, nullable=True)
     pin = db.Column(db.String(128), nullable=False)
-    pin_index = db.Column(db.String(64), unique=True, nullable=False)
+    pin_index = db.Column(db.String(64), unique=True, nullable=True)  # HMAC do PIN (ver app.pin_digest)
     name = db.Column(db.String(100), nullable=False)
     role = db.Column(db.String(20), nullable=False, default='colaborador')
     department = db.Column(db.String(50), nullable=True)
@@ -20,6 +21,9 @@ class Employee(db.Model):
     photo_url = db.Column(db.String(255), nullable=True)
 
 class Activity(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('employee_id', 'date', name='uq_activity_employee_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
     type = db.Column(db.String(50), nullable=True)
@@ -32,15 +36,29 @@ class Activity(db.Model):
     weekday = db.Column(db.String(20), nullable=True)
     is_edited = db.Column(db.Boolean, nullable=False, default=False)
 
+# Etapa de assinatura de um Report: o gerado e as cópias assinadas a partir dele
+STAGE_GENERATED = 'generated'
+STAGE_EMPLOYEE_SIGNED = 'employee_signed'
+STAGE_PREPOSTO_SIGNED = 'preposto_signed'
+STAGE_FISCAL_SIGNED = 'fiscal_signed'
+SIGNED_STAGES = (STAGE_EMPLOYEE_SIGNED, STAGE_PREPOSTO_SIGNED, STAGE_FISCAL_SIGNED)
+
 class Report(db.Model):
+    __table_args__ = (
+        db.Index('ix_report_created_at_id', 'created_at', 'id'),  # Paginação por cursor das listagens
+        db.Index('ix_report_stage_created_at', 'signature_stage', 'created_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
     report_number = db.Column(db.String(20), nullable=False)
     period = db.Column(db.String(7), nullable=False)
     format = db.Column(db.String(10), nullable=False)
     file_path = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(ZoneInfo("America/Sao_Paulo")))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     signature_status = db.Column(db.String(50), nullable=True, default='Pendente')
+    signature_stage = db.Column(db.Enum(STAGE_GENERATED, *SIGNED_STAGES, name='report_signature_stage'),
+                                nullable=False, default=STAGE_GENERATED)
+    parent_report_id = db.Column(db.Integer, db.ForeignKey('report.id', ondelete='SET NULL'), nullable=True, index=True)  # Original de uma cópia assinada
 
 class Unit(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -49,4 +67,59 @@ class Unit(db.Model):
     sap_contract = db.Column(db.String(50), nullable=False)
     fiscal = db.Column(db.String(100), nullable=False)
     field_fiscal = db.Column(db.String(100), nullable=False)
-    manager = db.Column(db.String(100), nullable=True)
\ No newline at end of file
+    manager = db.Column(db.String(100), nullable=True)
+
+class ReportJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
+    params = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='Na fila', index=True)
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    report_id = db.Column(db.Integer, db.ForeignKey('report.id', ondelete='SET NULL'), nullable=True)
+    error = db.Column(db.String(500), nullable=True)
+    worker_id = db.Column(db.String(100), nullable=True)  # Pool que processa o job (ver ReportJobPool.worker_id)
+    lease_until = db.Column(db.DateTime, nullable=True)  # Renovado pelo heartbeat enquanto o job roda
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class ReportCache(db.Model):
+    key = db.Column(db.String(64), primary_key=True)  # sha256 do pedido e dos dados (ver report_cache_key)
+    report_id = db.Column(db.Integer, db.ForeignKey('report.id', ondelete='CASCADE'), nullable=False)
+    employee_id = db.Column(db.Integer, nullable=True, index=True)  # None = todos os funcionários do escopo
+    unit = db.Column(db.String(100), nullable=True, index=True)  # None = todas as unidades
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class ReportSequence(db.Model):
+    owner = db.Column(db.String(32), primary_key=True)  # 'employee:<id>' ou 'consolidated' (ver app.report_sequence_owner)
+    last_number = db.Column(db.Integer, nullable=False, default=0)
+
+class MonthlySummary(db.Model):
+    # Contadores de dias úteis por funcionário e mês, mantidos a cada gravação de
+    # atividades e conferidos todas as noites (ver monthly_summary.py)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id', ondelete='CASCADE'), primary_key=True)
+    year = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    month = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    filled_days = db.Column(db.Integer, nullable=False, default=0)  # Dias úteis com atividade descrita
+    leave_days = db.Column(db.Integer, nullable=False, default=0)  # Dias úteis de Folga/Atestado
+    last_activity_date = db.Column(db.Date, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class Holiday(db.Model):
+    # Feriados além dos nacionais (calculados em business_calendar.py): municipais,
+    # estaduais ou de uma unidade específica
+    __table_args__ = (
+        db.UniqueConstraint('date', 'unit', name='uq_holiday_date_unit'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    unit = db.Column(db.String(100), nullable=True)  # None = todas as unidades
+
+class JobCheckpoint(db.Model):
+    # Posição de jobs em lotes do scheduler, para retomar uma execução interrompida
+    name = db.Column(db.String(50), primary_key=True)  # Ex.: 'delete_old_reports'
+    last_id = db.Column(db.Integer, nullable=False, default=0)  # Último id processado; 0 = nenhuma execução pendente
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,219 @@
+import logging
+from datetime import date, datetime, timedelta
+from sqlalchemy import event, inspect as sa_inspect
+from models import Activity, MonthlySummary
+
+logger = logging.getLogger(__name__)
+
+# Tipos que não são atividade preenchida, mas justificam o dia útil
+LEAVE_TYPES = ('Folga', 'Atestado')
+RECONCILE_BATCH_SIZE = 500
+
+def summarize(days):
+    """Contadores de um funcionário no mês a partir de (date, type, description)."""
+    filled_days = 0
+    leave_days = 0
+    last_activity_date = None
+    for activity_date, activity_type, description in days:
+        last_activity_date = max(last_activity_date or activity_date, activity_date)
+        if activity_date.weekday() >= 5:
+            continue
+        if activity_type in LEAVE_TYPES:
+            leave_days += 1
+        elif description and description.strip():
+            filled_days += 1
+    return {
+        'filled_days': filled_days,
+        'leave_days': leave_days,
+        'last_activity_date': last_activity_date,
+    }
+
+def is_registered_day(activity_date, activity_type, description):
+    """Dia útil com atividade preenchida ou Folga/Atestado."""
+    if activity_date.weekday() >= 5:
+        return False
+    return activity_type in LEAVE_TYPES or bool(description and description.strip())
+
+def month_window(year, month):
+    return date(year, month, 1), date(year + month // 12, month % 12 + 1, 1)
+
+def _summary_key(activity_date):
+    return activity_date.year, activity_date.month
+
+def refresh_summary(connection, employee_id, year, month):
+    """Recalcula a linha (employee_id, year, month) na transação de `connection`."""
+    first_day, next_month = month_window(year, month)
+    activity = Activity.__table__
+    days = connection.execute(
+        activity.select()
+        .with_only_columns(activity.c.date, activity.c.type, activity.c.description)
+        .where(activity.c.employee_id == employee_id, activity.c.date >= first_day, activity.c.date < next_month)
+    ).all()
+    summary = MonthlySummary.__table__
+    key = (summary.c.employee_id == employee_id) & (summary.c.year == year) & (summary.c.month == month)
+    if not days:
+        connection.execute(summary.delete().where(key))
+        return None
+    values = dict(summarize(days), updated_at=datetime.utcnow())
+    if not connection.execute(summary.update().where(key).values(**values)).rowcount:
+        connection.execute(summary.insert().values(employee_id=employee_id, year=year, month=month, **values))
+    return values
+
+def _touched_months(session):
+    """(employee_id, ano, mês) das atividades incluídas, alteradas ou removidas no flush."""
+    touched = set()
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(instance, Activity):
+            continue
+        # Valores anteriores também contam: uma atividade movida altera dois meses
+        state = sa_inspect(instance)
+        employee_ids = {instance.employee_id, *(state.attrs.employee_id.history.deleted or ())}
+        dates = {instance.date, *(state.attrs.date.history.deleted or ())}
+        for employee_id in employee_ids:
+            for activity_date in dates:
+                if employee_id and activity_date:
+                    touched.add((employee_id, *_summary_key(activity_date)))
+    return touched
+
+def _before_flush(session, flush_context, instances):
+    touched = _touched_months(session)
+    if touched:
+        session.info.setdefault('monthly_summary_touched', set()).update(touched)
+
+def _after_flush(session, flush_context):
+    touched = session.info.pop('monthly_summary_touched', None)
+    if not touched:
+        return
+    # Mesma conexão e transação do flush: a atividade e o resumo são
+    # confirmados (ou desfeitos) juntos
+    connection = session.connection(bind_arguments={'mapper': MonthlySummary})
+    for employee_id, year, month in sorted(touched):
+        refresh_summary(connection, employee_id, year, month)
+
+def _after_rollback(session):
+    session.info.pop('monthly_summary_touched', None)
+
+def _month_range_filter(first, last):
+    """Filtro dos resumos dos meses de `first` a `last` (inclusive)."""
+    period = MonthlySummary.year * 100 + MonthlySummary.month
+    return period >= first.year * 100 + first.month, period <= last.year * 100 + last.month
+
+def _full_months(start, end):
+    """Meses inteiros contidos em [start, end], como intervalo [first, stop)."""
+    first = start if start.day == 1 else month_window(start.year, start.month)[1]
+    month_start, next_month = month_window(end.year, end.month)
+    stop = next_month if end == next_month - timedelta(days=1) else month_start
+    return first, stop
+
+def registered_business_days(db, start, end, employee_ids=None):
+    """{employee_id: dias úteis com atividade ou Folga/Atestado entre `start` e `end`}.
+
+    Meses inteiros do intervalo vêm de monthly_summary (uma linha por
+    funcionário e mês); só os meses das pontas, quando parciais, leem atividades.
+    """
+    session = db.session
+    counts = {}
+    first, stop = _full_months(start, end)
+    if first < stop:
+        query = session.query(
+            MonthlySummary.employee_id,
+            db.func.sum(MonthlySummary.filled_days + MonthlySummary.leave_days)
+        ).filter(*_month_range_filter(first, stop - timedelta(days=1)))
+        if employee_ids is not None:
+            query = query.filter(MonthlySummary.employee_id.in_(employee_ids))
+        for employee_id, days in query.group_by(MonthlySummary.employee_id):
+            counts[employee_id] = int(days or 0)
+        edges = [(start, first - timedelta(days=1)), (stop, end)]
+    else:
+        edges = [(start, end)]
+
+    for edge_start, edge_end in edges:
+        if edge_start > edge_end:
+            continue
+        query = session.query(Activity.employee_id, Activity.date, Activity.type, Activity.description).filter(
+            Activity.date >= edge_start, Activity.date <= edge_end
+        )
+        if employee_ids is not None:
+            query = query.filter(Activity.employee_id.in_(employee_ids))
+        days_by_employee = {}
+        for employee_id, activity_date, activity_type, description in query:
+            days_by_employee.setdefault(employee_id, []).append((activity_date, activity_type, description))
+        for employee_id, days in days_by_employee.items():
+            summary = summarize(days)
+            counts[employee_id] = counts.get(employee_id, 0) + summary['filled_days'] + summary['leave_days']
+    return counts
+
+def registered_business_dates(db, start, end, employee_ids):
+    """{employee_id: datas dos dias úteis registrados entre `start` e `end`}, em uma consulta."""
+    dates = {employee_id: set() for employee_id in employee_ids}
+    if not dates:
+        return dates
+    rows = db.session.query(Activity.employee_id, Activity.date, Activity.type, Activity.description).filter(
+        Activity.employee_id.in_(employee_ids), Activity.date >= start, Activity.date <= end
+    )
+    for employee_id, activity_date, activity_type, description in rows:
+        if is_registered_day(activity_date, activity_type, description):
+            dates[employee_id].add(activity_date)
+    return dates
+
+def reconcile(db, start, end, batch_size=RECONCILE_BATCH_SIZE):
+    """Recalcula os resumos dos meses entre `start` e `end` e corrige os divergentes.
+
+    Percorre as atividades do intervalo uma única vez, em ordem de funcionário
+    e data, e compara com os resumos gravados. Retorna a quantidade de linhas
+    corrigidas (incluídas, alteradas ou removidas).
+    """
+    first_day = date(start.year, start.month, 1)
+    _, next_month = month_window(end.year, end.month)
+    session = db.session
+
+    expected = {}
+    rows = session.query(Activity.employee_id, Activity.date, Activity.type, Activity.description).filter(
+        Activity.date >= first_day, Activity.date < next_month
+    ).order_by(Activity.employee_id, Activity.date).yield_per(1000)
+    current_key, days = None, []
+    for employee_id, activity_date, activity_type, description in rows:
+        key = (employee_id, *_summary_key(activity_date))
+        if key != current_key:
+            if days:
+                expected[current_key] = summarize(days)
+            current_key, days = key, []
+        days.append((activity_date, activity_type, description))
+    if days:
+        expected[current_key] = summarize(days)
+
+    stored = {}
+    for summary in session.query(MonthlySummary).filter(*_month_range_filter(first_day, end)):
+        stored[(summary.employee_id, summary.year, summary.month)] = summary
+
+    repaired = 0
+    now = datetime.utcnow()
+    for key in sorted(set(expected) | set(stored)):
+        values = expected.get(key)
+        summary = stored.get(key)
+        if values is None:
+            session.delete(summary)
+        elif summary is None:
+            session.add(MonthlySummary(employee_id=key[0], year=key[1], month=key[2], updated_at=now, **values))
+        elif any(getattr(summary, name) != value for name, value in values.items()):
+            for name, value in values.items():
+                setattr(summary, name, value)
+            summary.updated_at = now
+        else:
+            continue
+        repaired += 1
+        if repaired % batch_size == 0:
+            session.flush()
+    session.commit()
+    if repaired:
+        logger.warning(f"Resumos mensais corrigidos entre {first_day} e {end}: {repaired}")
+    return repaired
+
+def init_monthly_summary(app, db):
+    """Mantém monthly_summary a cada flush de atividades da sessão do `db`."""
+    app.config.setdefault('MONTHLY_SUMMARY_RECONCILE_MONTHS', 3)
+    session = db.session
+    if not event.contains(session, 'before_flush', _before_flush):
+        event.listen(session, 'before_flush', _before_flush)
+        event.listen(session, 'after_flush', _after_flush)
+        event.listen(session, 'after_rollback', _after_rollback)
@@ -0,0 +1,234 @@
+import io
+import os
+import zlib
+import tempfile
+import base64
+import threading
+from collections import OrderedDict
+from PIL import Image as PILImage
+from PyPDF2 import PdfReader, PdfWriter, Transformation
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject
+
+# Quantidade de PDFs de origem mantidos já analisados em memória
+SOURCE_CACHE_SIZE = 32
+
+_source_cache = OrderedDict()
+_source_cache_lock = threading.Lock()
+
+def _inherited(page, key):
+    """Valor de um atributo herdável da página (ex.: /Resources), subindo pelos /Parent."""
+    node = page
+    while node is not None:
+        if key in node:
+            return node[key].get_object()
+        parent = dict.get(node, '/Parent')
+        node = parent.get_object() if parent is not None else None
+    return None
+
+class SourcePdf:
+    """PDF de origem já analisado: bytes originais e o que é preciso para
+    anexar uma atualização incremental à última página.
+
+    Os objetos guardados aqui são apenas lidos; cada assinatura trabalha em
+    cópias, então a mesma instância pode ser usada por várias requisições.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        reader = PdfReader(io.BytesIO(data))
+        page = reader.pages[-1]
+
+        self.page_number = page.indirect_reference.idnum
+        self.page_generation = page.indirect_reference.generation
+        self.page_top = float(page.mediabox.top)
+        # Cópias rasas: referências indiretas continuam apontando para o arquivo original
+        self.page_entries = DictionaryObject(dict.items(page))
+        # A página pode herdar /Resources da árvore de páginas; a nova versão da
+        # página passa a ter uma cópia própria, com a imagem da assinatura
+        resources = _inherited(page, '/Resources') or DictionaryObject()
+        self.resources = DictionaryObject(dict.items(resources))
+        xobjects = resources['/XObject'].get_object() if '/XObject' in resources else DictionaryObject()
+        self.xobjects = DictionaryObject(dict.items(xobjects))
+        contents = dict.get(page, '/Contents')
+        if contents is None:
+            self.contents = []
+        elif isinstance(contents.get_object(), ArrayObject):
+            self.contents = list(contents.get_object())
+        else:
+            self.contents = [contents]
+
+        self.size = int(reader.trailer['/Size'])
+        self.trailer_entries = {
+            NameObject(key): dict.get(reader.trailer, key)
+            for key in ('/Root', '/Info', '/ID')
+            if key in reader.trailer
+        }
+        startxref_at = data.rfind(b'startxref')
+        self.startxref = int(data[startxref_at + len(b'startxref'):].split()[0])
+        # Atualização incremental só sobre tabela xref clássica (como a do ReportLab)
+        self.incremental = not reader.is_encrypted and data[self.startxref:self.startxref + 4] == b'xref'
+
+def load_source(path):
+    """Retorna o SourcePdf de `path`, reaproveitando a análise enquanto o arquivo não mudar."""
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_mtime_ns, stat.st_size)
+    with _source_cache_lock:
+        source = _source_cache.get(key)
+        if source is not None:
+            _source_cache.move_to_end(key)
+            return source
+    with open(path, 'rb') as f:
+        source = SourcePdf(f.read())
+    with _source_cache_lock:
+        _source_cache[key] = source
+        while len(_source_cache) > SOURCE_CACHE_SIZE:
+            _source_cache.popitem(last=False)
+    return source
+
+def decode_signature_data(signature_data):
+    """Bytes do PNG a partir do data URL enviado pelo canvas de assinatura."""
+    if ',' in signature_data:
+        signature_data = signature_data.split(',', 1)[1]  # Remover o prefixo 'data:image/png;base64,'
+    return base64.b64decode(signature_data)
+
+def _signature_image(signature_png):
+    image = PILImage.open(io.BytesIO(signature_png))
+    alpha = None
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        alpha = zlib.compress(image.getchannel('A').tobytes())
+    rgb = image.convert('RGB')
+    return rgb.width, rgb.height, zlib.compress(rgb.tobytes()), alpha
+
+def _stream_object(number, header, data):
+    return (b'%d 0 obj\n<< %s /Length %d >>\nstream\n' % (number, header.encode('ascii'), len(data))
+            + data + b'\nendstream\nendobj\n')
+
+def _xref_section(offsets):
+    """Tabela xref com subseções contíguas para os objetos (número -> (offset, geração))."""
+    lines = [b'xref\n']
+    numbers = sorted(offsets)
+    start = 0
+    while start < len(numbers):
+        end = start
+        while end + 1 < len(numbers) and numbers[end + 1] == numbers[end] + 1:
+            end += 1
+        lines.append(b'%d %d\n' % (numbers[start], end - start + 1))
+        for number in numbers[start:end + 1]:
+            offset, generation = offsets[number]
+            lines.append(b'%010d %05d n\r\n' % (offset, generation))
+        start = end + 1
+    return b''.join(lines)
+
+def incremental_update(source, signature_png, x, y, width, height):
+    """Bytes a anexar ao PDF de origem: imagem da assinatura, conteúdo que a
+    desenha e a nova versão da última página, com xref e trailer próprios."""
+    image_width, image_height, rgb, alpha = _signature_image(signature_png)
+
+    number = source.size
+    image_number, number = number, number + 1
+    mask_number = None
+    if alpha is not None:
+        mask_number, number = number, number + 1
+    open_number, stamp_number, size = number, number + 1, number + 2
+    name = f'/RdatSig{image_number}'
+    # Coordenada Y do canvas (origem no topo) para o sistema do PDF (origem embaixo)
+    pdf_y = source.page_top - y - height
+
+    image_header = (f'/Type /XObject /Subtype /Image /Width {image_width} /Height {image_height} '
+                    f'/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode')
+    objects = []
+    if mask_number is not None:
+        image_header += f' /SMask {mask_number} 0 R'
+        objects.append((mask_number, _stream_object(mask_number, (
+            f'/Type /XObject /Subtype /Image /Width {image_width} /Height {image_height} '
+            f'/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode'), alpha)))
+    objects.append((image_number, _stream_object(image_number, image_header, rgb)))
+    # O conteúdo original fica entre q/Q para não alterar o estado gráfico do carimbo
+    objects.append((open_number, _stream_object(open_number, '', b'q')))
+    stamp = f'Q q {width:.4f} 0 0 {height:.4f} {x:.4f} {pdf_y:.4f} cm {name} Do Q'.encode('ascii')
+    objects.append((stamp_number, _stream_object(stamp_number, '', stamp)))
+
+    xobjects = DictionaryObject(source.xobjects)
+    xobjects[NameObject(name)] = IndirectObject(image_number, 0, None)
+    resources = DictionaryObject(source.resources)
+    resources[NameObject('/XObject')] = xobjects
+    page = DictionaryObject(source.page_entries)
+    page[NameObject('/Resources')] = resources
+    page[NameObject('/Contents')] = ArrayObject(
+        [IndirectObject(open_number, 0, None)] + source.contents + [IndirectObject(stamp_number, 0, None)]
+    )
+    page_buffer = io.BytesIO()
+    page_buffer.write(b'%d %d obj\n' % (source.page_number, source.page_generation))
+    page.write_to_stream(page_buffer, None)
+    page_buffer.write(b'\nendobj\n')
+    objects.append((source.page_number, page_buffer.getvalue()))
+
+    update = io.BytesIO()
+    base = len(source.data)
+    if not source.data.endswith(b'\n'):
+        update.write(b'\n')
+    offsets = {}
+    for object_number, object_bytes in objects:
+        generation = source.page_generation if object_number == source.page_number else 0
+        offsets[object_number] = (base + update.tell(), generation)
+        update.write(object_bytes)
+
+    xref_offset = base + update.tell()
+    update.write(_xref_section(offsets))
+    trailer = DictionaryObject(source.trailer_entries)
+    trailer[NameObject('/Size')] = NumberObject(size)
+    trailer[NameObject('/Prev')] = NumberObject(source.startxref)
+    update.write(b'trailer\n')
+    trailer.write_to_stream(update, None)
+    update.write(b'\nstartxref\n%d\n%%%%EOF\n' % xref_offset)
+    return update.getvalue()
+
+def _rewrite_with_signature(source, signature_png, x, y, width, height):
+    # PDFs com xref em stream ou criptografados: regrava o documento, ainda em memória
+    image = PILImage.open(io.BytesIO(signature_png))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    signature_buffer = io.BytesIO()
+    image.save(signature_buffer, format='PDF')
+    signature_page = PdfReader(signature_buffer).pages[0]
+
+    pdf_writer = PdfWriter()
+    for page in PdfReader(io.BytesIO(source.data)).pages:
+        pdf_writer.add_page(page)
+    last_page = pdf_writer.pages[-1]
+    pdf_y = float(last_page.mediabox.top) - y - height
+    signature_page.add_transformation(Transformation().scale(
+        sx=width / float(signature_page.mediabox.width),
+        sy=height / float(signature_page.mediabox.height)
+    ).translate(tx=x, ty=pdf_y))
+    last_page.merge_page(signature_page)
+
+    output = io.BytesIO()
+    pdf_writer.write(output)
+    return output.getvalue()
+
+def sign_pdf(source_path, output_path, signature_data, x, y, width, height):
+    """Aplica a assinatura (data URL PNG) na última página de `source_path` e grava `output_path`.
+
+    x, y, width e height vêm do editor de assinatura, em pontos, com origem
+    no canto superior esquerdo da página.
+    """
+    source = load_source(source_path)
+    signature_png = decode_signature_data(signature_data)
+    # Tudo é montado antes de abrir a saída, gravada num temporário da mesma
+    # pasta e movida no fim: um erro não deixa um PDF truncado em output_path
+    if source.incremental:
+        parts = (source.data, incremental_update(source, signature_png, x, y, width, height))
+    else:
+        parts = (_rewrite_with_signature(source, signature_png, x, y, width, height),)
+    fd, temp_path = tempfile.mkstemp(suffix='.pdf', dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        with os.fdopen(fd, 'wb') as output_file:
+            for part in parts:
+                output_file.write(part)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return output_path
@@ -0,0 +1,122 @@
+import re
+import logging
+import xlsxwriter
+
+logger = logging.getLogger(__name__)
+
+# Exportação dos relatórios em Excel direto no xlsxwriter, sem pandas. As
+# planilhas usam constant_memory: cada linha vai para o arquivo temporário do
+# xlsxwriter assim que a próxima começa, então a memória não cresce com o
+# número de colaboradores ou de dias. Por isso as linhas são escritas em ordem
+# (cabeçalho, linha em branco, títulos das colunas e atividades) e uma
+# planilha só começa quando a anterior termina.
+
+SHEET_NAME_LIMIT = 31
+INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+# Colunas das atividades; os títulos são as chaves, como nos arquivos gerados até aqui
+ACTIVITY_COLUMNS = ('date', 'description', 'project', 'location', 'type', 'hours')
+INDIVIDUAL_COLUMNS = ('date', 'weekday', 'description', 'project', 'location', 'type', 'hours')
+UNIT_COLUMNS = INDIVIDUAL_COLUMNS + ('employee_name', 'employer_code')
+# Versões do xlsxwriter em que Worksheet._opt_close existe (ver _can_close_sheet_files);
+# requirements.txt fixa a mesma faixa
+XLSXWRITER_CLOSE_VERSIONS = ((3, 0), (4, 0))
+
+def unique_sheet_name(name, used):
+    """Nome de planilha válido para `name` e fora de `used` (que passa a contê-lo).
+
+    O Excel limita o nome a 31 caracteres, proíbe []:*?/\\ e compara sem
+    diferenciar maiúsculas; repetidos recebem ' (2)', ' (3)', ... sem passar do limite.
+    """
+    base = INVALID_SHEET_CHARS.sub('_', str(name or '')).strip("' ") or 'Planilha'
+    sheet_name = base[:SHEET_NAME_LIMIT]
+    counter = 1
+    while sheet_name.lower() in used:
+        counter += 1
+        suffix = f" ({counter})"
+        sheet_name = base[:SHEET_NAME_LIMIT - len(suffix)].rstrip() + suffix
+    used.add(sheet_name.lower())
+    return sheet_name
+
+def _workbook(file_path):
+    return xlsxwriter.Workbook(file_path, {'constant_memory': True, 'strings_to_numbers': False})
+
+def _xlsxwriter_version():
+    return tuple(int(part) for part in re.findall(r'\d+', xlsxwriter.__version__)[:2])
+
+def _can_close_sheet_files():
+    """Se Worksheet._opt_close pode ser usado para fechar o temporário de cada planilha pronta.
+
+    Em constant_memory o xlsxwriter mantém um arquivo aberto por planilha até
+    workbook.close(), e exportações com milhares de colaboradores esbarram no
+    limite de arquivos abertos do processo. Não há API pública para isso: o
+    método privado (o xlsxwriter reabre o arquivo ao montar o .xlsx) só é
+    usado nas versões de XLSXWRITER_CLOSE_VERSIONS.
+    """
+    low, high = XLSXWRITER_CLOSE_VERSIONS
+    if hasattr(xlsxwriter.worksheet.Worksheet, '_opt_close') and low <= _xlsxwriter_version() < high:
+        return True
+    logger.warning(f"xlsxwriter {xlsxwriter.__version__}: os arquivos temporários das planilhas "
+                   f"ficam abertos até o fim da exportação")
+    return False
+
+def _write_sheet(worksheet, header_lines, columns, activities):
+    """Cabeçalho, linha em branco e a tabela de atividades, linha a linha."""
+    row = 0
+    for line in header_lines:
+        worksheet.write_string(row, 0, line)
+        row += 1
+    row += 1
+    worksheet.write_row(row, 0, columns)
+    for activity in activities:
+        row += 1
+        worksheet.write_row(row, 0, [activity.get(column) for column in columns])
+
+def _employee_lines(title, employee_data):
+    return [
+        f"{title} - {employee_data['name']}",
+        f"Matrícula: {employee_data['employer_code']}",
+        f"Data de Admissão: {employee_data['admission_date']}",
+        f"Função: {employee_data['position']}",
+        f"Unidade: {employee_data['unit']}",
+        f"Departamento: {employee_data['department']}",
+        f"Telefone: {employee_data['phone']}",
+    ]
+
+def write_individual_excel(file_path, report_data):
+    """Relatório individual do colaborador/funcionário em Excel."""
+    workbook = _workbook(file_path)
+    worksheet = workbook.add_worksheet('Relatório Individual')
+    _write_sheet(worksheet, _employee_lines('Relatório Individual', report_data), INDIVIDUAL_COLUMNS, report_data['activities'])
+    workbook.close()
+
+def write_unit_excel(file_path, report_data):
+    """Relatório consolidado da unidade em Excel."""
+    workbook = _workbook(file_path)
+    worksheet = workbook.add_worksheet('Relatório Consolidado')
+    lines = [
+        f"Relatório Consolidado - Unidade: {report_data['unit']}",
+        f"Contrato ICJ: {report_data['icj_contract']}",
+        f"Contrato SAP: {report_data['sap_contract']}",
+        f"Fiscal: {report_data['fiscal_name']}",
+        f"Fiscal de Campo: {report_data['field_fiscal_name']}",
+    ]
+    _write_sheet(worksheet, lines, UNIT_COLUMNS, report_data['activities'])
+    workbook.close()
+
+def write_employees_excel(file_path, employees, title):
+    """Uma planilha por colaborador; `title` abre o cabeçalho (ex.: 'Relatório Fiscal').
+
+    `employees` é um iterável de (dados do colaborador, atividades), ambos
+    consumidos sob demanda, como os gerados por iter_employee_activities (app.py).
+    Cada planilha pronta tem o arquivo temporário fechado (ver _can_close_sheet_files),
+    então o número de arquivos abertos não cresce com o de colaboradores.
+    """
+    workbook = _workbook(file_path)
+    close_sheet_files = _can_close_sheet_files()
+    used = set()
+    for employee_data, activities in employees:
+        worksheet = workbook.add_worksheet(unique_sheet_name(employee_data['name'], used))
+        _write_sheet(worksheet, _employee_lines(title, employee_data), ACTIVITY_COLUMNS, activities)
+        if close_sheet_files:
+            worksheet._opt_close()
+    workbook.close()
@@ -0,0 +1,291 @@
+import os
+import json
+import uuid
+import socket
+import queue
+import logging
+import importlib
+import threading
+from time import time
+from datetime import datetime, timedelta
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import or_, and_
+from models import ReportJob  # Importar a classe ReportJob de models.py
+from db_routing import replica_reads
+
+logger = logging.getLogger(__name__)
+
+# Status de um job de relatório
+JOB_QUEUED = 'Na fila'
+JOB_RUNNING = 'Processando'
+JOB_DONE = 'Concluído'
+JOB_FAILED = 'Erro'
+
+# Funções que geram cada tipo de relatório, registradas com @report_job_handler
+_handlers = {}
+
+def report_job_handler(kind):
+    """Registra a função que gera o relatório do tipo `kind`.
+
+    A função recebe os parâmetros do job e um callback progress(percentual) e
+    deve retornar o Report criado.
+    """
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+def run_report(kind, params, progress=None):
+    """Executa o handler de `kind` no contexto de aplicação atual, fora da fila.
+
+    Usado pela pré-geração do scheduler; retorna o Report criado (ou o do cache).
+    """
+    handler = _handlers.get(kind)
+    if handler is None:
+        raise ValueError(f"Tipo de relatório desconhecido: {kind}")
+    with replica_reads(fresh_since=datetime.utcnow()):
+        return handler(params, progress or (lambda value: None))
+
+def active_job_count(session):
+    """Jobs na fila ou em processamento, de qualquer processo."""
+    return session.query(ReportJob).filter(ReportJob.status.in_((JOB_QUEUED, JOB_RUNNING))).count()
+
+class LocalBroker:
+    """Fila em memória do próprio processo (substituto local de um broker externo).
+
+    Um broker externo precisa apenas oferecer publish(job_id) e
+    consume(timeout) -> job_id ou None; configure REPORT_JOB_BROKER como
+    'modulo:Classe'.
+    """
+
+    def __init__(self, app=None):
+        self._queue = queue.Queue()
+
+    def publish(self, job_id):
+        self._queue.put(job_id)
+
+    def consume(self, timeout=1.0):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+def load_broker(app):
+    spec = app.config.get('REPORT_JOB_BROKER') or 'local'
+    if spec == 'local':
+        return LocalBroker(app)
+    module_name, _, class_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)(app)
+
+class ReportJobPool:
+    """Pool de threads do processo que consome o broker e executa os jobs.
+
+    O estado de cada job fica na tabela report_job: jobs na fila ou
+    interrompidos por um reinício são publicados novamente por recover().
+    Um job em processamento pertence ao pool que o reservou (worker_id) até
+    lease_until, renovado pelo heartbeat; só volta à fila depois que o lease
+    expira, ou seja, quando o processo dono parou de renová-lo.
+    """
+
+    def __init__(self, app, db: SQLAlchemy, broker=None):
+        self.app = app
+        self.db = db
+        self.broker = broker or load_broker(app)
+        self.workers = app.config.get('REPORT_JOB_WORKERS', 2)
+        self.stale_after = timedelta(seconds=app.config.get('REPORT_JOB_STALE_SECONDS', 600))
+        self.lease = timedelta(seconds=app.config.get('REPORT_JOB_LEASE_SECONDS', 90))
+        self.poll_seconds = app.config.get('REPORT_JOB_POLL_SECONDS', 30)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._last_recover = 0
+        self._token = uuid.uuid4().hex[:8]
+
+    @property
+    def worker_id(self):
+        # Inclui o pid: com gunicorn --preload o pool é criado antes do fork
+        return f"{socket.gethostname()}:{os.getpid()}:{self._token}"
+
+    def start(self):
+        """Inicia os workers (idempotente). Com REPORT_JOB_WORKERS=0 o processo só publica."""
+        if self._threads or self.workers <= 0:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            self.recover()
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, args=(index,), name=f'report-job-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            threading.Thread(target=self._heartbeat, name='report-job-heartbeat', daemon=True).start()
+            logger.info(f"Workers de relatórios iniciados: {self.workers}")
+
+    def stop(self):
+        self._stopping.set()
+
+    def _add_job(self, kind, employee_id, params, **fields):
+        if kind not in _handlers:
+            raise ValueError(f"Tipo de relatório desconhecido: {kind}")
+        job = ReportJob(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            employee_id=employee_id,
+            params=json.dumps(params),
+            **fields
+        )
+        self.db.session.add(job)
+        self.db.session.commit()
+        return job
+
+    def complete(self, kind, employee_id, params, report):
+        """Registra um job já concluído com um Report existente (ex.: relatório em cache)."""
+        return self._add_job(kind, employee_id, params, status=JOB_DONE, progress=100, report_id=report.id)
+
+    def enqueue(self, kind, employee_id, params):
+        job = self._add_job(kind, employee_id, params, status=JOB_QUEUED, progress=0)
+        self.start()
+        self.broker.publish(job.id)
+        logger.info(f"Job de relatório {job.id} ({kind}) enfileirado para employee_id={employee_id}")
+        return job
+
+    def recover(self):
+        """Devolve à fila jobs com o lease expirado e publica os que aguardam."""
+        self._last_recover = time()
+        with self.app.app_context():
+            session = self.db.session
+            now = datetime.utcnow()
+            requeued = session.query(ReportJob).filter(
+                ReportJob.status == JOB_RUNNING,
+                or_(
+                    ReportJob.lease_until < now,
+                    # Jobs reservados antes da coluna lease_until existir
+                    and_(ReportJob.lease_until.is_(None), ReportJob.updated_at < now - self.stale_after)
+                )
+            ).update({'status': JOB_QUEUED, 'worker_id': None, 'lease_until': None, 'updated_at': now},
+                     synchronize_session=False)
+            session.commit()
+            if requeued:
+                logger.warning(f"{requeued} job(s) de relatório interrompido(s) devolvido(s) à fila")
+            pending = [job_id for (job_id,) in session.query(ReportJob.id).filter(
+                ReportJob.status == JOB_QUEUED
+            ).order_by(ReportJob.created_at)]
+        for job_id in pending:
+            self.broker.publish(job_id)
+        return len(pending)
+
+    def run_forever(self):
+        """Executa os workers no processo atual até uma interrupção (flask report-worker)."""
+        self.start()
+        try:
+            while any(thread.is_alive() for thread in self._threads):
+                self._stopping.wait(1.0)
+        except KeyboardInterrupt:
+            self.stop()
+
+    def _run(self, index):
+        while not self._stopping.is_set():
+            try:
+                job_id = self.broker.consume(timeout=1.0)
+                if job_id is None:
+                    # Fila vazia: o primeiro worker procura periodicamente jobs
+                    # publicados por outro processo ou abandonados
+                    if index == 0 and time() - self._last_recover > self.poll_seconds:
+                        self.recover()
+                    continue
+                with self.app.app_context():
+                    self.execute(job_id)
+            except Exception as e:
+                logger.error(f"Erro no worker de relatórios {index}: {str(e)}")
+
+    def _heartbeat(self):
+        # Renova o lease dos jobs deste pool enquanto o processo estiver vivo,
+        # mesmo que o handler passe muito tempo sem reportar progresso
+        interval = self.lease.total_seconds() / 3
+        while not self._stopping.wait(interval):
+            try:
+                with self.app.app_context():
+                    session = self.db.session
+                    now = datetime.utcnow()
+                    session.query(ReportJob).filter(
+                        ReportJob.status == JOB_RUNNING,
+                        ReportJob.worker_id == self.worker_id
+                    ).update({'lease_until': now + self.lease}, synchronize_session=False)
+                    session.commit()
+            except Exception as e:
+                logger.error(f"Erro ao renovar o lease dos jobs de relatório: {str(e)}")
+
+    def _claim(self, job_id):
+        # Apenas um worker (de qualquer processo) consegue mover o job para processamento
+        session = self.db.session
+        now = datetime.utcnow()
+        claimed = session.query(ReportJob).filter(
+            ReportJob.id == job_id,
+            ReportJob.status == JOB_QUEUED
+        ).update({'status': JOB_RUNNING, 'progress': 0, 'worker_id': self.worker_id,
+                  'lease_until': now + self.lease, 'updated_at': now}, synchronize_session=False)
+        session.commit()
+        return claimed == 1
+
+    def _owned(self, job_id):
+        # O job só é atualizado enquanto este pool for o dono: com o lease
+        # expirado, ele pode ter sido devolvido à fila e reservado por outro worker
+        return self.db.session.query(ReportJob).filter(
+            ReportJob.id == job_id,
+            ReportJob.worker_id == self.worker_id,
+            ReportJob.status == JOB_RUNNING
+        )
+
+    def _set_progress(self, job_id, value):
+        session = self.db.session
+        self._owned(job_id).update(
+            {'progress': max(0, min(int(value), 99)), 'updated_at': datetime.utcnow()},
+            synchronize_session=False
+        )
+        session.commit()
+
+    def execute(self, job_id):
+        """Executa um job no contexto de aplicação atual."""
+        session = self.db.session
+        if not self._claim(job_id):
+            return
+        job = session.get(ReportJob, job_id)
+        handler = _handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise ValueError(f"Tipo de relatório desconhecido: {job.kind}")
+            logger.info(f"Gerando relatório do job {job_id} ({job.kind})")
+            # Leituras na réplica, desde que ela já tenha o que existia quando o job foi criado
+            with replica_reads(fresh_since=job.created_at):
+                report = handler(json.loads(job.params), lambda value: self._set_progress(job_id, value))
+            report_id = report.id
+            completed = self._owned(job_id).update(
+                {'status': JOB_DONE, 'progress': 100, 'report_id': report_id, 'updated_at': datetime.utcnow()},
+                synchronize_session=False
+            )
+            session.commit()
+            if completed:
+                logger.info(f"Job de relatório {job_id} concluído: Relatório ID={report_id}")
+            else:
+                logger.warning(f"Job de relatório {job_id} não pertence mais a este worker (lease expirado); "
+                               f"Relatório ID={report_id} não registrado no job")
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Erro no job de relatório {job_id}: {str(e)}")
+            failed = self._owned(job_id).update(
+                {'status': JOB_FAILED, 'error': str(e)[:500], 'updated_at': datetime.utcnow()},
+                synchronize_session=False
+            )
+            session.commit()
+            if not failed:
+                logger.warning(f"Erro do job de relatório {job_id} não registrado: o job pertence a outro worker")
+
+def init_report_jobs(app, db: SQLAlchemy):
+    app.config.setdefault('REPORT_JOB_WORKERS', 2)
+    app.config.setdefault('REPORT_JOB_BROKER', 'local')
+    app.config.setdefault('REPORT_JOB_STALE_SECONDS', 600)
+    app.config.setdefault('REPORT_JOB_LEASE_SECONDS', 90)
+    app.config.setdefault('REPORT_JOB_POLL_SECONDS', 30)
+    pool = ReportJobPool(app, db)
+    app.extensions['report_jobs'] = pool
+    return pool
@@ -0,0 +1,226 @@
+import os
+import threading
+import multiprocessing
+from io import BytesIO
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from reportlab.lib import colors
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Spacer
+from PyPDF2 import PdfReader, PdfWriter
+from report_template import (
+    truncate, header_table, info_table, activity_header_table, activity_rows_table,
+    employee_activity_rows_table, signature_table, layout_table, UNIT_INFO_TABLE_STYLE
+)
+
+# Geração dos PDFs de relatório a partir dos dados já consultados (os arquivos
+# Excel ficam em report_excel.py). Este módulo concentra ReportLab e é
+# importado pelo app.py somente na primeira geração de relatório. Estilos, logo
+# e as tabelas de cada seção do PDF vêm de report_template.py.
+
+# Relatórios consolidados com ao menos este número de colaboradores usam o
+# pool de processos; abaixo disso, iniciar os processos custa mais que gerar
+PARALLEL_MIN_EMPLOYEES = 4
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+def write_individual_pdf(file_path, report_data, report_number, period):
+    """Relatório individual do colaborador/funcionário em PDF (layout de atividade diária)."""
+    doc = SimpleDocTemplate(file_path, pagesize=A4, leftMargin=0, rightMargin=0, topMargin=0, bottomMargin=0)
+    elements = [
+        header_table("RELATÓRIO DE ATIVIDADE DIÁRIA", period, [3*cm, 9*cm, 9*cm]),
+        Spacer(1, 0.2*cm),
+    ]
+
+    left_info = info_table([
+        ("NOME:", truncate(report_data['name'], 50)),
+        ("DATA DE ADMISSÃO:", report_data['admission_date']),
+        ("FUNÇÃO:", truncate(report_data['position'], 50)),
+        ("EMPRESA:", report_data['client']),
+        ("CONTRATO ICJ N°:", report_data['icj_contract']),
+        ("CONTRATO SAP N°:", report_data['sap_contract']),
+    ], [5.25*cm, 5.25*cm])
+    right_info = info_table([
+        ("N° DO RELATÓRIO:", report_number),
+        ("CLIENTE:", report_data['client']),
+        ("UNIDADE:", truncate(report_data['unit'], 50)),
+        ("GERENTE:", report_data['manager']),
+        ("FISCAL:", truncate(report_data['fiscal_name'], 50)),
+        ("FISCAL DE CAMPO:", truncate(report_data['field_fiscal_name'], 50)),
+    ], [5.25*cm, 5.25*cm])
+    elements.append(layout_table([left_info, right_info], [10.5*cm, 10.5*cm]))
+    elements.append(Spacer(1, 0.2*cm))
+
+    elements.append(activity_header_table(["DATA", "RESUMO SOBRE AS ATIVIDADES"], [3*cm, 18*cm]))
+    if report_data['activities']:
+        elements.append(activity_rows_table(report_data['activities'], [1.5*cm, 1.5*cm, 18*cm]))
+
+    current_date = datetime.now().strftime('%d/%m/%Y')
+    signatures = signature_table([
+        (f"Data: {current_date}", "Assinatura Funcionário:"),
+        ("Data: __/__/____", "Assinatura Fiscal:"),
+        ("Data: __/__/____", "Assinatura Preposto:"),
+    ], [4*cm, 14*cm])
+    elements.append(layout_table([Spacer(1, 0*cm), signatures], [3*cm, 18*cm]))
+
+    print("Construindo PDF...")
+    doc.build(elements)
+    print("PDF construído com sucesso")
+
+def write_unit_pdf(file_path, report_data, period):
+    """Relatório consolidado da unidade em PDF."""
+    doc = SimpleDocTemplate(file_path, pagesize=A4, leftMargin=1.5*cm, rightMargin=1.5*cm, topMargin=1.5*cm, bottomMargin=1*cm)
+    width, height = A4
+
+    def draw_page_background(canvas, doc):
+        canvas.saveState()
+        canvas.setFillColor(colors.black)
+        canvas.rect(0, 0, width, height, fill=1)
+        canvas.restoreState()
+
+    elements = [
+        header_table("RELATÓRIO CONSOLIDADO DE ATIVIDADES", period, [3*cm, 7*cm, 7*cm]),
+        Spacer(1, 0.2*cm),
+        info_table([
+            ("UNIDADE:", truncate(report_data['unit'], 50)),
+            ("CONTRATO ICJ N°:", report_data['icj_contract']),
+            ("CONTRATO SAP N°:", report_data['sap_contract']),
+            ("FISCAL:", truncate(report_data['fiscal_name'], 50)),
+            ("FISCAL DE CAMPO:", truncate(report_data['field_fiscal_name'], 50)),
+        ], [4.25*cm, 12.25*cm], style=UNIT_INFO_TABLE_STYLE),
+        Spacer(1, 0.2*cm),
+        # Mesmas larguras das linhas: data e dia da semana sob "DATA", nome e descrição na última coluna
+        activity_header_table(["DATA", "FUNCIONÁRIO / RESUMO DAS ATIVIDADES"], [3*cm, 14*cm]),
+    ]
+    if report_data['activities']:
+        elements.append(employee_activity_rows_table(report_data['activities'], [1.5*cm, 1.5*cm, 14*cm]))
+
+    print("Construindo PDF...")
+    doc.build(elements, onFirstPage=draw_page_background, onLaterPages=draw_page_background)
+    print("PDF construído com sucesso")
+
+def _draw_employee(c, employee_data, title, signature, signed_on):
+    """Páginas de um colaborador no canvas `c`, terminando com showPage()."""
+    width, height = A4
+    c.setFont('Helvetica-Bold', 16)
+    c.drawCentredString(width/2, height - 2*cm, f"{title} - {employee_data['name']}")
+    c.setFont('Helvetica', 12)
+    c.drawString(2*cm, height - 3.5*cm, f"Matrícula: {employee_data['employer_code']}")
+    c.drawString(2*cm, height - 4*cm, f"Data de Admissão: {employee_data['admission_date']}")
+    c.drawString(2*cm, height - 4.5*cm, f"Função: {employee_data['position']}")
+    c.drawString(2*cm, height - 5*cm, f"Unidade: {employee_data['unit']}")
+    c.drawString(2*cm, height - 5.5*cm, f"Departamento: {employee_data['department']}")
+    c.drawString(2*cm, height - 6*cm, f"Telefone: {employee_data['phone']}")
+    c.setFont('Helvetica-Bold', 12)
+    c.drawString(2*cm, height - 7.5*cm, "Atividades:")
+    c.setFont('Helvetica', 10)
+    y = height - 8*cm
+    c.drawString(2*cm, y, "Data")
+    c.drawString(5*cm, y, "Descrição")
+    c.drawString(10*cm, y, "Projeto")
+    c.drawString(13*cm, y, "Local")
+    c.drawString(15*cm, y, "Tipo")
+    c.drawString(17*cm, y, "Horas")
+    c.line(2*cm, y-0.2*cm, width-2*cm, y-0.2*cm)
+    y -= 0.5*cm
+    for activity in employee_data['activities']:
+        c.drawString(2*cm, y, activity['date'])
+        c.drawString(5*cm, y, truncate(activity['description'], 30))
+        c.drawString(10*cm, y, activity['project'])
+        c.drawString(13*cm, y, activity['location'])
+        c.drawString(15*cm, y, activity['type'])
+        c.drawString(17*cm, y, str(activity['hours']))
+        y -= 0.5*cm
+        if y < 3*cm:
+            c.showPage()
+            c.setFont('Helvetica', 10)
+            y = height - 2*cm
+    if signature:
+        heading, line = signature
+        c.setFont('Helvetica-Bold', 12)
+        c.drawString(2*cm, y - 1*cm, heading)
+        c.setFont('Helvetica', 10)
+        c.drawString(2*cm, y - 1.5*cm, f"Data: {signed_on}")
+        c.drawString(2*cm, y - 2*cm, line)
+    c.showPage()
+
+def render_employee_pages(employee_data, title, signature=None, signed_on=None):
+    """PDF (bytes) só com as páginas de um colaborador.
+
+    `invariant=1` fixa data de criação e identificador do documento, então os
+    mesmos dados geram sempre os mesmos bytes, em qualquer processo.
+    """
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4, invariant=1)
+    _draw_employee(c, employee_data, title, signature, signed_on)
+    c.save()
+    return buffer.getvalue()
+
+def _render_employee_part(job):
+    return render_employee_pages(*job)
+
+def _render_pool(workers):
+    """Pool de processos do módulo, recriado quando o número de workers muda."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # 'spawn': os relatórios são gerados em threads (report_jobs), e fork
+            # de um processo com threads pode herdar locks travados
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = workers
+        return _pool
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+def _render_parts(jobs, workers):
+    """PDFs de cada colaborador, na ordem de `jobs`; em paralelo quando vale a pena."""
+    workers = min(workers, os.cpu_count() or 1)
+    if workers < 2 or len(jobs) < PARALLEL_MIN_EMPLOYEES:
+        return [_render_employee_part(job) for job in jobs]
+    pool = _render_pool(workers)
+    chunksize = max(1, len(jobs) // (workers * 4))
+    try:
+        return list(pool.map(_render_employee_part, jobs, chunksize=chunksize))
+    except BrokenProcessPool:
+        # Worker encerrado (ex.: falta de memória): gera no próprio processo
+        print("Pool de geração de PDF indisponível; gerando em série")
+        _discard_pool(pool)
+        return [_render_employee_part(job) for job in jobs]
+
+def write_employees_pdf(file_path, report_data, title, signature=None, workers=0):
+    """Uma seção por colaborador com a lista de atividades.
+
+    `signature` é (título, linha) do bloco de assinatura ao fim de cada
+    colaborador, ex.: ('Assinatura Fiscal', 'Fiscal: Nome'); None omite o bloco.
+
+    Cada colaborador é desenhado em um PDF próprio, em memória, e as partes são
+    concatenadas na ordem de `report_data`. Com `workers` >= 2 as partes são
+    geradas em um pool de processos; o arquivo final é o mesmo (byte a byte)
+    da geração em série.
+    """
+    signed_on = datetime.now().strftime('%d/%m/%Y')
+    jobs = [(employee_data, title, signature, signed_on) for employee_data in report_data]
+    if not jobs:
+        c = canvas.Canvas(file_path, pagesize=A4, invariant=1)
+        c.save()
+        return
+    writer = PdfWriter()
+    # Os leitores ficam vivos até o fim: o PdfWriter identifica os objetos
+    # copiados por id() do leitor, que seria reaproveitado após a coleta
+    readers = [PdfReader(BytesIO(part)) for part in _render_parts(jobs, workers)]
+    for reader in readers:
+        for page in reader.pages:
+            writer.add_page(page)
+    with open(file_path, 'wb') as f:
+        writer.write(f)
@@ -0,0 +1,192 @@
+import os
+from functools import lru_cache
+from reportlab.lib import colors
+from reportlab.lib.units import cm
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.platypus import Paragraph, Table, TableStyle, Image
+
+# Estilos, estilos de tabela e logo dos relatórios em PDF, criados uma única vez
+# por processo e compartilhados por todas as gerações (importado por
+# report_render.py, que só é carregado na primeira geração de relatório).
+
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'imagens', 'accerth.logo.jpg')
+NOT_FILLABLE = 'Não preenchível'
+HOLIDAY_PREFIX = 'Feriado: '
+DESCRIPTION_LIMIT = 100
+
+TITLE_STYLE = ParagraphStyle(
+    name='Title',
+    fontName='Helvetica-Bold',
+    fontSize=10,
+    textColor=colors.white,
+    alignment=1,
+    spaceAfter=2
+)
+NORMAL_STYLE = ParagraphStyle(
+    name='Normal',
+    fontName='Helvetica',
+    fontSize=6,
+    textColor=colors.black,
+    spaceAfter=1,
+    leading=7
+)
+LABEL_STYLE = ParagraphStyle(
+    name='Label',
+    fontName='Helvetica',
+    fontSize=6,
+    textColor=colors.white,
+    spaceAfter=1,
+    leading=7
+)
+BOLD_STYLE = ParagraphStyle(
+    name='Bold',
+    fontName='Helvetica-Bold',
+    fontSize=7,
+    textColor=colors.white,
+    spaceAfter=2,
+    alignment=1
+)
+
+_CELL_PADDING = [
+    ('LEFTPADDING', (0, 0), (-1, -1), 2),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 2),
+    ('TOPPADDING', (0, 0), (-1, -1), 1),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
+]
+_GRID = [
+    ('BOX', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+]
+_NO_PADDING = [
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 0),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+    ('TOPPADDING', (0, 0), (-1, -1), 0),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
+]
+
+HEADER_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (1, 0), (-1, -1), colors.black),
+    ('TEXTCOLOR', (1, 0), (-1, -1), colors.white),
+    *_GRID,
+    ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+    ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+    ('LEFTPADDING', (0, 0), (0, 0), 0),
+    ('LEFTPADDING', (1, 0), (-1, -1), 2),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 2),
+    ('TOPPADDING', (0, 0), (-1, -1), 2),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+])
+INFO_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.black),
+    ('BACKGROUND', (1, 0), (1, -1), colors.white),
+    *_GRID,
+    *_CELL_PADDING,
+])
+UNIT_INFO_TABLE_STYLE = TableStyle([('BACKGROUND', (1, 0), (1, -1), colors.lightyellow)], parent=INFO_TABLE_STYLE)
+LAYOUT_TABLE_STYLE = TableStyle(_NO_PADDING)
+ACTIVITY_HEADER_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, -1), colors.black),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
+    *_GRID,
+    *_CELL_PADDING,
+])
+SIGNATURE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, -1), colors.white),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    *_GRID,
+    *_CELL_PADDING,
+])
+# Linhas de atividade: data (fundo preto), dia da semana (fundo tan) e texto
+ACTIVITY_ROWS_STYLE = TableStyle([
+    ('FONT', (0, 0), (-1, -1), 'Helvetica', 6, 7),
+    ('BACKGROUND', (0, 0), (0, -1), colors.black),
+    ('TEXTCOLOR', (0, 0), (0, -1), colors.white),
+    ('BACKGROUND', (1, 0), (1, -1), colors.tan),
+    ('TEXTCOLOR', (1, 0), (-1, -1), colors.black),
+    ('BACKGROUND', (2, 0), (-1, -1), colors.white),
+    *_GRID,
+    *_CELL_PADDING,
+])
+
+@lru_cache(maxsize=1)
+def logo():
+    """Logo do cabeçalho; o arquivo é lido e o cabeçalho JPEG interpretado uma vez."""
+    if os.path.exists(LOGO_PATH):
+        return Image(LOGO_PATH, width=3*cm, height=1.5*cm)
+    print(f"Erro: Logo não encontrado em {LOGO_PATH}")
+    return Paragraph("", NORMAL_STYLE)
+
+def truncate(text, limit):
+    return text[:limit] + ('...' if len(text) > limit else '')
+
+def is_blank_day(description):
+    """Dia sem atividade a preencher (fim de semana ou feriado): texto em itálico sobre cinza."""
+    return description == NOT_FILLABLE or description.startswith(HOLIDAY_PREFIX)
+
+def header_table(title, period, col_widths):
+    data = [[logo(), Paragraph(title, TITLE_STYLE), Paragraph(f"Mês de Referência: {period}", TITLE_STYLE)]]
+    table = Table(data, colWidths=col_widths, rowHeights=[1.5*cm])
+    table.setStyle(HEADER_TABLE_STYLE)
+    return table
+
+def info_table(fields, col_widths, style=INFO_TABLE_STYLE):
+    """Tabela de rótulo/valor; `fields` é uma lista de (rótulo, valor)."""
+    data = [[Paragraph(f"<b>{label}</b>", LABEL_STYLE), Paragraph(value, NORMAL_STYLE)] for label, value in fields]
+    table = Table(data, colWidths=col_widths, rowHeights=[0.6*cm] * len(data))
+    table.setStyle(style)
+    return table
+
+def activity_header_table(titles, col_widths):
+    table = Table([[Paragraph(title, BOLD_STYLE) for title in titles]], colWidths=col_widths, rowHeights=[0.5*cm])
+    table.setStyle(ACTIVITY_HEADER_STYLE)
+    return table
+
+def _blank_day_commands(row, column=2):
+    return [
+        ('BACKGROUND', (column, row), (column, row), colors.lightgrey),
+        ('FONT', (column, row), (column, row), 'Helvetica-Oblique', 6, 7),
+    ]
+
+def activity_rows_table(activities, col_widths):
+    """Todas as atividades em uma única tabela, uma linha (texto simples) por dia."""
+    rows = []
+    commands = []
+    for index, activity in enumerate(activities):
+        description = activity['description']
+        rows.append([activity['date'], activity['weekday'], truncate(description, DESCRIPTION_LIMIT)])
+        if is_blank_day(description):
+            commands.extend(_blank_day_commands(index))
+    table = Table(rows, colWidths=col_widths, rowHeights=0.5*cm)
+    table.setStyle(TableStyle(commands, parent=ACTIVITY_ROWS_STYLE))
+    return table
+
+def employee_activity_rows_table(activities, col_widths):
+    """Atividades de vários funcionários: uma linha por dia, com o nome acima da descrição."""
+    rows = []
+    commands = []
+    for index, activity in enumerate(activities):
+        description = activity['description']
+        rows.append([
+            activity['date'],
+            activity['weekday'],
+            f"{truncate(activity['employee_name'], 50)}\n{truncate(description, DESCRIPTION_LIMIT)}",
+        ])
+        if is_blank_day(description):
+            commands.extend(_blank_day_commands(index))
+    table = Table(rows, colWidths=col_widths, rowHeights=1.2*cm)
+    table.setStyle(TableStyle(commands, parent=ACTIVITY_ROWS_STYLE))
+    return table
+
+def signature_table(rows, col_widths):
+    data = [[Paragraph(left, NORMAL_STYLE), Paragraph(right, NORMAL_STYLE)] for left, right in rows]
+    table = Table(data, colWidths=col_widths, rowHeights=[1.0*cm] * len(data))
+    table.setStyle(SIGNATURE_TABLE_STYLE)
+    return table
+
+def layout_table(cells, col_widths):
+    """Tabela sem bordas nem espaçamento, só para posicionar outras lado a lado."""
+    table = Table([cells], colWidths=col_widths)
+    table.setStyle(LAYOUT_TABLE_STYLE)
+    return table
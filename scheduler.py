@@ -1,59 +1,191 @@
 import os
+import time
 import logging
-from datetime import datetime, timedelta
+import threading
+from datetime import date, datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
 from flask_sqlalchemy import SQLAlchemy
 from zoneinfo import ZoneInfo
-from models import Report  # Importar a classe Report de models.py
+from concurrent.futures import ThreadPoolExecutor
+from models import Report, Employee, JobCheckpoint  # Importar as classes de models.py
+from monthly_summary import reconcile
+from report_jobs import run_report, active_job_count
+
+# Exclusão de relatórios antigos (ver delete_old_reports)
+RETENTION_CHECKPOINT = 'delete_old_reports'
+RETENTION_FILE_WORKERS = 8
+RETENTION_BATCH_PAUSE_SECONDS = 0.1
+
+# Pré-geração dos relatórios individuais do mês anterior
+PRERENDER_ROLES = ('colaborador', 'funcionario')
+PRERENDER_NICENESS = 10
+PRERENDER_IDLE_POLL_SECONDS = 5
 
-# Configuração de logging
-logging.basicConfig(level=logging.INFO, filename='scheduler.log', format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def _remove_report_file(folder, report_id, file_path):
+    """Remove o arquivo do relatório; retorna False só quando ele existe e não pôde ser removido."""
+    if not file_path:
+        return True
+    full_path = os.path.join(folder, os.path.basename(file_path))
+    try:
+        os.remove(full_path)
+    except FileNotFoundError:
+        logger.warning(f"Arquivo não encontrado: {full_path} (Relatório ID={report_id})")
+    except OSError as e:
+        logger.error(f"Erro ao excluir arquivo {full_path} (Relatório ID={report_id}): {str(e)}")
+        return False
+    return True
+
+def _save_checkpoint(db, name, last_id):
+    checkpoint = db.session.get(JobCheckpoint, name)
+    if checkpoint is None:
+        checkpoint = JobCheckpoint(name=name)
+        db.session.add(checkpoint)
+    checkpoint.last_id = last_id
+    checkpoint.updated_at = datetime.utcnow()
+
 def delete_old_reports(app, db):
+    """Remove relatórios (arquivo e registro) mais antigos que REPORT_RETENTION_DAYS.
+
+    Trabalha em lotes de REPORT_RETENTION_BATCH_SIZE por ordem de id: os
+    arquivos do lote são removidos em paralelo e os registros saem com um
+    único DELETE ... WHERE id IN (...), confirmado junto com a posição em
+    job_checkpoint. Cada transação trava só as linhas do lote, e uma execução
+    interrompida continua do último lote confirmado.
+    """
+    with app.app_context():
+        try:
+            cutoff = datetime.utcnow() - timedelta(days=app.config['REPORT_RETENTION_DAYS'])
+            batch_size = app.config['REPORT_RETENTION_BATCH_SIZE']
+            folder = app.config['REPORT_FOLDER']
+            report = Report.__table__
+            checkpoint = db.session.get(JobCheckpoint, RETENTION_CHECKPOINT)
+            last_id = checkpoint.last_id if checkpoint else 0
+            if last_id:
+                logger.info(f"Retomando exclusão de relatórios após o ID {last_id}")
+            logger.info(f"Iniciando exclusão de relatórios anteriores a {cutoff} (UTC)")
+
+            deleted = kept = 0
+            with ThreadPoolExecutor(max_workers=RETENTION_FILE_WORKERS, thread_name_prefix='report-retention') as executor:
+                while True:
+                    rows = db.session.execute(
+                        db.select(report.c.id, report.c.file_path)
+                        .where(report.c.created_at < cutoff, report.c.id > last_id)
+                        .order_by(report.c.id)
+                        .limit(batch_size)
+                    ).all()
+                    if not rows:
+                        break
+                    removed = list(executor.map(lambda row: _remove_report_file(folder, *row), rows))
+                    # Registros cujo arquivo não pôde ser removido ficam para a próxima execução
+                    ids = [row.id for row, ok in zip(rows, removed) if ok]
+                    if ids:
+                        db.session.execute(report.delete().where(report.c.id.in_(ids)))
+                    last_id = rows[-1].id
+                    _save_checkpoint(db, RETENTION_CHECKPOINT, last_id)
+                    db.session.commit()
+                    deleted += len(ids)
+                    kept += len(rows) - len(ids)
+                    logger.info(f"Lote de relatórios excluído até o ID {last_id}: {len(ids)} removidos")
+                    time.sleep(RETENTION_BATCH_PAUSE_SECONDS)  # Dá passagem a outras transações em report
+
+            # Execução completa: a próxima começa do início
+            _save_checkpoint(db, RETENTION_CHECKPOINT, 0)
+            db.session.commit()
+            if deleted or kept:
+                logger.info(f"Exclusão de relatórios antigos concluída. {deleted} relatórios removidos, {kept} mantidos por erro no arquivo.")
+            else:
+                logger.info("Nenhum relatório antigo encontrado para exclusão.")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Erro na tarefa de exclusão de relatórios: {str(e)}")
+
+def reconcile_monthly_summaries(app, db):
+    # Corrige resumos mensais que divergiram das atividades (ex.: gravações fora do ORM)
     try:
-        # Data limite: 2 meses atrás, ajustado para fuso horário -03:00
-        br_timezone = ZoneInfo("America/Sao_Paulo")
-        two_months_ago = datetime.now(br_timezone) - timedelta(days=60)
-        logger.info(f"Iniciando exclusão de relatórios anteriores a {two_months_ago}")
-        
-        # Buscar relatórios antigos
-        old_reports = db.session.query(Report).filter(
-            Report.created_at < two_months_ago
-        ).all()
-        
-        if not old_reports:
-            logger.info("Nenhum relatório antigo encontrado para exclusão.")
-            return
-        
-        for report in old_reports:
-            try:
-                # Tentar excluir arquivo físico, ignorar se não existir
-                if report.file_path:
-                    full_path = os.path.join(app.config['REPORT_FOLDER'], os.path.basename(report.file_path))
-                    if os.path.exists(full_path):
-                        os.remove(full_path)
-                        logger.info(f"Arquivo excluído: {full_path} (Relatório ID={report.id})")
-                    else:
-                        logger.warning(f"Arquivo não encontrado: {full_path} (Relatório ID={report.id})")
-                # Excluir registro do banco
-                db.session.delete(report)
-                logger.info(f"Relatório excluído: ID={report.id}, Número={report.report_number}, Status={report.signature_status or 'N/A'}")
-            except Exception as e:
-                logger.error(f"Erro ao excluir relatório ID={report.id}: {str(e)}")
-                continue  # Continuar com o próximo relatório
-        
-        # Commit das exclusões
-        db.session.commit()
-        logger.info(f"Exclusão de relatórios antigos concluída. {len(old_reports)} relatórios removidos.")
+        with app.app_context():
+            today = datetime.now(ZoneInfo("America/Sao_Paulo")).date()
+            months = app.config['MONTHLY_SUMMARY_RECONCILE_MONTHS']
+            year, month = divmod(today.year * 12 + today.month - 1 - (months - 1), 12)
+            start = today.replace(year=year, month=month + 1, day=1)
+            repaired = reconcile(db, start, today)
+            logger.info(f"Conferência dos resumos mensais desde {start} concluída: {repaired} corrigidos.")
+    except Exception as e:
+        logger.error(f"Erro na conferência dos resumos mensais: {str(e)}")
+
+def _lower_thread_priority():
+    # Só a thread atual (Linux: o tid é aceito por setpriority); os workers web e
+    # de relatórios seguem normais. A thread do scheduler não volta à prioridade
+    # anterior (exigiria privilégio), o que serve aos demais jobs de manutenção
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), PRERENDER_NICENESS)
+    except (AttributeError, OSError) as e:
+        logger.warning(f"Não foi possível reduzir a prioridade da pré-geração: {str(e)}")
+
+def _wait_for_idle_report_workers(db, max_wait):
+    # Pedidos dos usuários têm preferência: espera a fila esvaziar (até max_wait segundos)
+    deadline = time.monotonic() + max_wait
+    while active_job_count(db.session) and time.monotonic() < deadline:
+        db.session.rollback()  # Encerrar a transação para enxergar a fila atualizada
+        time.sleep(PRERENDER_IDLE_POLL_SECONDS)
+
+def prerender_month_reports(app, db, year, month):
+    """Gera o PDF individual de (year, month) de cada funcionário ativo, um por vez.
+
+    Os parâmetros são os mesmos do pedido em /generate_report para o mês
+    inteiro, então o relatório fica no cache de relatórios e o pedido do
+    funcionário é atendido com o arquivo pronto enquanto os dados não mudarem.
+    Retorna (gerados ou já prontos, falhas).
+    """
+    first_day = date(year, month, 1)
+    last_day = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    max_wait = app.config['REPORT_PRERENDER_MAX_WAIT_SECONDS']
+    employee_ids = [employee_id for (employee_id,) in db.session.query(Employee.id).filter(
+        Employee.role.in_(PRERENDER_ROLES)
+    ).order_by(Employee.id)]
+    db.session.rollback()
+    ready = failed = 0
+    for employee_id in employee_ids:
+        _wait_for_idle_report_workers(db, max_wait)
+        try:
+            run_report('individual', {
+                'employee_id': employee_id,
+                'start_date': first_day.isoformat(),
+                'end_date': last_day.isoformat(),
+                'format': 'pdf'
+            })
+            ready += 1
+        except Exception as e:
+            db.session.rollback()
+            failed += 1
+            logger.error(f"Erro na pré-geração do relatório de {first_day:%m/%Y} para employee_id={employee_id}: {str(e)}")
+    return ready, failed
+
+def prerender_previous_month_reports(app, db):
+    # Nos primeiros dias do mês, deixa prontos os relatórios do mês anterior;
+    # rodadas seguintes só regeram os de quem alterou atividades depois da anterior
+    try:
+        with app.app_context():
+            _lower_thread_priority()
+            last_month = datetime.now(ZoneInfo("America/Sao_Paulo")).date().replace(day=1) - timedelta(days=1)
+            logger.info(f"Iniciando pré-geração dos relatórios de {last_month:%m/%Y}")
+            ready, failed = prerender_month_reports(app, db, last_month.year, last_month.month)
+            logger.info(f"Pré-geração dos relatórios de {last_month:%m/%Y} concluída: {ready} prontos, {failed} com erro.")
     except Exception as e:
-        db.session.rollback()
-        logger.error(f"Erro na tarefa de exclusão de relatórios: {str(e)}")
+        logger.error(f"Erro na pré-geração de relatórios: {str(e)}")
 
 def init_scheduler(app, db: SQLAlchemy):
+    # Configuração de logging só ao iniciar o scheduler: importar o módulo (testes,
+    # comandos flask) não grava no arquivo de log
+    logging.basicConfig(level=logging.INFO, filename=app.config.get('SCHEDULER_LOG_FILE', 'scheduler.log'),
+                        format='%(asctime)s - %(levelname)s - %(message)s')
     try:
         scheduler = BackgroundScheduler(timezone="America/Sao_Paulo")
         scheduler.add_job(lambda: delete_old_reports(app, db), 'interval', days=1, id='delete_old_reports')
+        scheduler.add_job(lambda: reconcile_monthly_summaries(app, db), 'cron', hour=2, minute=30, id='reconcile_monthly_summaries')
+        scheduler.add_job(lambda: prerender_previous_month_reports(app, db), 'cron', day=app.config['REPORT_PRERENDER_DAYS'],
+                          hour=1, minute=0, id='prerender_previous_month_reports', max_instances=1, coalesce=True)
         scheduler.start()
         logger.info("Scheduler iniciado com sucesso.")
         
@@ -0,0 +1,212 @@
+import os
+import re
+import shutil
+import tempfile
+from datetime import date, timedelta
+
+# Banco isolado para o teste (SQLite temporário). Para validar no MySQL, defina
+# DATABASE_URL apontando para um banco de teste antes de executar.
+_db_fd, _db_path = tempfile.mkstemp(suffix='.db')
+os.close(_db_fd)
+os.environ.setdefault('DATABASE_URL', f'sqlite:///{_db_path}')
+os.environ.setdefault('PIN_PEPPER', 'test-pin-pepper')
+
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from app import app, db, Employee, Activity, Unit, get_month_window, pin_digest
+from report_jobs import run_report
+
+UNIT_NAME = 'Unidade Teste'
+LAST_MONTH = date.today().replace(day=1) - timedelta(days=1)
+YEAR, MONTH = LAST_MONTH.year, LAST_MONTH.month
+
+ACTIVITY_TABLE = re.compile(r'\b(FROM|JOIN)\s+activity\b', re.IGNORECASE)
+ACTIVITY_DATE_FILTER = re.compile(r'\bWHERE\b.*\bactivity\.date\b', re.IGNORECASE | re.DOTALL)
+
+ids = {}
+_report_folder = tempfile.mkdtemp()
+
+def _new_employee(name, role, code=None, email=None):
+    pin = f"{len(ids) + 1000}"
+    employee = Employee(
+        employer_code=code,
+        email=email,
+        pin=generate_password_hash(pin),
+        pin_index=pin_digest(pin),
+        name=name,
+        role=role,
+        unit=UNIT_NAME
+    )
+    db.session.add(employee)
+    db.session.flush()
+    ids[name] = employee.id
+    return employee
+
+def setup_module(module=None):
+    app.config['REPORT_FOLDER'] = _report_folder
+    with app.app_context():
+        db.create_all()
+        db.session.add(Unit(name=UNIT_NAME, icj_contract='ICJ', sap_contract='SAP', fiscal='Fiscal', field_fiscal='Campo'))
+        _new_employee('Fiscal Teste', 'fiscal', email='fiscal@teste.com')
+        _new_employee('Preposto Teste', 'preposto', email='preposto@teste.com')
+        _new_employee('Empregador Teste', 'empregador', email='empregador@teste.com')
+        workers = [_new_employee('Funcionario Teste', 'funcionario', code='F0001')]
+        workers += [_new_employee(f'Colaborador {i}', 'colaborador', code=f'C000{i}') for i in range(3)]
+        # Histórico de alguns meses para cada colaborador
+        for employee in workers:
+            current = date(YEAR, MONTH, 1) - timedelta(days=90)
+            while current <= LAST_MONTH:
+                if current.weekday() < 5 and current.day != 2:
+                    db.session.add(Activity(employee_id=employee.id, date=current, description='Atividade de teste'))
+                current += timedelta(days=1)
+        db.session.commit()
+
+def teardown_module(module=None):
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+    if os.path.exists(_db_path):
+        os.remove(_db_path)
+    shutil.rmtree(_report_folder, ignore_errors=True)
+
+def _client(name, role):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['employee_id'] = ids[name]
+        sess['employee_name'] = name
+        sess['role'] = role
+        sess['unit'] = UNIT_NAME if role in ['fiscal', 'preposto'] else None
+    return client
+
+def _request(expected_status, send):
+    """Executa a requisição, lê o corpo (respostas em streaming consultam ao serem lidas) e confere o status."""
+    def run():
+        response = send()
+        response.get_data()
+        assert response.status_code == expected_status, f"Status {response.status_code}, esperado {expected_status}"
+        return response
+    return run
+
+def _report(kind, **params):
+    def run():
+        return run_report(kind, dict(params, start_date=date(YEAR, MONTH, 1).isoformat(),
+                                     end_date=LAST_MONTH.isoformat(), format='pdf'))
+    return run
+
+def _capture_activity_queries(run):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and ACTIVITY_TABLE.search(statement):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            run()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return statements
+
+def _full_scans(statement, parameters):
+    """Retorna os passos do plano que percorrem activity sem usar o índice de data."""
+    filters_by_date = bool(ACTIVITY_DATE_FILTER.search(statement))
+    problems = []
+    with app.app_context():
+        with db.engine.connect() as conn:
+            if db.engine.dialect.name == 'sqlite':
+                for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).mappings():
+                    detail = row['detail']
+                    if not re.search(r'\bactivity\b', detail):
+                        continue
+                    if detail.startswith('SCAN'):
+                        problems.append(detail)
+                    elif filters_by_date and 'date' not in detail:
+                        problems.append(detail)
+            else:
+                for row in conn.exec_driver_sql('EXPLAIN ' + statement, parameters).mappings():
+                    if row['table'] != 'activity':
+                        continue
+                    if row['type'] in ('ALL', 'index') or not row['key']:
+                        problems.append(dict(row))
+                    elif filters_by_date and row['type'] == 'ref':
+                        problems.append(dict(row))
+    return problems
+
+def _assert_no_full_scan(run):
+    statements = _capture_activity_queries(run)
+    assert statements, 'Nenhuma consulta em activity foi executada'
+    for statement, parameters in statements:
+        problems = _full_scans(statement, parameters)
+        assert not problems, f"Consulta sem uso do índice (employee_id, date):\n{statement}\n{problems}"
+
+def test_month_window():
+    assert get_month_window(2025, 1) == (date(2025, 1, 1), date(2025, 2, 1))
+    assert get_month_window(2025, 12) == (date(2025, 12, 1), date(2026, 1, 1))
+
+def test_activities_uses_index():
+    client = _client('Funcionario Teste', 'funcionario')
+    _assert_no_full_scan(_request(200, lambda: client.get(f'/activities?month={MONTH}&year={YEAR}')))
+
+def test_add_single_activity_uses_index():
+    client = _client('Funcionario Teste', 'funcionario')
+    _assert_no_full_scan(_request(302, lambda: client.post('/add_single_activity', data={
+        'day': 2, 'month': MONTH, 'year': YEAR, 'description': 'Atividade', 'action': 'save'
+    })))
+
+def test_check_pending_activities_uses_index():
+    client = _client('Funcionario Teste', 'funcionario')
+    _assert_no_full_scan(_request(200, lambda: client.post('/check_pending_activities', json={
+        'start_date': date(YEAR, MONTH, 1).isoformat(), 'end_date': LAST_MONTH.isoformat(), 'format': 'pdf'
+    })))
+
+def test_home_fiscal_uses_index():
+    client = _client('Fiscal Teste', 'fiscal')
+    _assert_no_full_scan(_request(200, lambda: client.get(f'/home_fiscal?month={MONTH}&year={YEAR}')))
+
+def test_download_activities_uses_index():
+    client = _client('Fiscal Teste', 'fiscal')
+    _assert_no_full_scan(_request(200, lambda: client.get(f'/home_fiscal/download?month={MONTH}&year={YEAR}')))
+
+def test_home_preposto_uses_index():
+    client = _client('Preposto Teste', 'preposto')
+    _assert_no_full_scan(_request(200, lambda: client.get(f'/home_preposto?month={MONTH}&year={YEAR}')))
+
+def test_validate_period_uses_index():
+    client = _client('Empregador Teste', 'empregador')
+    # Mês inteiro (monthly_summary) e mês parcial (atividades das pontas)
+    for start in (date(YEAR, MONTH, 1), date(YEAR, MONTH, 10)):
+        _assert_no_full_scan(_request(200, lambda: client.post('/validate_period', json={
+            'start_date': start.isoformat(), 'end_date': LAST_MONTH.isoformat()
+        })))
+
+def test_reports_use_index():
+    with app.app_context():
+        _assert_no_full_scan(_report('individual', employee_id=ids['Colaborador 0']))
+        _assert_no_full_scan(_report('consolidated', employee_id=ids['Funcionario Teste'], unit=UNIT_NAME))
+        _assert_no_full_scan(_report('fiscal', fiscal_id=ids['Fiscal Teste'], unit=UNIT_NAME, employee_id=None))
+        _assert_no_full_scan(_report('preposto', preposto_id=ids['Preposto Teste'], preposto_name='Preposto Teste',
+                                     unit=UNIT_NAME, employee_id=ids['Colaborador 1']))
+        _assert_no_full_scan(_report('employer', employee_id=ids['Empregador Teste']))
+
+def test_unit_dashboards_single_activity_query():
+    # A matriz da unidade busca as atividades de todos os colaboradores de uma vez
+    fiscal = _client('Fiscal Teste', 'fiscal')
+    preposto = _client('Preposto Teste', 'preposto')
+    for run in [
+        _request(200, lambda: fiscal.get(f'/home_fiscal?month={MONTH}&year={YEAR}')),
+        _request(200, lambda: fiscal.get(f'/home_fiscal/download?month={MONTH}&year={YEAR}')),
+        _request(200, lambda: preposto.get(f'/home_preposto?month={MONTH}&year={YEAR}')),
+    ]:
+        assert len(_capture_activity_queries(run)) == 1
+
+if __name__ == "__main__":
+    setup_module()
+    try:
+        for name, func in list(globals().items()):
+            if name.startswith('test_') and callable(func):
+                func()
+                print(f"OK: {name}")
+    finally:
+        teardown_module()
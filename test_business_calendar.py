@@ -0,0 +1,76 @@
+import os
+import tempfile
+from datetime import date, timedelta
+from factory import create_app
+from models import db, Holiday
+import business_calendar
+from business_calendar import (
+    easter, national_holidays, month_layout, business_day_mask, is_business_day,
+    count_weekdays, count_business_days, iter_business_days
+)
+
+UNIT_NAME = 'Unidade Calendário'
+UNIT_HOLIDAY = date(2026, 3, 19)  # Quinta-feira
+COMPANY_HOLIDAY = date(2026, 6, 5)  # Sexta-feira
+
+_db_fd, _db_path = tempfile.mkstemp(suffix='.db')
+os.close(_db_fd)
+app = None
+
+def setup_module(module=None):
+    global app
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{_db_path}', 'REPORT_JOB_WORKERS': 0})
+    with app.app_context():
+        db.create_all()
+        db.session.add(Holiday(date=UNIT_HOLIDAY, name='São José', unit=UNIT_NAME))
+        db.session.add(Holiday(date=COMPANY_HOLIDAY, name='Aniversário da empresa'))
+        db.session.commit()
+    business_calendar.clear_cache()
+
+def teardown_module(module=None):
+    business_calendar.clear_cache()
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+    os.remove(_db_path)
+
+def test_national_holidays():
+    assert easter(2026) == date(2026, 4, 5)
+    assert easter(2024) == date(2024, 3, 31)
+    holidays = national_holidays(2026)
+    assert holidays[date(2026, 4, 3)] == 'Sexta-feira Santa'
+    assert date(2026, 9, 7) in holidays
+    assert date(2026, 11, 20) in holidays
+    assert date(2023, 11, 20) not in national_holidays(2023)
+
+def test_unit_holidays_only_apply_to_their_unit():
+    with app.app_context():
+        assert not is_business_day(UNIT_HOLIDAY, UNIT_NAME)
+        assert is_business_day(UNIT_HOLIDAY, 'Outra Unidade')
+        assert is_business_day(UNIT_HOLIDAY)
+        for unit in (None, UNIT_NAME, 'Outra Unidade'):
+            assert not is_business_day(COMPANY_HOLIDAY, unit)
+        day = month_layout(2026, 3, UNIT_NAME)[UNIT_HOLIDAY.day - 1]
+        assert (day['weekday'], day['holiday']) == ('Quinta-feira', 'São José')
+
+def test_counts_match_day_by_day_walk():
+    with app.app_context():
+        start = date(2025, 12, 20)
+        for length in (0, 1, 6, 7, 30, 45, 120, 400):
+            end = start + timedelta(days=length)
+            days = [start + timedelta(days=offset) for offset in range(length + 1)]
+            assert count_weekdays(start, end) == sum(1 for day in days if day.weekday() < 5)
+            for unit in (None, UNIT_NAME):
+                expected = [day for day in days if is_business_day(day, unit)]
+                assert list(iter_business_days(start, end, unit)) == expected
+                assert count_business_days(start, end, unit) == len(expected)
+        assert count_business_days(date(2026, 3, 2), date(2026, 3, 1)) == 0
+
+def test_business_day_mask():
+    with app.app_context():
+        # Abril de 2026: 22 dias de segunda a sexta, menos Sexta-feira Santa e Tiradentes
+        mask = business_day_mask(2026, 4)
+        assert bin(mask).count('1') == 20
+        assert not mask >> 2 & 1  # 03/04
+        assert mask & 1  # 01/04, quarta-feira
@@ -0,0 +1,141 @@
+import os
+import tempfile
+from types import SimpleNamespace
+from flask import jsonify
+from factory import create_app
+from models import db, Unit, ReportJob
+from db_routing import replica_reads, read_replica
+from report_jobs import report_job_handler
+
+# Primário e réplica em dois arquivos SQLite: cada um recebe uma unidade
+# diferente, assim dá para saber de onde veio cada leitura.
+PRIMARY_UNIT = 'Unidade Primário'
+REPLICA_UNIT = 'Unidade Réplica'
+
+_paths = []
+app = None
+router = None
+
+def _sqlite_url():
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    _paths.append(path)
+    return f'sqlite:///{path}'
+
+def _unit(name):
+    return Unit(name=name, icj_contract='ICJ', sap_contract='SAP', fiscal='Fiscal', field_fiscal='Campo')
+
+def _unit_names():
+    return sorted(unit.name for unit in Unit.query.all())
+
+def _set_lag(seconds):
+    router.measure_lag = lambda engine: seconds
+
+def setup_module(module=None):
+    global app, router
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': _sqlite_url(),
+        'DATABASE_REPLICA_URLS': [_sqlite_url()],
+        'DB_REPLICA_MAX_LAG': 5,
+        'DB_REPLICA_LAG_CHECK': 0,
+        'REPORT_JOB_WORKERS': 0,
+    })
+    router = app.extensions['db_routing']
+
+    @app.route('/units')
+    @read_replica
+    def list_units():
+        return jsonify(_unit_names())
+
+    @app.route('/units/add', methods=['POST'])
+    def add_unit():
+        db.session.add(_unit('Unidade Nova'))
+        db.session.commit()
+        return jsonify(_unit_names())
+
+    with app.app_context():
+        replica = db.engines['replica_0']
+        db.create_all()
+        db.metadata.create_all(replica)
+        db.session.add(_unit(PRIMARY_UNIT))
+        db.session.commit()
+        with replica.begin() as connection:
+            connection.execute(Unit.__table__.insert(), [
+                {'name': REPLICA_UNIT, 'icj_contract': 'ICJ', 'sap_contract': 'SAP', 'fiscal': 'Fiscal', 'field_fiscal': 'Campo'}
+            ])
+
+def teardown_module(module=None):
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    # O `db` é compartilhado com os outros testes: sem o bind da réplica,
+    # db.create_all() de outro app não deve procurar o engine replica_0
+    db.metadatas.pop('replica_0', None)
+    for path in _paths:
+        os.remove(path)
+
+def setup_function(function=None):
+    _set_lag(0.0)
+
+def test_reads_use_primary_by_default():
+    with app.app_context():
+        assert _unit_names() == [PRIMARY_UNIT]
+
+def test_replica_reads_route_selects_to_replica():
+    with app.app_context():
+        with replica_reads() as key:
+            assert key == 'replica_0'
+            assert _unit_names() == [REPLICA_UNIT]
+        assert _unit_names() == [PRIMARY_UNIT]
+
+def test_writes_and_rest_of_transaction_stay_on_primary():
+    with app.app_context():
+        with replica_reads():
+            db.session.add(_unit('Unidade Transação'))
+            db.session.flush()
+            assert _unit_names() == [PRIMARY_UNIT, 'Unidade Transação']
+            db.session.rollback()
+            # Nova transação sem escritas volta para a réplica
+            assert _unit_names() == [REPLICA_UNIT]
+
+def test_lagging_or_unavailable_replica_falls_back_to_primary():
+    with app.app_context():
+        _set_lag(60.0)
+        with replica_reads() as key:
+            assert key is None
+            assert _unit_names() == [PRIMARY_UNIT]
+        _set_lag(None)
+        with replica_reads() as key:
+            assert key is None
+
+def test_read_replica_route_reads_own_writes_from_primary():
+    _set_lag(2.0)
+    client = app.test_client()
+    assert client.get('/units').get_json() == [REPLICA_UNIT]
+    try:
+        assert 'Unidade Nova' in client.post('/units/add').get_json()
+        # A réplica (2 s de atraso) ainda não tem a escrita deste usuário
+        assert client.get('/units').get_json() == ['Unidade Nova', PRIMARY_UNIT]
+        # Outros usuários aceitam o atraso dentro da tolerância
+        assert app.test_client().get('/units').get_json() == [REPLICA_UNIT]
+    finally:
+        with app.app_context():
+            Unit.query.filter_by(name='Unidade Nova').delete()
+            db.session.commit()
+
+def test_report_job_reads_from_replica():
+    seen = []
+
+    @report_job_handler('routing-test')
+    def build(params, progress):
+        progress(50)
+        seen.append(_unit_names())
+        return SimpleNamespace(id=None)
+
+    pool = app.extensions['report_jobs']
+    with app.app_context():
+        job = pool.enqueue('routing-test', 1, {})
+        pool.execute(job.id)
+        job = db.session.get(ReportJob, job.id)
+        assert (job.status, job.progress) == ('Concluído', 100)
+    assert seen == [[REPLICA_UNIT]]
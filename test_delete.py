@@ -1,5 +1,8 @@
 from scheduler import delete_old_reports
-from app import app, db
+from factory import create_app
+from models import db
+
+app = create_app()
 
 with app.app_context():
     try:
@@ -0,0 +1,55 @@
+import os
+import re
+import sys
+import tempfile
+import statistics
+import subprocess
+
+# Importação do app.py (python -X importtime). Cada worker do gunicorn e cada
+# script que faz 'from app import app' paga esse custo. O teste confere apenas
+# que as bibliotecas de relatórios não são importadas; o tempo, que varia com a
+# máquina, é medido só sob demanda: python test_import_time.py (sai com erro
+# acima de IMPORT_TIME_BUDGET_MS, ajustável pela variável de ambiente).
+IMPORT_TIME_BUDGET_MS = float(os.environ.get('IMPORT_TIME_BUDGET_MS', 1500))
+RUNS = 3
+
+# Bibliotecas carregadas apenas ao gerar relatórios ou assinar PDFs
+LAZY_PACKAGES = ('pandas', 'xlsxwriter', 'reportlab', 'PyPDF2', 'PIL')
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+def _import_app():
+    """Importa o app em um processo novo; retorna {módulo: tempo acumulado em µs}."""
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(db_fd)
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}')
+    env.setdefault('PIN_PEPPER', 'test-pin-pepper')
+    try:
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import app'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env, capture_output=True, text=True, check=True
+        )
+    finally:
+        os.remove(db_path)
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            modules[match.group(4)] = int(match.group(2))
+    return modules
+
+def test_app_import_skips_report_libraries():
+    modules = _import_app()
+    loaded = sorted(name for name in modules if name.split('.')[0] in LAZY_PACKAGES)
+    assert not loaded, f"Importados na inicialização do app: {loaded}"
+
+if __name__ == "__main__":
+    runs = [_import_app() for _ in range(RUNS)]
+    elapsed = statistics.median(modules['app'] / 1000 for modules in runs)
+    print(f"app: {elapsed:.0f} ms (mediana de {RUNS}; orçamento {IMPORT_TIME_BUDGET_MS:.0f} ms)")
+    top_level = {name: value for name, value in runs[-1].items() if '.' not in name and name != 'app'}
+    for name, value in sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:15]:
+        print(f"  {name}: {value / 1000:.1f} ms")
+    if elapsed > IMPORT_TIME_BUDGET_MS:
+        sys.exit(f"Importar app levou {elapsed:.0f} ms, acima do orçamento de {IMPORT_TIME_BUDGET_MS:.0f} ms")
@@ -0,0 +1,175 @@
+import os
+import tempfile
+from datetime import date, timedelta
+
+# Banco isolado para o teste (SQLite temporário), como em test_activity_indexes.py
+_db_fd, _db_path = tempfile.mkstemp(suffix='.db')
+os.close(_db_fd)
+os.environ.setdefault('DATABASE_URL', f'sqlite:///{_db_path}')
+os.environ.setdefault('PIN_PEPPER', 'test-pin-pepper')
+
+from sqlalchemy.dialects import mysql, sqlite
+import business_calendar
+from app import app, db, Employee, Activity, Holiday, activity_upsert_statement
+
+UNIT_NAME = 'Unidade Atividades'
+LAST_MONTH = date.today().replace(day=1) - timedelta(days=1)
+YEAR, MONTH = LAST_MONTH.year, LAST_MONTH.month
+NEXT_MONTH = (date.today().replace(day=28) + timedelta(days=4)).replace(day=1)
+
+ids = {}
+days = {}
+
+def _business_days(year, month):
+    current = date(year, month, 1)
+    while current.month == month:
+        if business_calendar.is_business_day(current, UNIT_NAME):
+            yield current.day
+        current += timedelta(days=1)
+
+def setup_module(module=None):
+    with app.app_context():
+        db.create_all()
+        for name, role in (('Colaborador Mês', 'colaborador'), ('Funcionário Mês', 'funcionario')):
+            employee = Employee(pin='x', name=name, role=role, unit=UNIT_NAME)
+            db.session.add(employee)
+            db.session.flush()
+            ids[role] = employee.id
+        business_calendar.clear_cache()
+        business = list(_business_days(YEAR, MONTH))
+        days['saved'], days['blank'], days['locked'], days['leave'], days['holiday'] = business[:5]
+        days['weekend'] = next(
+            day for day in range(1, LAST_MONTH.day + 1) if date(YEAR, MONTH, day).weekday() >= 5
+        )
+        days['future'] = next(_business_days(NEXT_MONTH.year, NEXT_MONTH.month))
+        db.session.add(Holiday(date=date(YEAR, MONTH, days['holiday']), name='Feriado da unidade', unit=UNIT_NAME))
+        for employee_id in ids.values():
+            db.session.add(Activity(employee_id=employee_id, date=date(YEAR, MONTH, days['locked']),
+                                    description='Já editada', is_edited=True))
+            db.session.add(Activity(employee_id=employee_id, date=date(YEAR, MONTH, days['leave']),
+                                    description='', type='Folga'))
+        db.session.commit()
+    business_calendar.clear_cache()
+
+def teardown_module(module=None):
+    business_calendar.clear_cache()
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+    if os.path.exists(_db_path):
+        os.remove(_db_path)
+
+def _client(role):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['employee_id'] = ids[role]
+        sess['employee_name'] = role
+        sess['role'] = role
+    return client
+
+def _descriptions(role, year=YEAR, month=MONTH):
+    with app.app_context():
+        return {
+            activity.date.day: activity.description
+            for activity in Activity.query.filter_by(employee_id=ids[role])
+            if (activity.date.year, activity.date.month) == (year, month)
+        }
+
+def test_save_month_returns_result_per_day():
+    client = _client('funcionario')
+    activities = {str(day): f'Atividade {name}' for name, day in days.items() if name != 'future'}
+    activities[str(days['blank'])] = '   '
+    activities[str(days['saved'])] = {'description': ' Inspeção ', 'project': 'P-1', 'location': ''}
+    activities['40'] = 'Dia inexistente'
+    response = client.post('/save_month_activities', json={'month': MONTH, 'year': YEAR, 'activities': activities})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert {day: result['status'] for day, result in results.items()} == {
+        str(days['saved']): 'saved',
+        str(days['blank']): 'skipped',
+        str(days['locked']): 'rejected',
+        str(days['leave']): 'rejected',
+        str(days['holiday']): 'rejected',
+        str(days['weekend']): 'rejected',
+        '40': 'rejected',
+    }
+    assert results[str(days['holiday'])]['message'] == 'Não é possível salvar atividades em finais de semana ou feriados.'
+    assert results[str(days['locked'])]['message'] == 'Esta atividade não pode ser editada.'
+    saved = _descriptions('funcionario')
+    assert saved[days['saved']] == 'Inspeção'
+    assert saved[days['locked']] == 'Já editada'
+    assert days['holiday'] not in saved and days['weekend'] not in saved
+
+    # O mesmo dia de novo atualiza a linha existente (upsert no índice único)
+    response = client.post('/save_month_activities', json={
+        'month': MONTH, 'year': YEAR, 'activities': {str(days['saved']): 'Inspeção revisada'}
+    })
+    assert response.get_json()['results'][str(days['saved'])]['status'] == 'saved'
+    with app.app_context():
+        rows = Activity.query.filter_by(employee_id=ids['funcionario'], date=date(YEAR, MONTH, days['saved'])).all()
+    assert [(row.description, row.project) for row in rows] == [('Inspeção revisada', None)]
+
+def test_save_month_rejects_future_days():
+    response = _client('funcionario').post('/save_month_activities', json={
+        'month': NEXT_MONTH.month, 'year': NEXT_MONTH.year, 'activities': {str(days['future']): 'Amanhã'}
+    })
+    result = response.get_json()['results'][str(days['future'])]
+    assert result == {'status': 'rejected', 'message': 'Não é possível salvar atividades para datas futuras.'}
+    assert _descriptions('funcionario', NEXT_MONTH.year, NEXT_MONTH.month) == {}
+
+def test_save_month_rejects_invalid_payloads():
+    client = _client('funcionario')
+    day = str(days['blank'])
+    payloads = [
+        {'month': MONTH, 'year': YEAR, 'activities': {day: 123}},
+        {'month': MONTH, 'year': YEAR, 'activities': {day: {'description': 'Texto', 'project': ['P-1']}}},
+        {'month': MONTH, 'year': YEAR, 'activities': ['Texto']},
+        {'month': MONTH, 'year': YEAR, 'activities': {'dia': 'Texto'}},
+        {'month': MONTH, 'year': YEAR, f'activity_{day}': 5},
+        {'month': 13, 'year': YEAR, 'activities': {}},
+        [MONTH, YEAR],
+    ]
+    for payload in payloads:
+        response = client.post('/save_month_activities', json=payload)
+        assert response.status_code == 400, payload
+        assert response.get_json()['success'] is False
+    response = client.post('/save_month_activities', data='{"month": ', content_type='application/json')
+    assert response.status_code == 400
+    assert days['blank'] not in _descriptions('funcionario')
+
+def test_add_activity_form_rejects_unavailable_days():
+    client = _client('colaborador')
+    form = {'month': str(MONTH), 'year': str(YEAR)}
+    for name in ('weekend', 'holiday', 'locked', 'leave', 'saved'):
+        form[f'activity_{days[name]}'] = f'Atividade {name}'
+    response = client.post('/add_activity', data=form)
+    assert response.status_code == 302
+    with client.session_transaction() as sess:
+        messages = dict((message, category) for category, message in sess['_flashes'])
+    rejected = next(message for message, category in messages.items() if category == 'error')
+    for name in ('weekend', 'holiday', 'locked', 'leave'):
+        assert f"{days[name]:02d}/{MONTH:02d}:" in rejected
+    assert 'Atividades registradas com sucesso!' in messages
+    saved = _descriptions('colaborador')
+    assert saved[days['saved']] == 'Atividade saved'
+    assert saved[days['locked']] == 'Já editada' and saved[days['leave']] == ''
+    assert days['weekend'] not in saved and days['holiday'] not in saved
+
+    response = client.post('/add_activity', data={
+        'month': str(NEXT_MONTH.month), 'year': str(NEXT_MONTH.year), f"activity_{days['future']}": 'Futura'
+    })
+    assert response.status_code == 302
+    with client.session_transaction() as sess:
+        assert any('datas futuras' in message for _, message in sess['_flashes'])
+    assert _descriptions('colaborador', NEXT_MONTH.year, NEXT_MONTH.month) == {}
+
+def test_upsert_statement_per_dialect():
+    rows = [{'employee_id': 1, 'date': date(YEAR, MONTH, 1), 'description': 'Texto', 'project': None,
+             'location': None, 'weekday': 'Segunda-feira', 'type': None, 'is_edited': False}]
+    mysql_sql = str(activity_upsert_statement(rows, 'mysql').compile(dialect=mysql.dialect()))
+    assert 'ON DUPLICATE KEY UPDATE' in mysql_sql
+    assert 'is_edited = VALUES(is_edited)' not in mysql_sql and 'description = VALUES(description)' in mysql_sql
+    sqlite_sql = str(activity_upsert_statement(rows, 'sqlite').compile(dialect=sqlite.dialect()))
+    assert 'ON CONFLICT (employee_id, date) DO UPDATE' in sqlite_sql
+    assert 'is_edited' not in sqlite_sql.split('DO UPDATE')[1]
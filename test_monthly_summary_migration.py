@@ -0,0 +1,72 @@
+import os
+import tempfile
+import importlib.util
+from datetime import date, timedelta
+from collections import defaultdict
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from models import db
+from monthly_summary import summarize
+
+# Preenchimento de monthly_summary pela migração f3c9a7b2e4d8, com mais
+# grupos (funcionário, mês) que um lote de bulk_insert
+MIGRATION_PATH = os.path.join(os.path.dirname(__file__), 'migrations', 'versions', 'f3c9a7b2e4d8_tabela_monthly_summary.py')
+EMPLOYEES = 60
+MONTHS = 10
+
+def _migration():
+    spec = importlib.util.spec_from_file_location('monthly_summary_migration', MIGRATION_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _activities():
+    for employee_id in range(1, EMPLOYEES + 1):
+        for month in range(1, MONTHS + 1):
+            first_day = date(2026, month, 1)
+            saturday = first_day + timedelta(days=(5 - first_day.weekday()) % 7)
+            yield employee_id, date(2026, month, 8 + employee_id % 3), 'Campo', f'Inspeção {employee_id}'
+            yield employee_id, date(2026, month, 15), 'Folga' if employee_id % 2 else 'Campo', ' '
+            yield employee_id, saturday, 'Campo', 'Plantão de sábado'
+
+def test_backfill_covers_more_groups_than_a_batch():
+    migration = _migration()
+    assert EMPLOYEES * MONTHS > migration.BATCH_SIZE
+    assert EMPLOYEES > migration.EMPLOYEE_BATCH_SIZE
+
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(db_fd)
+    engine = sa.create_engine(f'sqlite:///{db_path}')
+    try:
+        tables = [db.metadata.tables['employee'], db.metadata.tables['activity']]
+        db.metadata.create_all(engine, tables=tables)
+        expected = defaultdict(list)
+        with engine.begin() as connection:
+            connection.execute(db.metadata.tables['employee'].insert(), [
+                {'id': employee_id, 'pin': 'x', 'name': f'Colaborador {employee_id}'}
+                for employee_id in range(1, EMPLOYEES + 1)
+            ])
+            rows = []
+            for employee_id, activity_date, activity_type, description in _activities():
+                rows.append({'employee_id': employee_id, 'date': activity_date, 'type': activity_type,
+                             'description': description})
+                expected[(employee_id, activity_date.year, activity_date.month)].append(
+                    (activity_date, activity_type, description))
+            connection.execute(db.metadata.tables['activity'].insert(), rows)
+
+        with engine.begin() as connection:
+            with Operations.context(MigrationContext.configure(connection)):
+                migration.upgrade()
+
+        with engine.connect() as connection:
+            summaries = connection.execute(sa.text(
+                "SELECT employee_id, year, month, filled_days, leave_days FROM monthly_summary"
+            )).all()
+        assert len(summaries) == EMPLOYEES * MONTHS
+        for employee_id, year, month, filled_days, leave_days in summaries:
+            counts = summarize(expected[(employee_id, year, month)])
+            assert (filled_days, leave_days) == (counts['filled_days'], counts['leave_days'])
+    finally:
+        engine.dispose()
+        os.remove(db_path)
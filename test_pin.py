@@ -1,6 +1,9 @@
-from app import app, db, Employee
+from factory import create_app
+from models import Employee
 from werkzeug.security import check_password_hash
 
+app = create_app()  # Só os modelos: não carrega as rotas do app.py
+
 def test_pins(employer_code_list, role='colaborador', test_pin_list=None):
     if test_pin_list is None:
         test_pin_list = ['9171', '4922', '1980', '0456']  # PINs reais do employees.json
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+
+# Banco isolado para o teste (SQLite temporário), como em test_activity_indexes.py
+_db_fd, _db_path = tempfile.mkstemp(suffix='.db')
+os.close(_db_fd)
+os.environ.setdefault('DATABASE_URL', f'sqlite:///{_db_path}')
+os.environ.setdefault('PIN_PEPPER', 'test-pin-pepper')
+
+from app import app, db, Employee, Activity, Unit, ReportCache, ReportJob, find_cached_request
+from report_jobs import run_report, JOB_DONE
+
+UNIT_NAME = 'Unidade Cache'
+LAST_MONTH = date.today().replace(day=1) - timedelta(days=1)
+FIRST_DAY = LAST_MONTH.replace(day=1)
+
+ids = {}
+_report_folder = tempfile.mkdtemp()
+
+def setup_module(module=None):
+    app.config['REPORT_FOLDER'] = _report_folder
+    with app.app_context():
+        db.create_all()
+        db.session.add(Unit(name=UNIT_NAME, icj_contract='ICJ', sap_contract='SAP', fiscal='Fiscal', field_fiscal='Campo'))
+        for name in ('Colaborador A', 'Colaborador B'):
+            employee = Employee(pin='x', name=name, role='colaborador', unit=UNIT_NAME)
+            db.session.add(employee)
+            db.session.flush()
+            ids[name] = employee.id
+            db.session.add(Activity(employee_id=employee.id, date=FIRST_DAY + timedelta(days=7), description='Inspeção'))
+        db.session.commit()
+
+def teardown_module(module=None):
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+    if os.path.exists(_db_path):
+        os.remove(_db_path)
+    shutil.rmtree(_report_folder, ignore_errors=True)
+
+def _individual(name):
+    return {'employee_id': ids[name], 'start_date': FIRST_DAY.isoformat(),
+            'end_date': LAST_MONTH.isoformat(), 'format': 'pdf'}
+
+def _consolidated():
+    return {'unit': UNIT_NAME, 'employee_id': ids['Colaborador A'], 'start_date': FIRST_DAY.isoformat(),
+            'end_date': LAST_MONTH.isoformat(), 'format': 'pdf'}
+
+def _cached(kind, params):
+    with app.app_context():
+        report = find_cached_request(kind, params)
+        return report.id if report else None
+
+def _render(kind, params):
+    with app.app_context():
+        return run_report(kind, params).id
+
+def test_cached_report_is_served_from_the_request():
+    report_id = _render('individual', _individual('Colaborador A'))
+    assert _cached('individual', _individual('Colaborador A')) == report_id
+    assert _cached('individual', dict(_individual('Colaborador A'), format='excel')) is None
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['employee_id'] = ids['Colaborador A']
+        sess['employee_name'] = 'Colaborador A'
+        sess['role'] = 'colaborador'
+    response = client.post('/generate_report', data={
+        'start_date': FIRST_DAY.isoformat(), 'end_date': LAST_MONTH.isoformat(), 'format': 'pdf'
+    })
+    assert response.status_code == 202
+    assert response.get_json()['job_status'] == JOB_DONE
+    with app.app_context():
+        assert db.session.get(ReportJob, response.get_json()['job_id']).report_id == report_id
+
+def test_employee_and_unit_changes_invalidate_cached_reports():
+    _render('individual', _individual('Colaborador A'))
+    _render('individual', _individual('Colaborador B'))
+    _render('consolidated', _consolidated())
+
+    with app.app_context():
+        # Colunas que não aparecem nos relatórios não afetam o cache
+        db.session.get(Employee, ids['Colaborador B']).pin = 'y'
+        db.session.commit()
+    assert _cached('individual', _individual('Colaborador B')) is not None
+
+    with app.app_context():
+        db.session.get(Employee, ids['Colaborador B']).position = 'Técnico'
+        db.session.commit()
+    assert _cached('individual', _individual('Colaborador B')) is None
+    assert _cached('individual', _individual('Colaborador A')) is not None
+    assert _cached('consolidated', _consolidated()) is None
+
+    _render('individual', _individual('Colaborador B'))
+    with app.app_context():
+        Unit.query.filter_by(name=UNIT_NAME).one().fiscal = 'Outro Fiscal'
+        db.session.commit()
+        assert ReportCache.query.count() == 0
@@ -0,0 +1,92 @@
+import os
+import re
+import sys
+import time
+import zipfile
+import tempfile
+import subprocess
+import tracemalloc
+import pytest
+from report_excel import unique_sheet_name, write_employees_excel, SHEET_NAME_LIMIT
+
+# Exportação Excel em constant_memory. Executado diretamente, mede o pico de
+# memória de uma exportação com muitos colaboradores e um ano de atividades.
+# Limite de arquivos abertos do processo no teste de muitas planilhas
+OPEN_FILES_LIMIT = 64
+
+EMPLOYEE = {
+    'employer_code': 'C0001', 'name': 'Colaborador', 'admission_date': '01/01/2020',
+    'position': 'Técnico', 'unit': 'Unidade Teste', 'department': 'N/A', 'phone': 'N/A',
+}
+
+def _activities(days):
+    for offset in range(days):
+        yield {
+            'date': f'{offset % 28 + 1:02d}/01/2024', 'description': f'Inspeção da área {offset % 7}',
+            'project': 'N/A', 'location': 'N/A', 'type': 'N/A', 'hours': 8.0,
+        }
+
+def _employees(count, days, name=None):
+    for index in range(count):
+        yield dict(EMPLOYEE, name=name or f'Colaborador {index:04d}'), _activities(days)
+
+def _sheets(path):
+    with zipfile.ZipFile(path) as archive:
+        names = re.findall(r'<sheet name="([^"]*)"', archive.read('xl/workbook.xml').decode())
+        rows = [
+            archive.read(f'xl/worksheets/sheet{index}.xml').decode().count('<row ')
+            for index in range(1, len(names) + 1)
+        ]
+    return names, rows
+
+def test_sheet_names_are_valid_and_unique():
+    used = set()
+    long_name = 'Maria Aparecida dos Santos Oliveira'
+    names = [unique_sheet_name(name, used) for name in (long_name, long_name, long_name.upper(), 'Obra [A/B]: 1?', '')]
+    assert names[:3] == ['Maria Aparecida dos Santos Oliv', 'Maria Aparecida dos Santos (2)', 'MARIA APARECIDA DOS SANTOS (3)']
+    assert names[3:] == ['Obra _A_B__ 1_', 'Planilha']
+    assert all(len(name) <= SHEET_NAME_LIMIT for name in names)
+
+def test_employees_excel_streams_one_sheet_per_employee():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'employees.xlsx')
+        write_employees_excel(path, _employees(3, 31, name='Nome Repetido'), 'Relatório Fiscal')
+        names, rows = _sheets(path)
+    assert names == ['Nome Repetido', 'Nome Repetido (2)', 'Nome Repetido (3)']
+    # 7 linhas de cabeçalho, 1 de títulos das colunas e 31 atividades
+    assert rows == [39, 39, 39]
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='RLIMIT_NOFILE do Linux')
+def test_employees_excel_keeps_open_files_bounded():
+    # Mais planilhas que o limite de arquivos abertos: cada planilha pronta
+    # precisa ter o arquivo temporário fechado antes da próxima
+    employees = OPEN_FILES_LIMIT * 3
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'employees.xlsx')
+        script = (
+            "import resource, sys\n"
+            "resource.setrlimit(resource.RLIMIT_NOFILE, (int(sys.argv[1]), resource.getrlimit(resource.RLIMIT_NOFILE)[1]))\n"
+            "from test_report_excel import _employees\n"
+            "from report_excel import write_employees_excel\n"
+            "write_employees_excel(sys.argv[2], _employees(int(sys.argv[3]), 5), 'Relatório Consolidado')\n"
+        )
+        subprocess.run(
+            [sys.executable, '-c', script, str(OPEN_FILES_LIMIT), path, str(employees)],
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True, capture_output=True
+        )
+        names, rows = _sheets(path)
+    assert len(names) == employees
+    assert set(rows) == {13}
+
+if __name__ == "__main__":
+    employees, days = (int(value) for value in sys.argv[1:3]) if len(sys.argv) > 2 else (500, 366)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'employees.xlsx')
+        tracemalloc.start()
+        start = time.perf_counter()
+        write_employees_excel(path, _employees(employees, days), 'Relatório Consolidado')
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{employees} colaboradores x {days} dias: {elapsed:.1f} s, pico de memória {peak / 2**20:.1f} MiB, "
+              f"arquivo {os.path.getsize(path) / 2**20:.1f} MiB")
@@ -0,0 +1,156 @@
+import os
+import sys
+import time
+import tempfile
+import statistics
+import subprocess
+import importlib.util
+from datetime import date, timedelta
+from PyPDF2 import PdfReader
+import report_render
+
+# Geração dos PDFs individual e consolidado para 1, 31 e 366 dias. Executado
+# diretamente, mede o tempo por relatório; com --baseline <revisão git>, mede
+# também o report_render.py daquela revisão para comparar antes/depois.
+RANGES = (1, 31, 366)
+RUNS = 5
+WEEKDAYS = ('segunda-feira', 'terça-feira', 'quarta-feira', 'quinta-feira', 'sexta-feira', 'sábado', 'domingo')
+
+def _activities(days, employee_name=None):
+    start = date(2024, 1, 1)
+    activities = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        if day.weekday() >= 5:
+            description = 'Não preenchível'
+        elif offset % 10 == 3:
+            description = 'Não preenchido'
+        else:
+            description = f'Manutenção preventiva e inspeção da área {offset % 7} ' * 3
+        activity = {
+            'date': day.strftime('%d/%m/%Y'),
+            'weekday': WEEKDAYS[day.weekday()],
+            'description': description,
+            'project': 'N/A',
+            'location': 'N/A',
+            'type': 'N/A',
+            'hours': 'N/A',
+        }
+        if employee_name:
+            activity.update(employee_name=employee_name, employer_code='C0001')
+        activities.append(activity)
+    return activities
+
+def _individual_data(days):
+    return {
+        'employer_code': 'C0001', 'name': 'Colaborador Teste', 'admission_date': '01/01/2020',
+        'position': 'Técnico', 'unit': 'Unidade Teste', 'department': 'N/A', 'phone': 'N/A',
+        'fiscal_name': 'Fiscal', 'field_fiscal_name': 'Fiscal de Campo', 'icj_contract': 'ICJ',
+        'sap_contract': 'SAP', 'client': 'Accerth', 'manager': 'N/A', 'activities': _activities(days),
+    }
+
+def _unit_data(days):
+    return {
+        'unit': 'Unidade Teste', 'fiscal_name': 'Fiscal', 'field_fiscal_name': 'Fiscal de Campo',
+        'icj_contract': 'ICJ', 'sap_contract': 'SAP', 'client': 'Accerth', 'manager': 'N/A',
+        'activities': _activities(days, employee_name='Colaborador Teste'),
+    }
+
+def _render(module, kind, days, path):
+    if kind == 'individual':
+        module.write_individual_pdf(path, _individual_data(days), '#1', '01/2024')
+    else:
+        module.write_unit_pdf(path, _unit_data(days), '01/2024')
+
+def _pdf_pages(path):
+    return len(PdfReader(path).pages)
+
+def test_individual_and_unit_pdfs():
+    with tempfile.TemporaryDirectory() as folder:
+        for kind in ('individual', 'unit'):
+            pages = []
+            for days in RANGES:
+                path = os.path.join(folder, f'{kind}_{days}.pdf')
+                _render(report_render, kind, days, path)
+                pages.append(_pdf_pages(path))
+            # Um ano inteiro ocupa mais páginas que um mês
+            assert pages[0] >= 1 and pages[2] > pages[1]
+
+def test_descriptions_are_plain_text():
+    # Descrições com '<' e '&' não são interpretadas como marcação
+    data = _individual_data(3)
+    data['activities'][0]['description'] = 'Troca de <válvula> & teste'
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'individual.pdf')
+        report_render.write_individual_pdf(path, data, '#1', '01/2024')
+        assert 'Troca de <válvula> & teste' in PdfReader(path).pages[0].extract_text()
+
+def _employees_data(count):
+    employees = []
+    for index in range(count):
+        data = _individual_data(31 + index)
+        data['name'] = f'Colaborador {index:02d}'
+        employees.append(data)
+    return employees
+
+def test_parallel_employees_pdf_matches_serial(monkeypatch):
+    # Usa o pool mesmo em máquinas com um só núcleo
+    monkeypatch.setattr(report_render.os, 'cpu_count', lambda: 2)
+    report_data = _employees_data(report_render.PARALLEL_MIN_EMPLOYEES + 2)
+    signature = ('Assinatura Fiscal', 'Fiscal: Teste')
+    with tempfile.TemporaryDirectory() as folder:
+        outputs = []
+        for workers in (0, 2):
+            path = os.path.join(folder, f'employees_{workers}.pdf')
+            report_render.write_employees_pdf(path, report_data, 'Relatório Fiscal', signature=signature, workers=workers)
+            with open(path, 'rb') as f:
+                outputs.append(f.read())
+        assert outputs[0] == outputs[1]
+        reader = PdfReader(path)
+        # Cada colaborador começa em uma página nova, na ordem recebida
+        first_lines = [page.extract_text().split('\n')[0] for page in reader.pages]
+        starts = [line for line in first_lines if line.startswith('Relatório Fiscal - ')]
+        assert starts == [f"Relatório Fiscal - {data['name']}" for data in report_data]
+
+def _load_baseline(revision):
+    source = subprocess.run(
+        ['git', 'show', f'{revision}:report_render.py'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+    ).stdout
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, 'report_render_baseline.py')
+    with open(path, 'w') as f:
+        f.write(source)
+    spec = importlib.util.spec_from_file_location('report_render_baseline', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _benchmark(module, kind, days, folder):
+    path = os.path.join(folder, f'{kind}_{days}.pdf')
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        _render(module, kind, days, path)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+if __name__ == "__main__":
+    import builtins
+    baseline = _load_baseline(sys.argv[sys.argv.index('--baseline') + 1]) if '--baseline' in sys.argv else None
+    print_ = builtins.print
+    builtins.print = lambda *args, **kwargs: None  # Silenciar o log de report_render
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for kind in ('individual', 'unit'):
+            for days in RANGES:
+                before = _benchmark(baseline, kind, days, folder) if baseline else None
+                after = _benchmark(report_render, kind, days, folder)
+                results.append((kind, days, before, after))
+    builtins.print = print_
+    print(f"Mediana de {RUNS} gerações por relatório (ms)")
+    for kind, days, before, after in results:
+        if before is None:
+            print(f"  {kind:<10} {days:>3} dias: {after:8.1f}")
+        else:
+            print(f"  {kind:<10} {days:>3} dias: antes {before:8.1f}  depois {after:8.1f}  ({before / after:.1f}x)")